@@ -1,9 +1,23 @@
 import mountain_project
+from transport import Transport
+from response_cache import ResponseCache
+from density import DensityModel
+from crawl_trace import CrawlTracer
+from checkpoint import Checkpoint
+from rate_limit import TokenBucket, QuotaCounter, QuotaExceeded
 from coordinate import Coordinate
 from triangle import Triangle
+from covering import HexCovering
+from region import Region
 from route import RatedRoute
+from route_table import RouteTable
+from crag_tree import CragTree
+import scoring
+import snapshot
 
 import configparser
+import sys
+import time
 import gen_settings
 
 # Setup configuration
@@ -16,12 +30,30 @@ config.read(gen_settings.SETTINGS_FILE)
 
 # Try to read MP API Key, we will prompt for one later so no need to do anything on error
 mountain_project.MP_API_KEY = config['MP API']['key']
+mountain_project.MP_BASE_URL = config['MP API']['base_url']
 
 # Check if we have a valid key
 mountain_project.validate_key()
 
-# Parse the route settings
+# Number of requests to keep in flight while crawling
+mountain_project.CRAWL_WORKERS = config['CRAWL'].getint('workers')
+
+# Pooled HTTP transport with retries and timeouts
+mountain_project.transport = Transport.from_config(config)
+
+# Pace requests to what MP allows
+mountain_project.limiter = TokenBucket.from_config(config)
+
+# Cache of previous queries
+mountain_project.cache = ResponseCache.from_config(config)
+mountain_project.density = DensityModel(mountain_project.cache.path)
+
+# Requests made with the key today
+mountain_project.quota = QuotaCounter(mountain_project.cache.path, config['MP API'].getint('daily_quota'))
+
+# Parse the route settings, every [SCORE] section is a separate scoring profile
 RatedRoute.parse_config(config)
+profiles = scoring.parse_profiles(config)
 
 # Define the corners of CO
 sw_co = Coordinate(36.680672, -109.354249)
@@ -35,14 +67,96 @@ nw_co = Coordinate(ne_co.lat, sw_co.lon)
 t1 = Triangle([sw_co, se_co, nw_co])
 t2 = Triangle([nw_co, ne_co, se_co])
 
-# Find all routes in CO
-triangles = mountain_project.process_triangles([t1, t2])
-routes = {r for t in triangles for r in t.routes}
-# Find all routes in SW CO
-# routes = mountain_project.process_triangles([t1])
+# Crawl a region from a GeoJSON file instead of CO if one is set
+region = Region.from_geojson(config['CRAWL']['region']) if config['CRAWL']['region'] else None
+
+# Load the last crawl if there is a snapshot of it, otherwise crawl and save a snapshot
+snapshot_path = config['CRAWL']['snapshot']
+if snapshot_path and snapshot.exists(snapshot_path):
+    # Only the table and triangles are kept, so update can replace the files the rest map
+    table, triangles = snapshot.load(snapshot_path)[:2]
+
+    # Bring the stars and votes of the known routes up to date by id, far fewer requests than crawling again
+    if config['CRAWL'].getboolean('refresh'):
+        refreshed = mountain_project.refresh_routes(table)
+        print('Refreshed {} of {} routes'.format(refreshed, len(table)))
+        snapshot.update(snapshot_path, table)
+
+    # Score all of the routes against every profile
+    tree = CragTree.from_table(table, scoring.score_profiles(table, profiles))
+else:
+    # Record the crawl if a trace is wanted
+    trace_path = config['CRAWL']['trace']
+    if trace_path:
+        mountain_project.tracer = CrawlTracer()
+
+    # Find all routes in the region, either by splitting the triangles or with a hexagonal covering of them
+    if config['CRAWL']['covering'] == 'hex':
+        seeds = HexCovering.cover([t1, t2] if region is None else region.triangles())
+    else:
+        seeds = [t1, t2] if region is None else region.seeds()
+
+    # Predict if the crawl fits in what is left of today's quota
+    estimate = mountain_project.estimate_requests(seeds, region)
+    remaining = mountain_project.quota.remaining(mountain_project.MP_API_KEY)
+    if remaining is None:
+        print('The crawl needs about {} requests'.format(estimate))
+    else:
+        print('The crawl needs about {} requests, {} are left today'.format(estimate, remaining))
+        if estimate > remaining:
+            print('Warning: the crawl will stop when the quota runs out, run again tomorrow to resume it')
+
+    # Save the crawl's progress as it goes, resuming an interrupted crawl if there is a checkpoint of one
+    checkpoint_path = config['CRAWL']['checkpoint']
+    checkpoint = None
+    if checkpoint_path:
+        checkpoint = Checkpoint(checkpoint_path, config['CRAWL'].getfloat('checkpoint_interval'))
+
+    # Score and store the routes as they are found, printing the rankings so far every rank_interval seconds
+    rank_interval = config['CRAWL'].getfloat('rank_interval')
+    tree = CragTree()
+    writer = snapshot.SnapshotWriter(snapshot_path) if snapshot_path else None
+    unique = 0
+    last_rank = time.monotonic()
+    try:
+        for routes, triangles in mountain_project.stream_routes(seeds, region=region, checkpoint=checkpoint):
+            # Store the routes in columns
+            table = RouteTable.from_routes(routes)
+            tree.add_table(table, scoring.score_profiles(table, profiles))
+            if writer is not None:
+                writer.add(table, triangles)
+            unique += len(routes)
+
+            if rank_interval and time.monotonic() - last_rank >= rank_interval:
+                last_rank = time.monotonic()
+                print('Best so far of {} routes:'.format(unique))
+                for i, profile in enumerate(profiles):
+                    print('{}: '.format(profile.name) + ', '.join(
+                        '{} {:.3g}'.format(crag, score) for crag, score in tree.rank('Boulder', top_k=5, column=i)))
+    except QuotaExceeded as e:
+        # The checkpoint keeps the crawl's progress for the next run
+        if writer is not None:
+            writer.abort()
+        sys.exit(str(e))
+    if writer is not None:
+        writer.close()
+    # The crawl is finished, without a snapshot its checkpoint would only replay these routes in the next run rather
+    # than start a new crawl
+    if checkpoint is not None:
+        checkpoint.remove()
 
-# Convert to RatedRoute
-routes = [RatedRoute(r) for r in routes]
+    print('Fetched {} routes, {:.2f} for every unique route'.format(
+        mountain_project.crawl_stats['fetched'], mountain_project.crawl_stats['fetched'] / max(unique, 1)))
+    print('Made {} saturated requests, avoided {} using the density history'.format(
+        mountain_project.crawl_stats['saturated'], mountain_project.crawl_stats['avoided']))
+    print('{} triangles still had too many routes at a single grade'.format(mountain_project.crawl_stats['truncated']))
+    if trace_path:
+        mountain_project.tracer.report()
+        mountain_project.tracer.write_jsonl(trace_path + '.jsonl')
+        mountain_project.tracer.write_chrome_trace(trace_path + '.trace.json')
 
-# Find all the Crags in Boulder and sort by rating
-RatedRoute.sort_crags(routes, 'Boulder')
+# Find all the Crags in Boulder and sort by rating for every profile
+for i, profile in enumerate(profiles):
+    print('{}:'.format(profile.name))
+    for crag, score in tree.rank('Boulder', column=i):
+        print("{}: {:5g}".format(crag, score))
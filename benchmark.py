@@ -0,0 +1,387 @@
+"""Benchmarks
+
+Offline benchmarks of Crag Finder's crawler and data structures. Run as a script to print the results, e.g.
+``python benchmark.py memory``
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from typing import List
+
+import mountain_project
+from coordinate import Coordinate
+from covering import HexCovering
+from crawl_trace import CrawlTracer
+from density import DensityModel
+from region import Region
+from response_cache import ResponseCache
+from route import Route, RatedRoute
+from rate_limit import TokenBucket
+from synthetic import synthetic_routes, COLORADO
+from transport import Transport
+from triangle import Triangle
+
+
+class _DictRoute:
+    """The original dictionary backed route, kept to measure against
+    """
+
+    def __init__(self, data):
+        self.__dict__ = data
+
+
+def _traced_bytes(build) -> int:
+    """Measures the memory still held by what build returns
+
+    Parameters
+    ----------
+    build : Callable
+        Function that builds and returns the objects to measure
+
+    Returns
+    -------
+    bytes : int
+        Bytes allocated while building that are still in use afterwards
+    """
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    del result
+    return size
+
+
+def memory_benchmark(n: int = 100000) -> dict:
+    """Compares the memory used by dictionary backed routes and the compact route objects
+
+    Routes are decoded from JSON as they are from MP, so every route starts with its own copies of its strings.
+
+    Parameters
+    ----------
+    n : int
+        The number of routes, a statewide crawl of Colorado is around 100000
+
+    Returns
+    -------
+    results : dict
+        Total and per route bytes of each representation
+    """
+    text = json.dumps(synthetic_routes(n))
+
+    results = {
+        'routes': n,
+        'dict_bytes': _traced_bytes(lambda: [_DictRoute(d) for d in json.loads(text)]),
+        'slots_bytes': _traced_bytes(lambda: [Route(d) for d in json.loads(text)]),
+        'rated_bytes': _traced_bytes(lambda: [RatedRoute(Route(d)) for d in json.loads(text)]),
+    }
+
+    for key in ('dict', 'slots', 'rated'):
+        results[key + '_per_route'] = results[key + '_bytes'] / n
+    results['reduction'] = 1 - results['slots_bytes'] / results['dict_bytes']
+
+    return results
+
+
+HEADLESS_MODULES = ('mountain_project', 'route_table', 'crag_tree', 'route_index', 'snapshot')
+"""Modules used by headless crawls and scoring, they must import without the plotting stack
+"""
+
+GUI_MODULES = ('ipyleaflet', 'ipywidgets', 'matplotlib', 'IPython')
+"""Modules only the visualization layer may import
+"""
+
+
+def import_benchmark(modules=HEADLESS_MODULES, repeat: int = 5) -> dict:
+    """Measures the cold import time of modules and checks that they do not load the plotting stack
+
+    Each import runs in a fresh interpreter with ``-X importtime``, the best of repeat runs is reported.
+
+    Parameters
+    ----------
+    modules : Sequence[str]
+        The modules to import
+    repeat : int
+        The number of fresh interpreters to time
+
+    Returns
+    -------
+    results : dict
+        The import time in milliseconds of each module, and any GUI modules that were loaded
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    code = 'import sys\n{}\nprint(",".join(m for m in {!r} if m in sys.modules))'.format(
+        '\n'.join('import ' + m for m in modules), GUI_MODULES)
+
+    best = {}
+    loaded = set()
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=here, capture_output=True,
+                                text=True, check=True)
+        loaded.update(m for m in result.stdout.strip().split(',') if m)
+
+        # importtime lines are "import time: self [us] | cumulative | imported package"
+        for line in result.stderr.splitlines():
+            fields = [f.strip() for f in line.split('|')]
+            if len(fields) == 3 and fields[2] in modules:
+                ms = int(fields[1]) / 1000
+                best[fields[2]] = min(ms, best.get(fields[2], ms))
+
+    return {'import_ms': best, 'gui_modules': sorted(loaded)}
+
+
+def colorado_triangles() -> List[Triangle]:
+    """The two triangles covering Colorado that a full crawl starts from
+
+    Returns
+    -------
+    triangles : List[Triangle]
+        Triangles split along the diagonal of Colorado's bounding box
+    """
+    south, west, north, east = COLORADO
+    sw, se, ne, nw = (Coordinate(south, west), Coordinate(south, east), Coordinate(north, east),
+                      Coordinate(north, west))
+
+    return [Triangle([sw, se, nw]), Triangle([nw, ne, se])]
+
+
+def _peak_rss() -> int:
+    """The most memory the process has held at once in bytes, None where this is not available
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Linux reports kilobytes and macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def crawl_benchmark(n: int = 100000, workers: int = 4, latency: float = 0.0, error_rate: float = 0.0,
+                    seed: int = 0, tracer: CrawlTracer = None, covering: str = 'triangles',
+                    region: Region = None, rate_limit: float = 0.0, limiter: TokenBucket = None) -> dict:
+    """Crawls Colorado from a local MP stand-in server
+
+    The server, :class:`mp_standin.StandinServer`, runs in its own process so it does not compete with the crawl for
+    the interpreter. The crawl starts with an empty cache and density history and its progress log is discarded.
+
+    Parameters
+    ----------
+    n : int
+        The number of synthetic routes the server holds
+    workers : int
+        The number of requests the crawl keeps in flight
+    latency : float
+        Seconds the server waits before each response
+    error_rate : float
+        Share of requests the server fails with 503, these are retried by the transport
+    seed : int
+        Seed for the synthetic routes and server errors
+    tracer : CrawlTracer
+        Records the crawl if given
+    covering : str
+        'triangles' to split triangles or 'hex' for a :class:`covering.HexCovering`
+    region : Region
+        The area to crawl, all of Colorado if None
+    rate_limit : float
+        Requests per second the server answers before it answers 429, 0 for no limit
+    limiter : TokenBucket
+        Paces the crawl's requests if given
+
+    Returns
+    -------
+    results : dict
+        Answered, failed, and throttled request counts, crawl counts, the share of fetched routes that were
+        duplicates, the share of the server's routes found, wall time, and peak memory
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    server = subprocess.Popen([sys.executable, 'mp_standin.py', '-n', str(n), '--seed', str(seed),
+                               '--latency', str(latency), '--error-rate', str(error_rate),
+                               '--rate-limit', str(rate_limit)],
+                              cwd=here, stdout=subprocess.PIPE, text=True)
+    saved = (mountain_project.MP_BASE_URL, mountain_project.MP_API_KEY, mountain_project.transport,
+             mountain_project.cache, mountain_project.density, mountain_project.tracer, mountain_project.limiter)
+
+    try:
+        base_url = server.stdout.readline().strip()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'routes.sqlite')
+            mountain_project.MP_BASE_URL = base_url
+            mountain_project.MP_API_KEY = 'benchmark'
+            mountain_project.transport = Transport(retries=10, backoff=0, pool_size=max(workers, 10))
+            mountain_project.cache = ResponseCache(path)
+            mountain_project.density = DensityModel(path)
+            mountain_project.tracer = tracer
+            mountain_project.limiter = limiter
+            mountain_project.crawl_stats.clear()
+
+            start = time.perf_counter()
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                if covering == 'hex':
+                    start_areas = HexCovering.cover(colorado_triangles() if region is None else region.triangles())
+                else:
+                    start_areas = colorado_triangles() if region is None else region.seeds()
+                triangles = mountain_project.process_triangles(start_areas, workers=workers, region=region)
+            wall = time.perf_counter() - start
+
+            server_stats = mountain_project.transport.get(base_url.rsplit('/', 1)[0] + '/stats', {}).json()
+            mountain_project.cache.connection.close()
+            mountain_project.density.connection.close()
+    finally:
+        (mountain_project.MP_BASE_URL, mountain_project.MP_API_KEY, mountain_project.transport,
+         mountain_project.cache, mountain_project.density, mountain_project.tracer, mountain_project.limiter) = saved
+        server.terminate()
+        server.wait()
+
+    unique = len({r.id for t in triangles for r in t.routes})
+    fetched = server_stats.get('routes', 0)
+
+    # The routes the crawl should find
+    expected = n
+    if region is not None:
+        routes = synthetic_routes(n, seed)
+        expected = int(region.contains([r['latitude'] for r in routes], [r['longitude'] for r in routes]).sum())
+
+    return {
+        'routes': n,
+        'workers': workers,
+        'requests': server_stats.get('requests', 0) - server_stats.get('errors', 0) - server_stats.get('throttled', 0),
+        'errors': server_stats.get('errors', 0),
+        'throttled': server_stats.get('throttled', 0),
+        'saturated': mountain_project.crawl_stats['saturated'],
+        'avoided': mountain_project.crawl_stats['avoided'],
+        'truncated': mountain_project.crawl_stats['truncated'],
+        'fetched_routes': fetched,
+        'fetched_bytes': server_stats.get('bytes', 0),
+        'unique_routes': unique,
+        'duplicate_ratio': 1 - unique / fetched if fetched else 0.0,
+        'fetched_per_unique': fetched / unique if unique else 0.0,
+        'coverage': unique / expected if expected else 1.0,
+        'wall_seconds': wall,
+        'peak_rss_bytes': _peak_rss(),
+    }
+
+
+CRAWL_GATES = {'requests': 1, 'saturated': 1, 'duplicate_ratio': 1, 'fetched_bytes': 1, 'coverage': -1}
+"""Crawl results that fail a comparison if they get worse, 1 if lower is better and -1 if higher is better
+
+Wall time and memory are reported but not gated as they depend on the machine and its load.
+"""
+
+
+def compare_crawl(results: dict, baseline: dict, tolerance: float = 0.05) -> List[str]:
+    """Compares crawl results with a recorded baseline and prints the change in each result
+
+    Parameters
+    ----------
+    results : dict
+        Results of :func:`crawl_benchmark`
+    baseline : dict
+        Results recorded from an earlier run with the same settings
+    tolerance : float
+        The relative change in a gated result that counts as a regression
+
+    Returns
+    -------
+    regressions : List[str]
+        The gated results that got worse by more than the tolerance
+    """
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            continue
+
+        change = (value - old) / old if old else 0.0
+        print('{:>16}: {:>14.6g} -> {:<14.6g} {:+.1%}'.format(key, old, value, change))
+
+        if key in CRAWL_GATES and change * CRAWL_GATES[key] > tolerance:
+            regressions.append(key)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    memory = subparsers.add_parser('memory', help='memory used by route objects')
+    memory.add_argument('-n', type=int, default=100000, help='number of routes')
+
+    imports = subparsers.add_parser('imports', help='cold import time of the headless modules')
+    imports.add_argument('--budget', type=float, default=None,
+                         help='fail if any module takes longer than this many milliseconds to import')
+
+    crawl = subparsers.add_parser('crawl', help='full crawl of a local MP stand-in server')
+    crawl.add_argument('-n', type=int, default=100000, help='number of routes the server holds')
+    crawl.add_argument('--workers', type=int, default=4, help='requests kept in flight')
+    crawl.add_argument('--latency', type=float, default=0.0, help='seconds the server waits before each response')
+    crawl.add_argument('--error-rate', type=float, default=0.0, help='share of requests that fail with 503')
+    crawl.add_argument('--seed', type=int, default=0, help='seed for the routes and server errors')
+    crawl.add_argument('--rate-limit', type=float, default=0.0,
+                       help='requests per second the server allows before answering 429, 0 for no limit')
+    crawl.add_argument('--limit', type=float, default=0.0, metavar='RATE',
+                       help='pace the crawl with an adaptive limiter starting at RATE requests per second')
+    crawl.add_argument('--record', metavar='FILE', help='save the results as a baseline')
+    crawl.add_argument('--baseline', metavar='FILE', help='compare the results with a recorded baseline')
+    crawl.add_argument('--covering', choices=('triangles', 'hex'), default='triangles',
+                       help='split triangles or use hexagonal cells')
+    crawl.add_argument('--region', metavar='GEOJSON', help='crawl the polygons in a GeoJSON file instead of Colorado')
+    crawl.add_argument('--trace', metavar='PREFIX', help='write the crawl as PREFIX.jsonl and PREFIX.trace.json')
+    crawl.add_argument('--tolerance', type=float, default=0.05,
+                       help='relative change in a gated result that fails the comparison')
+
+    args = parser.parse_args()
+
+    if args.benchmark == 'memory':
+        results = memory_benchmark(args.n)
+        print('{routes} routes: {dict_per_route:.0f} bytes per dict route, {slots_per_route:.0f} bytes per compact '
+              'route, {rated_per_route:.0f} bytes per rated route, {reduction:.0%} smaller'.format(**results))
+    elif args.benchmark == 'imports':
+        results = import_benchmark()
+        for module, ms in results['import_ms'].items():
+            print('{}: {:.1f} ms'.format(module, ms))
+
+        # Guard against the plotting stack creeping back into headless imports
+        if results['gui_modules']:
+            sys.exit('Headless imports loaded: ' + ', '.join(results['gui_modules']))
+        if args.budget is not None and max(results['import_ms'].values()) > args.budget:
+            sys.exit('Import time is over the {:g} ms budget'.format(args.budget))
+    elif args.benchmark == 'crawl':
+        tracer = CrawlTracer() if args.trace else None
+        limiter = TokenBucket(args.limit, burst=max(args.workers, 1), max_rate=100) if args.limit else None
+        results = crawl_benchmark(args.n, args.workers, args.latency, args.error_rate, args.seed, tracer,
+                                  args.covering, Region.from_geojson(args.region) if args.region else None,
+                                  args.rate_limit, limiter)
+        if tracer is not None:
+            tracer.report()
+            tracer.write_jsonl(args.trace + '.jsonl')
+            tracer.write_chrome_trace(args.trace + '.trace.json')
+        if args.record:
+            with open(args.record, 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                regressions = compare_crawl(results, json.load(f), args.tolerance)
+            if regressions:
+                sys.exit('Crawl regressed: ' + ', '.join(regressions))
+        else:
+            for key, value in results.items():
+                print('{}: {:g}'.format(key, value) if value is not None else '{}: n/a'.format(key))
+
+
+# Allow module standalone run
+if __name__ == '__main__':
+    main()
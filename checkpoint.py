@@ -0,0 +1,182 @@
+"""Crawl Checkpoints
+
+Contains the Checkpoint class, which records a crawl's progress on disk so an interrupted crawl can continue from the
+triangles it had left instead of starting over
+"""
+import os
+import pickle
+import time
+from typing import Iterator, List, Tuple
+
+from coordinate import Coordinate
+from covering import Cell
+from triangle import Triangle
+
+
+class Checkpoint:
+    """The frontier and final triangles of a crawl in progress
+
+    A checkpoint is two files. path + '.leaves' is appended to as each final triangle is found, so saving it never
+    rewrites earlier work. path + '.frontier' is the triangles still to be searched, the crawl stats, and the length of
+    the leaves file at the moment the frontier was taken, written to a temporary file and moved into place so it is
+    never half written. Final triangles appended after the last frontier was saved are dropped when resuming, as their
+    triangles are still in that frontier.
+
+    Pass a checkpoint to :meth:`mountain_project.crawl`, it saves the frontier every interval seconds and resumes from
+    the checkpoint if one exists. A leaves file without a frontier is from a crawl interrupted before its first save,
+    it does not count as a checkpoint and is removed when a new crawl starts. Remove the checkpoint once the crawl's
+    results are stored.
+
+    Parameters
+    ----------
+    path : str
+        The checkpoint's file name prefix
+    interval : float
+        Seconds between saves of the frontier
+    """
+
+    def __init__(self, path: str, interval: float = 60.0):
+        self.path = path
+        self.interval = interval
+
+        self.frontier_path = path + '.frontier'
+        self.leaves_path = path + '.leaves'
+
+        self._leaves = None
+        self._last_save = time.monotonic()
+
+    def exists(self) -> bool:
+        """Checks if there is a crawl to resume
+
+        Returns
+        -------
+        exists : bool
+            Whether a frontier has been saved, final triangles found before the first save are not enough to resume
+        """
+        return os.path.isfile(self.frontier_path)
+
+    def load(self) -> Tuple[List[Triangle], Iterator[Triangle], dict]:
+        """Reads the checkpoint of an interrupted crawl
+
+        Final triangles found after the frontier was saved are cut from the leaves file, new final triangles are
+        appended after the rest.
+
+        Returns
+        -------
+        frontier : List[Triangle]
+            The triangles that were still to be searched
+        leaves : Iterator[Triangle]
+            The final triangles found before the frontier was saved, with their routes, read as they are used
+        stats : dict
+            The crawl stats when the frontier was saved
+        """
+        with open(self.frontier_path, 'rb') as f:
+            state = pickle.load(f)
+
+        with open(self.leaves_path, 'ab') as f:
+            f.truncate(state['leaves_bytes'])
+
+        return state['frontier'], self._read_leaves(), state['stats']
+
+    def _read_leaves(self) -> Iterator[Triangle]:
+        with open(self.leaves_path, 'rb') as f:
+            while True:
+                try:
+                    vertices, min_diff, max_diff, truncated, depth, routes = pickle.load(f)
+                except EOFError:
+                    return
+
+                # Final triangles are never split again, so cells are stored without their covering
+                corners = [Coordinate(lat, lon) for lat, lon in vertices]
+                if len(corners) == 3:
+                    triangle = Triangle(corners, min_diff, max_diff)
+                else:
+                    triangle = Cell.from_vertices(corners, min_diff, max_diff)
+                triangle.truncated = truncated
+                triangle.depth = depth
+                triangle.routes = routes
+
+                yield triangle
+
+    def add_leaf(self, triangle: Triangle):
+        """Records a final triangle and its routes
+
+        Parameters
+        ----------
+        triangle : Triangle
+            A final triangle of the crawl
+
+        Returns
+        -------
+        nothing
+        """
+        if self._leaves is None:
+            self._leaves = open(self.leaves_path, 'ab')
+
+        pickle.dump(([(v.lat, v.lon) for v in triangle.vertices], triangle.minDiff, triangle.maxDiff,
+                     triangle.truncated, getattr(triangle, 'depth', 0), triangle.routes),
+                    self._leaves, pickle.HIGHEST_PROTOCOL)
+
+    def due(self) -> bool:
+        """Checks if it is time to save the frontier
+
+        Returns
+        -------
+        due : bool
+            True once interval seconds have passed since the last save
+        """
+        return time.monotonic() - self._last_save >= self.interval
+
+    def save(self, frontier: List[Triangle], stats: dict):
+        """Saves the triangles still to be searched
+
+        Parameters
+        ----------
+        frontier : List[Triangle]
+            Every triangle that has not been searched or whose search has not finished, in the order they would be
+            searched
+        stats : dict
+            The crawl stats so far
+
+        Returns
+        -------
+        nothing
+        """
+        # The final triangles must be on disk before a frontier that leaves them out
+        if self._leaves is not None:
+            self._leaves.flush()
+            os.fsync(self._leaves.fileno())
+        leaves_bytes = os.path.getsize(self.leaves_path) if os.path.isfile(self.leaves_path) else 0
+
+        tmp = self.frontier_path + '.tmp'
+        with open(tmp, 'wb') as f:
+            pickle.dump({'frontier': list(frontier), 'stats': dict(stats), 'leaves_bytes': leaves_bytes,
+                         'saved': time.time()}, f, pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.frontier_path)
+
+        self._last_save = time.monotonic()
+
+    def close(self):
+        """Closes the leaves file
+
+        Returns
+        -------
+        nothing
+        """
+        if self._leaves is not None:
+            self._leaves.close()
+            self._leaves = None
+
+    def remove(self):
+        """Deletes the checkpoint, once the crawl's results are stored elsewhere
+
+        Returns
+        -------
+        nothing
+        """
+        self.close()
+        for path in (self.frontier_path, self.leaves_path, self.frontier_path + '.tmp'):
+            if os.path.isfile(path):
+                os.remove(path)
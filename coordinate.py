@@ -2,6 +2,38 @@
 
 """
 from math import sqrt
+import numpy as np
+
+EARTH_RADIUS_MILES = 3958.8
+"""The mean radius of the earth in miles
+"""
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Great circle distance between points in miles
+
+    Works on floats or numpy arrays, arrays are broadcast against each other.
+
+    Parameters
+    ----------
+    lat1 : float or np.ndarray
+        Latitude of the first point(s) in degrees
+    lon1 : float or np.ndarray
+        Longitude of the first point(s) in degrees
+    lat2 : float or np.ndarray
+        Latitude of the second point(s) in degrees
+    lon2 : float or np.ndarray
+        Longitude of the second point(s) in degrees
+
+    Returns
+    -------
+    distance : float or np.ndarray
+        The distance between the points in miles
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(h, 1)))
 
 
 class Coordinate:
@@ -16,8 +48,10 @@ class Coordinate:
     lon : float
         The Coordinate's longitude
     """
-    lat = 0
-    lon = 0
+    __slots__ = ('lat', 'lon')
+
+    lat: float
+    lon: float
 
     def __init__(self, lat: float, lon: float):
         self.lat = lat
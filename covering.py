@@ -0,0 +1,417 @@
+"""Hexagonal Covering
+
+An alternative to splitting triangles. Queries are circles, and the circle around a triangle is at least pi times the
+triangle's area, so neighboring queries download the same routes many times. A hexagon fills 83% of the circle around
+it, so covering an area with hexagonal cells and querying each cell's circle fetches far fewer duplicate routes.
+
+Cells are laid out in miles on a sinusoidal projection, an equal-area projection where a degree of longitude shrinks
+with the cosine of the latitude, rather than in degrees like :class:`coordinate.Coordinate` distances. Every level of
+the grid has half the radius of the level above, and a saturated cell is replaced by the cells of the next level that
+overlap it. Cells are shared by neighbors, so a cell that two saturated parents overlap is only queried once.
+
+Cells have the attributes and methods of :class:`triangle.Triangle` that the crawl uses, so they can be passed to
+:meth:`mountain_project.process_triangles` in place of triangles.
+"""
+import math
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+import geometry
+from coordinate import Coordinate, EARTH_RADIUS_MILES
+from grades import bisect_grades
+from route import Route
+from triangle import Triangle
+
+SQRT3 = math.sqrt(3)
+
+NORMALS = np.array([[1, 0], [0.5, SQRT3 / 2], [-0.5, SQRT3 / 2]])
+"""The normals of the sides of a pointy topped hexagon
+"""
+
+CORNERS = np.array([[math.cos(a), math.sin(a)] for a in np.radians([30, 90, 150, 210, 270, 330])])
+"""The corners of a pointy topped hexagon with a radius of 1
+"""
+
+
+def convex_overlap(a: np.ndarray, b: np.ndarray) -> bool:
+    """Checks if two convex polygons overlap using the separating axis test
+
+    Polygons that only touch do not overlap.
+
+    Parameters
+    ----------
+    a : np.ndarray
+        K x 2 array of the first polygon's corners in order
+    b : np.ndarray
+        M x 2 array of the second polygon's corners in order
+
+    Returns
+    -------
+    overlap : bool
+        Whether the polygons share any area
+    """
+    for polygon in (a, b):
+        edges = np.roll(polygon, -1, axis=0) - polygon
+        axes = np.stack([-edges[:, 1], edges[:, 0]], axis=1)
+        pa, pb = a @ axes.T, b @ axes.T
+        if np.any((pa.max(axis=0) <= pb.min(axis=0)) | (pb.max(axis=0) <= pa.min(axis=0))):
+            return False
+
+    return True
+
+
+class Cell:
+    """A hexagonal cell of a :class:`HexCovering`
+
+    Parameters
+    ----------
+    covering : HexCovering
+        The covering the cell belongs to, None for cells loaded from a snapshot, which can not be split
+    level : int
+        The grid level, cells at each level have half the radius of the level above
+    q : int
+        The cell's column in axial coordinates
+    r : int
+        The cell's row in axial coordinates
+    vertices : List[Coordinate]
+        The cell's corners
+    center : Coordinate
+        The center of the cell's query
+    miles : float
+        The radius of the cell's query
+    min_diff : str
+        The minimum difficulty that should be found in the cell
+    max_diff : str
+        The maximum difficulty that should be found in the cell
+    """
+    __slots__ = ('covering', 'level', 'q', 'r', 'vertices', 'minDiff', 'maxDiff', '_mini_center', '_mini_miles',
+                 'routes', 'truncated', 'depth')
+
+    routes: List[Route]
+    """A List of routes that are in the cell's query circle
+    """
+
+    def __init__(self, covering: 'HexCovering', level: int, q: int, r: int, vertices: List[Coordinate],
+                 center: Coordinate, miles: float, min_diff: str = Triangle.DEFAULT_MIN_DIFF,
+                 max_diff: str = Triangle.DEFAULT_MAX_DIFF):
+        self.covering = covering
+        self.level = level
+        self.q = q
+        self.r = r
+        self.vertices = vertices
+        self.minDiff = min_diff
+        self.maxDiff = max_diff
+
+        self._mini_center = center
+        self._mini_miles = miles
+
+        self.routes = None
+        self.truncated = False
+        self.depth = 0
+
+    @classmethod
+    def from_vertices(cls, vertices: List[Coordinate], min_diff: str = Triangle.DEFAULT_MIN_DIFF,
+                      max_diff: str = Triangle.DEFAULT_MAX_DIFF) -> 'Cell':
+        """Creates a cell that is not part of a covering from its corners
+
+        Parameters
+        ----------
+        vertices : List[Coordinate]
+            The cell's corners
+        min_diff : str
+            The minimum difficulty that should be found in the cell
+        max_diff : str
+            The maximum difficulty that should be found in the cell
+
+        Returns
+        -------
+        cell : Cell
+            A cell with its query centered on the mean of its corners
+        """
+        lat_lon = np.array([[v.lat, v.lon] for v in vertices])
+        center = lat_lon.mean(axis=0)
+        miles = geometry.cover_miles(center[None], lat_lon[None])[0]
+
+        return cls(None, -1, 0, 0, vertices, Coordinate(float(center[0]), float(center[1])), float(miles), min_diff,
+                   max_diff)
+
+    @property
+    def key(self) -> Tuple[int, int, int, str, str]:
+        """The cell's position in the grid and its difficulty range, unique within a covering
+
+        Returns
+        -------
+        key : Tuple[int, int, int, str, str]
+            (level, q, r, min_diff, max_diff)
+        """
+        return self.level, self.q, self.r, self.minDiff, self.maxDiff
+
+    @property
+    def mini_center(self) -> Coordinate:
+        """The center of the cell's query
+
+        Returns
+        -------
+        mini_center : Coordinate
+            The cell's center
+        """
+        return self._mini_center
+
+    @property
+    def mini_miles(self) -> float:
+        """The radius in miles of a query around the center that covers the whole cell
+
+        Returns
+        -------
+        mini_miles : float
+            The distance to the farthest corner
+        """
+        return self._mini_miles
+
+    @property
+    def lat_lon(self) -> np.ndarray:
+        """The corners in lat, lon order
+
+        Returns
+        -------
+        lat_lon : np.ndarray
+            6 x 2 array of the corners
+        """
+        return np.array([[v.lat, v.lon] for v in self.vertices])
+
+    def split_triangle(self) -> List['Cell']:
+        """Splits the cell into the cells of the next level that overlap it
+
+        Named like :meth:`triangle.Triangle.split_triangle` so the crawl can split cells and triangles alike. Cells
+        that were already handed out by the covering, e.g. to a saturated neighbor, are left out unless that would
+        leave none.
+
+        Returns
+        -------
+        split_cells : List[Cell]
+            The smaller cells, they keep the cell's difficulty range
+        """
+        if self.covering is None:
+            raise ValueError('Cells loaded without their covering can not be split')
+
+        return self._children(self.covering.children(self))
+
+    def split_difficulty(self) -> List['Cell']:
+        """Split the cell by difficulty, see :meth:`triangle.Triangle.split_difficulty`
+
+        Returns
+        -------
+        split_cells : List[Cell]
+            2 copies of the cell covering the easier and harder halves of the range, empty if the range is a single
+            grade
+        """
+        return self._children([Cell(self.covering, self.level, self.q, self.r, self.vertices, self._mini_center,
+                                    self._mini_miles, min_diff, max_diff)
+                               for min_diff, max_diff in bisect_grades(self.minDiff, self.maxDiff)])
+
+    def _children(self, cells: List['Cell']) -> List['Cell']:
+        """Marks cells as split from this cell
+        """
+        for c in cells:
+            c.depth = self.depth + 1
+
+        return cells
+
+
+class HexCovering:
+    """A hierarchy of hexagonal grids covering a set of triangles
+
+    Parameters
+    ----------
+    triangles : Sequence[Triangle]
+        The area to cover, cells that do not overlap any of the triangles are never queried
+    radius : float
+        The radius in miles of the top level cells, it should leave room below the 100 mile limit of
+        :meth:`mountain_project.split_unfetched` for the distortion of the projection
+    """
+
+    def __init__(self, triangles: Sequence[Triangle], radius: float = 90):
+        self.radius = radius
+        self.triangles = list(triangles)
+
+        # Center the projection on the area to keep its shear small
+        lat_lon = np.stack([t.lat_lon for t in self.triangles])
+        self.lon0 = float(lat_lon[..., 1].mean())
+        self.areas = [self.project(*t.lat_lon.T) for t in self.triangles]
+        """The corners of each triangle in projected miles
+        """
+
+        self.issued = set()
+        """The keys of every cell handed out so far
+        """
+
+    @classmethod
+    def cover(cls, triangles: Sequence[Triangle], radius: float = 90) -> List[Cell]:
+        """Covers triangles with the top level cells of a new covering
+
+        Parameters
+        ----------
+        triangles : Sequence[Triangle]
+            The area to cover
+        radius : float
+            The radius in miles of the top level cells
+
+        Returns
+        -------
+        cells : List[Cell]
+            The cells to crawl in place of the triangles
+        """
+        covering = cls(triangles, radius)
+        corners = np.concatenate(covering.areas)
+        (x0, y0), (x1, y1) = corners.min(axis=0), corners.max(axis=0)
+
+        # Every cell in the bounding box of the triangles, filtered down to those overlapping a triangle
+        spacing = radius * SQRT3
+        rows = range(math.floor(y0 / (1.5 * radius)) - 1, math.ceil(y1 / (1.5 * radius)) + 2)
+        cells = [(q, r) for r in rows
+                 for q in range(math.floor(x0 / spacing - r / 2) - 1, math.ceil(x1 / spacing - r / 2) + 2)]
+
+        return covering._cells(0, cells, Triangle.DEFAULT_MIN_DIFF, Triangle.DEFAULT_MAX_DIFF)
+
+    def project(self, lat, lon) -> np.ndarray:
+        """Projects coordinates into miles
+
+        Parameters
+        ----------
+        lat : float or np.ndarray
+            Latitude in degrees
+        lon : float or np.ndarray
+            Longitude in degrees
+
+        Returns
+        -------
+        xy : np.ndarray
+            ... x 2 array of east and north miles
+        """
+        lat = np.radians(lat)
+        lon = np.radians(np.asarray(lon) - self.lon0)
+
+        return np.stack([EARTH_RADIUS_MILES * lon * np.cos(lat), EARTH_RADIUS_MILES * lat], axis=-1)
+
+    def unproject(self, xy: np.ndarray) -> np.ndarray:
+        """Converts projected miles back into coordinates
+
+        Parameters
+        ----------
+        xy : np.ndarray
+            ... x 2 array of east and north miles
+
+        Returns
+        -------
+        lat_lon : np.ndarray
+            ... x 2 array of lat, lon in degrees
+        """
+        lat = xy[..., 1] / EARTH_RADIUS_MILES
+        lon = xy[..., 0] / (EARTH_RADIUS_MILES * np.cos(lat))
+
+        return np.stack([np.degrees(lat), np.degrees(lon) + self.lon0], axis=-1)
+
+    def cell_radius(self, level: int) -> float:
+        """The radius in projected miles of the cells of a level
+
+        Parameters
+        ----------
+        level : int
+            The grid level
+
+        Returns
+        -------
+        radius : float
+            The distance from the center of a cell to its corners
+        """
+        return self.radius / 2 ** level
+
+    def center(self, level: int, q, r) -> np.ndarray:
+        """The projected center of cells
+
+        Parameters
+        ----------
+        level : int
+            The grid level
+        q : int or np.ndarray
+            Axial column
+        r : int or np.ndarray
+            Axial row
+
+        Returns
+        -------
+        xy : np.ndarray
+            ... x 2 array of the centers in miles
+        """
+        size = self.cell_radius(level)
+        q, r = np.asarray(q, dtype=np.float64), np.asarray(r, dtype=np.float64)
+
+        return np.stack([size * SQRT3 * (q + r / 2), size * 1.5 * r], axis=-1)
+
+    def children(self, cell: Cell) -> List[Cell]:
+        """The cells of the next level that overlap a cell and have not been handed out yet
+
+        Parameters
+        ----------
+        cell : Cell
+            The cell to split
+
+        Returns
+        -------
+        cells : List[Cell]
+            The overlapping cells with the cell's difficulty range
+        """
+        level = cell.level + 1
+        size = self.cell_radius(level)
+        x, y = self.center(cell.level, cell.q, cell.r)
+
+        # Candidates around the parent's center, the parent is two child radii across
+        r0 = round(y / (1.5 * size))
+        q0 = round(x / (SQRT3 * size) - r0 / 2)
+        q, r = np.meshgrid(np.arange(q0 - 3, q0 + 4), np.arange(r0 - 3, r0 + 4))
+        q, r = q.ravel(), r.ravel()
+
+        # Hexagons with the same orientation overlap when their centers are closer than the sum of their apothems
+        # along each side's normal
+        offsets = self.center(level, q, r) - np.array([x, y])
+        apothems = (self.cell_radius(cell.level) + size) * SQRT3 / 2
+        overlap = np.all(np.abs(offsets @ NORMALS.T) < apothems * (1 - 1e-9), axis=1)
+
+        positions = list(zip(q[overlap].tolist(), r[overlap].tolist()))
+
+        # If every child was already handed out the cell is still split, its children are then answered by the cache,
+        # as a saturated cell with no children would be taken for one that can not be split
+        return (self._cells(level, positions, cell.minDiff, cell.maxDiff) or
+                self._cells(level, positions, cell.minDiff, cell.maxDiff, fresh_only=False))
+
+    def _cells(self, level: int, positions, min_diff: str, max_diff: str, fresh_only: bool = True) -> List[Cell]:
+        """Creates the cells at axial positions that overlap the covered area and have not been handed out yet
+        """
+        size = self.cell_radius(level)
+        if fresh_only:
+            positions = [(q, r) for q, r in positions if (level, q, r, min_diff, max_diff) not in self.issued]
+        if not positions:
+            return []
+
+        q, r = np.array(positions).T
+        centers = self.center(level, q, r)
+        corners = centers[:, None, :] + size * CORNERS
+
+        keep = [any(convex_overlap(c, area) for area in self.areas) for c in corners]
+        centers, corners = centers[keep], corners[keep]
+        positions = [p for p, k in zip(positions, keep) if k]
+        if not positions:
+            return []
+
+        center_lat_lon = self.unproject(centers)
+        corner_lat_lon = self.unproject(corners)
+        miles = geometry.cover_miles(center_lat_lon, corner_lat_lon)
+
+        cells = []
+        for (q, r), c, v, mi in zip(positions, center_lat_lon, corner_lat_lon, miles):
+            self.issued.add((level, q, r, min_diff, max_diff))
+            cells.append(Cell(self, level, q, r, [Coordinate(float(lat), float(lon)) for lat, lon in v],
+                              Coordinate(float(c[0]), float(c[1])), float(mi), min_diff, max_diff))
+
+        return cells
@@ -0,0 +1,203 @@
+"""Crag Tree
+
+Contains the CragTree class, an index of the area hierarchy in route location paths with aggregate scores
+"""
+import heapq
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+
+class CragNode:
+    """An area in the crag tree
+
+    Parameters
+    ----------
+    name : str
+        The area's name
+    parent : CragNode
+        The area containing this area, None for the root of the tree
+    """
+
+    def __init__(self, name: str, parent: 'CragNode' = None):
+        self.name = name
+        self.parent = parent
+        self.children: Dict[str, CragNode] = {}
+
+        self.score = 0.0
+        """The sum of the scores of every route in the area and its sub-areas, an array with one sum per profile if
+        the tree holds several scores per route
+        """
+        self.count = 0
+        """The number of routes in the area and its sub-areas
+        """
+        self.direct_count = 0
+        """The number of routes whose location ends at this area
+        """
+
+    def walk(self) -> Iterator['CragNode']:
+        """Iterates over the area and all of its sub-areas
+
+        Returns
+        -------
+        nodes : Iterator[CragNode]
+            The area followed by its sub-areas, depth first
+        """
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.children.values())
+
+
+class CragTree:
+    """The hierarchy of areas found in route location paths
+
+    Every area keeps the total score and number of routes below it. These are updated along the route's path as routes
+    are added, so ranking the areas within a parent area only visits that area's subtree.
+    """
+
+    def __init__(self):
+        self.root = CragNode(None)
+        self.nodes: Dict[str, List[CragNode]] = {}
+        """Every area with a given name, names are not unique across MP
+        """
+
+    def add(self, location: Sequence[str], score: float, count: int = 1):
+        """Adds routes to the tree
+
+        Parameters
+        ----------
+        location : Sequence[str]
+            The route's location path from the broadest area to the crag
+        score : float or np.ndarray
+            The route's score, or the sum of the scores if adding several routes with the same location. An array
+            adds one score per profile.
+        count : int
+            The number of routes being added
+
+        Returns
+        -------
+        nothing
+        """
+        node = self.root
+        node.score += score
+        node.count += count
+
+        for name in location:
+            child = node.children.get(name)
+            if child is None:
+                child = node.children[name] = CragNode(name, node)
+                self.nodes.setdefault(name, []).append(child)
+
+            node = child
+            node.score += score
+            node.count += count
+
+        node.direct_count += count
+
+    @classmethod
+    def from_routes(cls, routes: Iterable) -> 'CragTree':
+        """Builds a tree from rated routes
+
+        Parameters
+        ----------
+        routes : Iterable[RatedRoute]
+            Routes with a location and a score
+
+        Returns
+        -------
+        tree : CragTree
+            The tree of the routes' areas
+        """
+        tree = cls()
+        for r in routes:
+            tree.add(r.location, r.score)
+
+        return tree
+
+    @classmethod
+    def from_table(cls, table, scores: np.ndarray) -> 'CragTree':
+        """Builds a tree from a route table
+
+        Parameters
+        ----------
+        table : RouteTable
+            The routes
+        scores : np.ndarray
+            The score of each route in the table, or profiles x routes scores to keep one score per profile, see
+            :func:`scoring.score_profiles`
+
+        Returns
+        -------
+        tree : CragTree
+            The tree of the routes' areas
+        """
+        tree = cls()
+        tree.add_table(table, scores)
+
+        return tree
+
+    def add_table(self, table, scores: np.ndarray):
+        """Adds the routes of a table to the tree
+
+        Routes are first summed per location path so each distinct path is only walked once. Tables can be added as
+        they are crawled, e.g. from :meth:`mountain_project.stream_routes`, and the tree ranked at any time.
+
+        Parameters
+        ----------
+        table : RouteTable
+            The routes
+        scores : np.ndarray
+            The score of each route in the table, or profiles x routes scores, the same as for every other table added
+
+        Returns
+        -------
+        nothing
+        """
+        n = len(table.locations)
+        counts = np.bincount(table.location, minlength=n)
+        if np.ndim(scores) == 1:
+            totals = np.bincount(table.location, weights=scores, minlength=n).tolist()
+        else:
+            totals = np.array([np.bincount(table.location, weights=s, minlength=n) for s in scores]).T
+
+        for location, total, count in zip(table.locations, totals, counts):
+            if count:
+                self.add(location, total, int(count))
+
+    def rank(self, parent_crag: str = None, base_only: bool = False,
+             top_k: int = None, column: int = None) -> List[Tuple[str, float]]:
+        """Ranks the areas within a parent area by score
+
+        Parameters
+        ----------
+        parent_crag : str
+            The area to rank within, the parent is included in the results. All areas are ranked if None.
+        base_only : bool
+            Only rank base level crags, areas that routes are directly in
+        top_k : int
+            Only return the best top_k areas, all are returned if None
+        column : int
+            The profile to rank by if the tree holds several scores per route
+
+        Returns
+        -------
+        ranked : List[Tuple[str, float]]
+            (name, score) of each area with a score above 0, best first
+        """
+        if parent_crag is None:
+            nodes = (n for n in self.root.walk() if n is not self.root)
+        else:
+            nodes = (n for p in self.nodes.get(parent_crag, []) for n in p.walk())
+
+        if column is None:
+            scored = ((n, n.score) for n in nodes)
+        else:
+            scored = ((n, float(n.score[column]) if n.count else 0.0) for n in nodes)
+
+        ranked = ((n.name, score) for n, score in scored if score > 0 and (not base_only or n.direct_count))
+
+        if top_k is None:
+            return sorted(ranked, key=lambda kv: kv[1], reverse=True)
+        return heapq.nlargest(top_k, ranked, key=lambda kv: kv[1])
@@ -0,0 +1,261 @@
+"""Crawl Tracing
+
+Contains the CrawlTracer class, a structured record of every triangle a crawl visits and where the crawl's time goes
+"""
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import List
+
+import numpy as np
+
+
+class CrawlTracer:
+    """Records the visits and timed spans of a crawl
+
+    Set :data:`mountain_project.tracer` to a tracer to record a crawl. Each triangle that is fetched is a visit with
+    its depth, query, where the answer came from, the HTTP latency, the number of routes, whether MP's limit was hit,
+    and how many of the routes had already been seen. Triangles split before they are fetched are recorded as skipped
+    visits. Cache lookups, requests, storing responses, and geometry are timed as spans.
+
+    The record can be written as JSON lines, one visit per line, or as a Chrome trace that can be opened in
+    chrome://tracing or Perfetto to see the crawl as a timeline per worker thread.
+    """
+
+    def __init__(self):
+        self.visits: List[dict] = []
+        """A dictionary for each visit in the order they finished
+        """
+        self.spans: List[tuple] = []
+        """(name, thread, start, end) of each timed span, times are seconds since the tracer was created
+        """
+        self.seen = set()
+        """The ids of every route fetched so far
+        """
+
+        self._start = time.perf_counter()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _thread(self) -> int:
+        """A small number for the calling thread, used as the thread id in the Chrome trace
+        """
+        return self._threads.setdefault(threading.get_ident(), len(self._threads))
+
+    def now(self) -> float:
+        """Seconds since the tracer was created
+
+        Returns
+        -------
+        now : float
+            The tracer's clock
+        """
+        return time.perf_counter() - self._start
+
+    @contextmanager
+    def span(self, name: str):
+        """Times a block of the crawl
+
+        Parameters
+        ----------
+        name : str
+            What the block does, e.g. 'cache', 'http', or 'geometry'
+        """
+        start = self.now()
+        try:
+            yield
+        finally:
+            end = self.now()
+            with self._lock:
+                self.spans.append((name, self._thread(), start, end))
+
+    def visit(self, triangle, source: str, start: float, http_seconds: float, ids: List[int], saturation: int = 500):
+        """Records a fetched triangle
+
+        Parameters
+        ----------
+        triangle : Triangle
+            The triangle that was fetched
+        source : str
+            Where the routes came from, 'cache', 'covering', or 'network'
+        start : float
+            When the fetch started on the tracer's clock
+        http_seconds : float
+            Time spent waiting for MP, 0 if the routes came from the cache
+        ids : List[int]
+            The ids of the routes returned
+        saturation : int
+            The number of routes MP returns at most
+
+        Returns
+        -------
+        nothing
+        """
+        end = self.now()
+        with self._lock:
+            overlap = sum(i in self.seen for i in ids)
+            self.seen.update(ids)
+            self.visits.append({
+                'depth': getattr(triangle, 'depth', 0),
+                'lat': triangle.mini_center.lat,
+                'lon': triangle.mini_center.lon,
+                'radius': triangle.mini_miles,
+                'min_diff': triangle.minDiff,
+                'max_diff': triangle.maxDiff,
+                'source': source,
+                'start': start,
+                'seconds': end - start,
+                'http_seconds': http_seconds,
+                'routes': len(ids),
+                'saturated': len(ids) >= saturation,
+                'overlap': overlap,
+                'thread': self._thread(),
+            })
+
+    def skip(self, triangle, reason: str):
+        """Records a triangle that was split before it was fetched
+
+        Parameters
+        ----------
+        triangle : Triangle
+            The triangle that was split
+        reason : str
+            Why it was split, 'too_large' or 'avoided'
+
+        Returns
+        -------
+        nothing
+        """
+        now = self.now()
+        with self._lock:
+            self.visits.append({
+                'depth': getattr(triangle, 'depth', 0),
+                'lat': triangle.mini_center.lat,
+                'lon': triangle.mini_center.lon,
+                'radius': triangle.mini_miles,
+                'min_diff': triangle.minDiff,
+                'max_diff': triangle.maxDiff,
+                'source': reason,
+                'start': now,
+                'seconds': 0.0,
+                'http_seconds': 0.0,
+                'routes': 0,
+                'saturated': reason == 'avoided',
+                'overlap': 0,
+                'thread': self._thread(),
+            })
+
+    def write_jsonl(self, path: str):
+        """Writes the visits as JSON lines
+
+        Parameters
+        ----------
+        path : str
+            The file to write
+
+        Returns
+        -------
+        nothing
+        """
+        with open(path, 'w') as f:
+            for visit in self.visits:
+                f.write(json.dumps(visit) + '\n')
+
+    def write_chrome_trace(self, path: str):
+        """Writes the visits and spans in the Chrome trace event format
+
+        Visits are complete events with their fields as arguments, spans are nested inside them on the same thread.
+
+        Parameters
+        ----------
+        path : str
+            The file to write
+
+        Returns
+        -------
+        nothing
+        """
+        def us(seconds):
+            return round(seconds * 1e6, 1)
+
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 0, 'tid': tid, 'args': {'name': 'worker {}'.format(tid)}}
+                  for tid in self._threads.values()]
+        for v in self.visits:
+            name = '{} {:.3g} mi {}-{}'.format(v['source'], v['radius'], v['min_diff'], v['max_diff'])
+            if v['seconds']:
+                events.append({'name': name, 'cat': 'visit', 'ph': 'X', 'pid': 0, 'tid': v['thread'],
+                               'ts': us(v['start']), 'dur': us(v['seconds']), 'args': v})
+            else:
+                events.append({'name': name, 'cat': 'visit', 'ph': 'i', 's': 't', 'pid': 0, 'tid': v['thread'],
+                               'ts': us(v['start']), 'args': v})
+        for name, tid, start, end in self.spans:
+            events.append({'name': name, 'cat': 'span', 'ph': 'X', 'pid': 0, 'tid': tid, 'ts': us(start),
+                           'dur': us(end - start)})
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def summary(self) -> dict:
+        """Totals of the crawl
+
+        Returns
+        -------
+        summary : dict
+            Visit counts by source, span time by name, the time spent on saturated requests, route overlap, and the
+            radii of saturated and complete network requests
+        """
+        with self._lock:
+            visits = list(self.visits)
+            spans = list(self.spans)
+
+        sources = Counter(v['source'] for v in visits)
+        span_seconds = Counter()
+        for name, _, start, end in spans:
+            span_seconds[name] += end - start
+
+        network = [v for v in visits if v['source'] == 'network']
+        saturated = [v['radius'] for v in network if v['saturated']]
+        complete = [v['radius'] for v in network if not v['saturated']]
+        fetched = sum(v['routes'] for v in visits)
+
+        def percentiles(radii):
+            if not radii:
+                return None
+            return dict(zip(('min', 'p50', 'p90', 'max'), np.percentile(radii, [0, 50, 90, 100]).tolist()))
+
+        return {
+            'wall_seconds': self.now(),
+            'visits': dict(sources),
+            'max_depth': max((v['depth'] for v in visits), default=0),
+            'span_seconds': dict(span_seconds),
+            'saturated_requests': len(saturated),
+            'saturated_http_seconds': sum(v['http_seconds'] for v in network if v['saturated']),
+            'routes_returned': fetched,
+            'unique_routes': len(self.seen),
+            'overlap_ratio': sum(v['overlap'] for v in visits) / fetched if fetched else 0.0,
+            'saturated_radius': percentiles(saturated),
+            'complete_radius': percentiles(complete),
+        }
+
+    def report(self):
+        """Prints the summary of the crawl
+
+        Returns
+        -------
+        nothing
+        """
+        s = self.summary()
+        print('Crawl took {:.1f} s, max depth {}'.format(s['wall_seconds'], s['max_depth']))
+        print('Visits: ' + ', '.join('{} {}'.format(n, source) for source, n in sorted(s['visits'].items())))
+        print('Time: ' + ', '.join('{} {:.2f} s'.format(name, seconds)
+                                   for name, seconds in sorted(s['span_seconds'].items())))
+        print('{} saturated requests wasted {:.2f} s waiting for MP'.format(s['saturated_requests'],
+                                                                           s['saturated_http_seconds']))
+        print('{} routes returned, {} unique, {:.0%} already seen'.format(s['routes_returned'], s['unique_routes'],
+                                                                         s['overlap_ratio']))
+        for name in ('saturated_radius', 'complete_radius'):
+            if s[name]:
+                print('{} miles: '.format(name.replace('_', ' ').capitalize()) +
+                      ', '.join('{} {:.3g}'.format(k, v) for k, v in s[name].items()))
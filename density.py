@@ -0,0 +1,128 @@
+"""Route Density
+
+Contains the DensityModel class, a history of route positions used to predict which queries will be saturated
+"""
+import os
+import sqlite3
+import threading
+from typing import List
+
+import numpy as np
+
+from coordinate import haversine_miles, EARTH_RADIUS_MILES
+
+
+class DensityModel:
+    """Predicts query saturation from the routes seen in previous crawls
+
+    The position of every route that has been fetched is kept in a table next to the response cache. Routes are not
+    deleted when a cache entry expires, so after one crawl the model knows where the dense areas are. The number of
+    known routes inside a circle is a lower bound of what MP will find there, so if it is at least the saturation
+    limit the query is certain to be saturated and can be skipped. Where there is no history the count is zero and
+    nothing is skipped.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite file the history is stored in, normally the response cache's file
+    """
+
+    def __init__(self, path: str = os.path.join('cache', 'routes.sqlite')):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database connection, the file and table are created the first time it is used
+
+        Returns
+        -------
+        connection : sqlite3.Connection
+            Connection shared by all threads, access is serialized with the model's lock
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS route_positions ('
+                                     'id INTEGER PRIMARY KEY, lat REAL, lon REAL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS route_positions_area '
+                                     'ON route_positions (lat, lon)')
+            self._connection.commit()
+
+        return self._connection
+
+    def record(self, routes: List[dict]):
+        """Adds the positions of fetched routes to the history
+
+        Parameters
+        ----------
+        routes : List[dict]
+            Routes as returned by MP
+
+        Returns
+        -------
+        nothing
+        """
+        with self._lock:
+            self.connection.executemany('INSERT OR REPLACE INTO route_positions VALUES (?, ?, ?)',
+                                        [(r['id'], r['latitude'], r['longitude']) for r in routes])
+            self.connection.commit()
+
+    def count(self, lat: float, lon: float, radius: float) -> int:
+        """The number of known routes within a circle
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the circle's center
+        lon : float
+            Longitude of the circle's center
+        radius : float
+            Radius of the circle in miles
+
+        Returns
+        -------
+        count : int
+            Number of routes in the history that are inside the circle
+        """
+        # Bounding box of the circle in degrees
+        d_lat = np.degrees(radius / EARTH_RADIUS_MILES)
+        d_lon = d_lat / max(np.cos(np.radians(lat)), 1e-6)
+
+        with self._lock:
+            rows = self.connection.execute('SELECT lat, lon FROM route_positions '
+                                           'WHERE lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?',
+                                           (lat - d_lat, lat + d_lat, lon - d_lon, lon + d_lon)).fetchall()
+
+        if not rows:
+            return 0
+
+        positions = np.array(rows)
+
+        return int(np.count_nonzero(haversine_miles(lat, lon, positions[:, 0], positions[:, 1]) <= radius))
+
+    def saturates(self, lat: float, lon: float, radius: float, saturation: int = 500) -> bool:
+        """Checks if a query is known to return at least saturation routes
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the query's center
+        lon : float
+            Longitude of the query's center
+        radius : float
+            Radius of the query in miles
+        saturation : int
+            The number of results at which a query is truncated
+
+        Returns
+        -------
+        saturated : bool
+            Whether the history already has enough routes in the circle to saturate the query
+        """
+        return self.count(lat, lon, radius) >= saturation
@@ -24,10 +24,11 @@ def gen_settings(key='your_key_here'):
     # Create Configuration parser
     config = configparser.ConfigParser()
 
-    # Add Key to configuration
-    config['MP API'] = {'key': key}
+    # Add Key to configuration, the base url can point at a local stand-in server (see mp_standin.py). daily_quota is
+    # the number of requests allowed per key per day, 0 for no limit
+    config['MP API'] = {'key': key, 'base_url': 'https://www.mountainproject.com/data', 'daily_quota': '0'}
 
-    # Add score settings
+    # Add score settings, more profiles can be added as [SCORE name] sections with the same keys
     config['SCORE'] = {
         'required': 'sport',
         'optional': 'tr',
@@ -38,6 +39,51 @@ def gen_settings(key='your_key_here'):
         'max_pitches': '1',
     }
 
+    # Add crawl settings, workers is the number of requests in flight, more finish sooner but each request sent before
+    # its neighbors finish can not use their routes to skip saturated queries, 4 makes about 10% more requests than 1.
+    # trace is a file name prefix for the crawl's .jsonl and .trace.json records, blank for none. covering is triangles
+    # to split triangles or hex for the hexagonal cells of covering.py. region is a GeoJSON file of the area to crawl,
+    # blank for all of Colorado. rank_interval is how often, in seconds, the best crags so far are printed during a
+    # crawl, 0 for never. checkpoint is a file name prefix to save the crawl's progress to every checkpoint_interval
+    # seconds, an interrupted crawl resumes from it, blank for none. refresh fetches the routes of an existing snapshot
+    # again by id and updates the snapshot instead of only loading it
+    config['CRAWL'] = {
+        'workers': '4',
+        'covering': 'triangles',
+        'region': '',
+        'snapshot': 'snapshot',
+        'trace': '',
+        'rank_interval': '5',
+        'checkpoint': 'checkpoint',
+        'checkpoint_interval': '60',
+        'refresh': 'false',
+    }
+
+    # Add cache settings
+    config['CACHE'] = {
+        'path': os.path.join('cache', 'routes.sqlite'),
+        'ttl_days': '30',
+    }
+
+    # Add HTTP settings
+    config['HTTP'] = {
+        'retries': '3',
+        'backoff': '0.5',
+        'connect_timeout': '5',
+        'read_timeout': '30',
+        'pool_size': '10',
+    }
+
+    # Add rate limit settings, requests start at rate per second and adapt between min_rate and max_rate, slowing
+    # down when responses take longer than target_latency seconds or MP answers 429 Too Many Requests
+    config['RATE LIMIT'] = {
+        'rate': '5',
+        'burst': '5',
+        'min_rate': '0.2',
+        'max_rate': '20',
+        'target_latency': '2',
+    }
+
     # Check if settings already exists and read in old values to prevent overwriting old settings
     if os.path.isfile(SETTINGS_FILE):
         config.read(SETTINGS_FILE)
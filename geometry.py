@@ -0,0 +1,106 @@
+"""Batch Geometry
+
+Vectorized geometry for whole frontiers of triangles at once. Triangles are given as an N x 3 x 2 array of vertices in
+(lat, lon) order and, like :class:`coordinate.Coordinate`, distances between vertices are measured in degrees.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from coordinate import haversine_miles
+
+SIDES = np.array([[0, 1], [0, 2], [1, 2]])
+"""The vertex indices of each side of a triangle, in the order sides are compared when looking for the longest
+"""
+
+
+def side_lengths(vertices: np.ndarray) -> np.ndarray:
+    """The lengths of each triangle's sides
+
+    Parameters
+    ----------
+    vertices : np.ndarray
+        N x 3 x 2 array of triangle vertices
+
+    Returns
+    -------
+    lengths : np.ndarray
+        N x 3 array of side lengths in degrees, sides are ordered as in :data:`SIDES`
+    """
+    return np.linalg.norm(vertices[:, SIDES[:, 0]] - vertices[:, SIDES[:, 1]], axis=2)
+
+
+def miniballs(vertices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Finds the smallest circle enclosing each triangle
+
+    For a right or obtuse triangle this is the circle with the longest side as its diameter, otherwise it is the
+    circumcircle.
+
+    Parameters
+    ----------
+    vertices : np.ndarray
+        N x 3 x 2 array of triangle vertices
+
+    Returns
+    -------
+    centers : np.ndarray
+        N x 2 array of circle centers in (lat, lon) order
+    radii : np.ndarray
+        N array of circle radii in degrees
+    """
+    vertices = np.asarray(vertices, dtype=float)
+    n = len(vertices)
+
+    # Work relative to the first vertex for precision
+    origin = vertices[:, 0]
+    b = vertices[:, 1] - origin
+    c = vertices[:, 2] - origin
+
+    lengths = side_lengths(vertices)
+    longest = lengths.argmax(axis=1)
+    sq = lengths ** 2
+    # The angle opposite the longest side is at least 90 degrees
+    obtuse = 2 * sq.max(axis=1) >= sq.sum(axis=1)
+
+    # Midpoint of the longest side
+    ends = vertices[np.arange(n)[:, None], SIDES[longest]]
+    centers = ends.mean(axis=1)
+    radii = lengths.max(axis=1) / 2
+
+    # Circumcircle for acute triangles
+    d = 2 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+    acute = ~obtuse & (d != 0)
+    if acute.any():
+        b, c, d = b[acute], c[acute], d[acute]
+        b2 = (b ** 2).sum(axis=1)
+        c2 = (c ** 2).sum(axis=1)
+        u = np.stack([(c[:, 1] * b2 - b[:, 1] * c2) / d,
+                      (b[:, 0] * c2 - c[:, 0] * b2) / d], axis=1)
+
+        centers[acute] = origin[acute] + u
+        radii[acute] = np.linalg.norm(u, axis=1)
+
+    return centers, radii
+
+
+def cover_miles(centers: np.ndarray, vertices: np.ndarray) -> np.ndarray:
+    """The radius in miles a query around each center needs to cover its whole triangle, or hexagonal cell
+
+    A circle in degrees stretches north to south once measured in miles, so the radius is the distance to the farthest
+    vertex rather than the miniball radius converted east to west.
+
+    Parameters
+    ----------
+    centers : np.ndarray
+        N x 2 array of query centers in (lat, lon) order
+    vertices : np.ndarray
+        N x K x 2 array of the vertices of each triangle or cell
+
+    Returns
+    -------
+    miles : np.ndarray
+        N array of radii in miles
+    """
+    distances = haversine_miles(centers[:, None, 0], centers[:, None, 1], vertices[..., 0], vertices[..., 1])
+
+    return distances.max(axis=1)
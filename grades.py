@@ -0,0 +1,152 @@
+"""Climbing Grades
+
+Contains the grade parser for MP ratings, the ladder of grades MP accepts as difficulty filters, and helpers for
+splitting difficulty ranges
+"""
+import math
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Tuple
+
+YDS_GRADES = ['5.{}'.format(n) for n in range(10)] + ['5.{}{}'.format(n, l) for n in range(10, 16) for l in 'abcd']
+"""Every YDS grade from easiest to hardest at the resolution MP filters by
+
+Grades from 5.10 up are split into their letter grades.
+"""
+
+
+def grade_index(grade: str, upper: bool = False) -> int:
+    """Finds a grade's position in :data:`YDS_GRADES`
+
+    Grades from 5.10 up without a letter cover all four letters, so they map to the 'a' grade when they are the lower
+    end of a range and the 'd' grade when they are the upper end.
+
+    Parameters
+    ----------
+    grade : str
+        A YDS grade, e.g. '5.7', '5.10', or '5.11c'
+    upper : bool
+        Whether the grade is the upper end of a range
+
+    Returns
+    -------
+    index : int
+        The position of the grade in the ladder
+    """
+    if grade in YDS_GRADES:
+        return YDS_GRADES.index(grade)
+
+    # Grade without a letter
+    return YDS_GRADES.index(grade + ('d' if upper else 'a'))
+
+
+def bisect_grades(min_diff: str, max_diff: str) -> List[Tuple[str, str]]:
+    """Splits a range of grades into two halves
+
+    Parameters
+    ----------
+    min_diff : str
+        The easiest grade in the range
+    max_diff : str
+        The hardest grade in the range
+
+    Returns
+    -------
+    ranges : List[Tuple[str, str]]
+        The (min_diff, max_diff) of the easier and harder halves, empty if the range is a single grade and can not be
+        split any further
+    """
+    low = grade_index(min_diff)
+    high = grade_index(max_diff, upper=True)
+
+    if low >= high:
+        return []
+
+    mid = (low + high) // 2
+
+    return [(YDS_GRADES[low], YDS_GRADES[mid]), (YDS_GRADES[mid + 1], YDS_GRADES[high])]
+
+
+class Grade(NamedTuple):
+    """The numeric grades in a rating, one field per grade system
+
+    Systems missing from the rating are NaN. YDS grades keep the numbering of
+    :meth:`route.RatedRoute.str2num_rating`, e.g. 5.10a -> 10.1, and the other systems use their number with + and -
+    adding or removing a quarter grade and ranges such as V3-4 taking the middle.
+    """
+    yds: float = math.nan
+    boulder: float = math.nan
+    ice: float = math.nan
+    mixed: float = math.nan
+    aid: float = math.nan
+
+
+GRADE_SYSTEMS = Grade._fields
+"""The names of the supported grade systems
+"""
+
+_YDS = re.compile(r'5\.(\d+)([abcd+-]?)')
+_YDS_CLASSES = {'3rd': -2.0, '4th': -1.0, 'Easy 5th': 0.0}
+_SYSTEMS = {
+    'boulder': re.compile(r'\bV(\d+|B|-easy)(?:-(\d+))?([+-]?)'),
+    'ice': re.compile(r'\b[WA]I(\d+)(?:-(\d+))?([+-]?)'),
+    'mixed': re.compile(r'\bM(\d+)(?:-(\d+))?([+-]?)'),
+    'aid': re.compile(r'\b[AC](\d)(?:-(\d))?([+-]?)'),
+}
+_BOULDER_EASY = {'B': -1, '-easy': -1}
+_MODIFIERS = {'': 0, '+': 0.25, '-': -0.25}
+
+
+@lru_cache(maxsize=None)
+def parse_rating(rating: str) -> Grade:
+    """Parses every grade in a MP rating
+
+    Ratings come from a small set of distinct strings, so each one is only parsed once per process.
+
+    Parameters
+    ----------
+    rating : str
+        A rating from MP, e.g. '5.10a PG13', 'V3-4', 'WI4 M5', or '5.9 C2'
+
+    Returns
+    -------
+    grade : Grade
+        The numeric grade in each system, NaN for systems not in the rating
+    """
+    if not rating:
+        return Grade()
+
+    grades = {}
+
+    # YDS, matched at the start of the rating
+    yds = _YDS.match(rating)
+    if yds is not None:
+        base = int(yds.group(1))  # Climb's Grade
+        suf = yds.group(2)  # Climb's Grade Modifier
+
+        # map modifier
+        # a, b, c, d, +, -> 1, 2, 3, 4, 2.5, -2.5
+        dec = int(ord(suf) - 96) if len(suf) > 0 else 0
+        dec = 2.5 if suf == '+' else dec
+        dec = -2.5 if suf == '-' else dec
+
+        grades['yds'] = base + dec / 10
+    else:
+        for prefix, value in _YDS_CLASSES.items():
+            if rating.startswith(prefix):
+                grades['yds'] = value
+
+    # Other grade systems, anywhere in the rating
+    for system, pattern in _SYSTEMS.items():
+        match = pattern.search(rating)
+        if match is None:
+            continue
+
+        number, upper, modifier = match.groups()
+        value = _BOULDER_EASY[number] if number in _BOULDER_EASY else int(number)
+        if upper is not None:
+            value = (value + int(upper)) / 2
+
+        grades[system] = value + _MODIFIERS[modifier]
+
+    return Grade(**grades)
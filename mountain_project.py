@@ -1,61 +1,174 @@
 """Mountain Project
 
 This module contains methods and attributes for interfacing with Mountain Project
-
-Notes
------
-In order to prevent the cache from being cleared, modification of the send_request method should be avoided.
 """
 from triangle import Triangle
-from typing import List, Set, Tuple
+from typing import Iterable, Iterator, List, Set, Tuple, Union, TYPE_CHECKING
 from route import Route
+from route_table import RouteTable
 
-from ipyleaflet import Map, Polygon
-from matplotlib.cm import get_cmap
-from itertools import cycle
+import copy
+import time
+from collections import defaultdict, deque, Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
 
-import requests
 import gen_settings
-from joblib import Memory
+from transport import Transport
+from response_cache import ResponseCache
+from density import DensityModel
+from crawl_trace import CrawlTracer
+from rate_limit import TokenBucket, QuotaCounter
+
+import requests
+
+if TYPE_CHECKING:  # Map support is optional and loaded by the visualization module only when a map is used
+    from ipyleaflet import Map
+    from region import Region
+    from checkpoint import Checkpoint
+
+cache = ResponseCache()
+"""The cache of routes returned by previous queries, replace with ResponseCache.from_config to use the cache settings
+"""
+
+density = DensityModel()
+"""History of fetched route positions used to skip requests that are certain to be saturated
+"""
+
+transport = Transport()
+"""The pooled HTTP transport used for all requests, replace with Transport.from_config to use the HTTP settings
+"""
+
+
+limiter: TokenBucket = None
+"""Paces the requests of every thread when set, see :class:`rate_limit.TokenBucket`
+"""
+
+quota: QuotaCounter = None
+"""Counts the requests made with each key per day and stops a crawl that would go over the quota when set, see
+:class:`rate_limit.QuotaCounter`
+"""
 
-cache_dir = 'cache'
-memory = Memory(cache_dir, verbose=0)
+THROTTLE_RETRIES = 10
+"""The number of times a request answered with HTTP 429 Too Many Requests is retried after backing off
+"""
 
 
-@memory.cache
 def send_request(url, params):
-    return requests.get(url, params=params)
+    """
+    Sends a request to MP, waiting for the rate limiter and counting it against the day's quota
+
+    Requests throttled with HTTP 429 are retried after the Retry-After delay, which also slows the limiter down.
+
+    Parameters
+    ----------
+    url : str
+        The url to request
+    params : dict
+        The query parameters, including the API key
+
+    Returns
+    -------
+    response : requests.Response
+        The successful response
+    """
+    for attempt in range(THROTTLE_RETRIES + 1):
+        if quota is not None:
+            quota.take(params.get('key'))
+        if limiter is not None:
+            with trace_span('rate_limit'):
+                limiter.acquire()
+
+        sent = time.perf_counter()
+        try:
+            response = transport.get(url, params)
+        except requests.HTTPError as e:
+            # After too many tries being throttled is an error like any other
+            if e.response is None or e.response.status_code != 429 or attempt == THROTTLE_RETRIES:
+                raise
+            try:
+                retry_after = float(e.response.headers.get('Retry-After'))
+            except (TypeError, ValueError):
+                retry_after = None
+
+            if limiter is not None:
+                limiter.throttle(retry_after)
+            else:
+                time.sleep(1.0 if retry_after is None else retry_after)
+            continue
+
+        if limiter is not None:
+            limiter.success(time.perf_counter() - sent)
+
+        return response
 
 
 MP_API_KEY = None
 """Stores the MP API Key
 """
 
-# Create a color map generator
-cm = get_cmap(name='tab10')
-cm255 = [[int(rgb * 255) for rgb in c] for c in cm.colors]
-cm_hex = ['#%02X%02X%02X' % tuple(c) for c in cm255]
-colors = cycle(cm_hex)
+MP_BASE_URL = 'https://www.mountainproject.com/data'
+"""The base url of MP's data API, can point at a stand-in server such as :class:`mp_standin.StandinServer`
+"""
+
+CRAWL_WORKERS = 1
+"""The number of requests process_triangles keeps in flight, 1 crawls depth first one request at a time
+"""
+
+ROUTE_IDS_PER_REQUEST = 100
+"""The number of route ids asked for in each get-routes request when refreshing known routes
+"""
+
+crawl_stats = Counter()
+"""Counts of saturated requests made, saturated requests avoided by the density history, truncated triangles, and
+routes fetched including duplicates, reset when :meth:`crawl` starts
+"""
+
+tracer: CrawlTracer = None
+"""Records every triangle visit and timed span of a crawl when set, see :class:`crawl_trace.CrawlTracer`
+"""
+
+
+def trace_span(name: str):
+    """Times a block of the crawl if a tracer is set
+
+    Parameters
+    ----------
+    name : str
+        What the block does
+
+    Returns
+    -------
+    span : ContextManager
+        The tracer's span, or a context that does nothing
+    """
+    return nullcontext() if tracer is None else tracer.span(name)
 
 
 def next_color():
     """
     Returns the next color in the color map generator
+
+    Loads the plotting stack on first use, see :func:`visualization.next_color`
     Returns
     -------
     color : str
-        A string containing the next hex color code, cycles forever through cm_hex
+        A string containing the next hex color code
     """
-    return next(colors)
+    import visualization
+
+    return visualization.next_color()
 
 
-def process_triangles(triangles: List[Triangle], m: Map = None) -> Set[Triangle]:
+def process_triangles(triangles: List[Triangle], m: 'Map' = None, workers: int = None,
+                      region: 'Region' = None, checkpoint: 'Checkpoint' = None) -> Set[Triangle]:
     """
     Searches through a list of triangles and finds the routes within each triangle, optionally plots the results on a
     map as it goes. If a triangle is too large or contains to many routes it is split into smaller triangles and the
-    method is recursively called with the split triangles as an argument. Splitting can also be done by grade if the
-    triangles get too small, but still contain too many routes. Routes and the final set of triangles are stored in
-    a set.
+    split triangles are searched in turn. Splitting can also be done by grade if the triangles get too small, but still
+    contain too many routes. Routes and the final set of triangles are stored in a set.
+
+    Waits for the whole crawl, use :meth:`crawl` or :meth:`stream_routes` to use the results as they are found.
     Parameters
     ----------
     triangles : List[Triangle]
@@ -63,6 +176,13 @@ def process_triangles(triangles: List[Triangle], m: Map = None) -> Set[Triangle]
     m : Map
         An optional map object that can be used to plot the progress as it goes. If no map is provided progress is
         reported in the log.
+    workers : int
+        The number of requests to keep in flight, defaults to CRAWL_WORKERS. If more than one the requests are sent
+        in parallel by :meth:`crawl_frontier`.
+    region : Region
+        An optional area to crawl, split triangles entirely outside it are dropped and routes outside it are removed
+    checkpoint : Checkpoint
+        An optional record of the crawl's progress to save to and resume from, see :meth:`crawl`
 
     Returns
     -------
@@ -70,38 +190,509 @@ def process_triangles(triangles: List[Triangle], m: Map = None) -> Set[Triangle]
         A set containing the final triangles
 
     """
-    # Create Storage set
-    final_triangles = set()
+    return set(crawl(triangles, m, workers, region, checkpoint))
+
 
-    for triangle in triangles:
-        # If the triangle is too large break into two smaller triangles and try again
-        if triangle.mini_miles > 100:  # Triangle is too large
-            final_triangles.update(process_triangles(triangle.split_triangle(), m))
-        else:  # Triangle is not too large
-            # find routes within the triangle
-            routes = get_routes(triangle, m)
+def process_frontier(triangles: List[Triangle], m: 'Map' = None, workers: int = 8,
+                     region: 'Region' = None) -> Set[Triangle]:
+    """
+    Version of :meth:`process_triangles` that fetches several triangles at once, see :meth:`crawl_frontier`
 
-            # Check if there are more routes in triangle than MP can return in one call
-            if len(routes) >= 500:  # Too many routes within triangle
-                # Check if triangle is smaller than average crag size
-                if triangle.mini_miles > 2:  # Triangle is not too small
-                    # Try again with even smaller triangles
-                    final_triangles.update(process_triangles(triangle.split_triangle(), m))
-                else:  # Triangle is smaller than average crag
-                    # Split the triangle by difficulty and try again
-                    # At this point if there are more than 500 routes of a grade within 2 miles some will be lost
-                    # This is highly unlikely though, so I do not think it will ever need further subdivision.
-                    final_triangles.update(process_triangles(triangle.split_difficulty(), m))
-            else:  # Not too many triangles in the triangle
-                # Add routes in the triangle to the set
-                triangle.routes = routes
-                final_triangles.add(triangle)
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        A list of triangles to find routes in
+    m : Map
+        An optional map object that can be used to plot the progress as it goes
+    workers : int
+        The maximum number of requests in flight at once
+    region : Region
+        An optional area to crawl
 
-    # Send newly found routes back to the previous levels
-    return final_triangles
+    Returns
+    -------
+    final_triangles: Set[Triangle]
+        A set containing the final triangles, the same set :meth:`process_triangles` would return
+    """
+    return set(crawl_frontier(triangles, m, workers, region))
 
 
-def get_routes(triangle: Triangle, m: Map = None) -> List[Route]:
+def crawl(triangles: List[Triangle], m: 'Map' = None, workers: int = None, region: 'Region' = None,
+          checkpoint: 'Checkpoint' = None) -> Iterator[Triangle]:
+    """
+    Searches through a list of triangles like :meth:`process_triangles`, yielding each final triangle as soon as its
+    routes are known
+
+    Only the triangles still waiting to be searched are held, so the caller can drop each triangle, or its routes,
+    once it has used them.
+
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        A list of triangles to find routes in
+    m : Map
+        An optional map object that can be used to plot the progress as it goes, or a
+        :class:`visualization.MapRenderer` to control how often it is drawn
+    workers : int
+        The number of requests to keep in flight, defaults to CRAWL_WORKERS. If more than one the requests are sent
+        in parallel by :meth:`crawl_frontier`, otherwise one at a time by :meth:`crawl_depth_first`.
+    region : Region
+        An optional area to crawl, split triangles entirely outside it are dropped and routes outside it are removed
+    checkpoint : Checkpoint
+        An optional record of the crawl's progress. If it holds an interrupted crawl, its final triangles are yielded
+        and the crawl continues from its frontier instead of from triangles, otherwise it is cleared.
+
+    Returns
+    -------
+    final_triangles: Iterator[Triangle]
+        The final triangles with their routes
+    """
+    if workers is None:
+        workers = CRAWL_WORKERS
+
+    # Count this crawl alone, plus the interrupted crawl it resumes
+    crawl_stats.clear()
+
+    # Pick up where an interrupted crawl left off
+    if checkpoint is not None and checkpoint.exists():
+        triangles, leaves, stats = checkpoint.load()
+        crawl_stats.update(stats)
+        print('Resuming crawl from checkpoint with {} triangles left'.format(len(triangles)))
+        yield from leaves
+    elif checkpoint is not None:
+        # Final triangles of a crawl interrupted before its first save have no frontier to resume from
+        checkpoint.remove()
+
+    # Triangles are drawn in batches, a layer per triangle slows the notebook down more the longer the crawl runs
+    if m is not None:
+        import visualization
+
+        m = visualization.MapRenderer.wrap(m)
+
+    if workers > 1:
+        final_triangles = crawl_frontier(triangles, m, workers, region, checkpoint)
+    else:
+        final_triangles = crawl_depth_first(triangles, m, region, checkpoint)
+
+    try:
+        yield from final_triangles
+        if checkpoint is not None:  # Nothing left to search
+            checkpoint.save([], crawl_stats)
+    finally:
+        if m is not None:
+            m.flush()
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+def crawl_depth_first(triangles: List[Triangle], m: 'Map' = None, region: 'Region' = None,
+                      checkpoint: 'Checkpoint' = None) -> Iterator[Triangle]:
+    """
+    Searches triangles one request at a time, the triangles split from a triangle are searched before its siblings
+
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        A list of triangles to find routes in
+    m : Map
+        An optional map object that can be used to plot the progress as it goes
+    region : Region
+        An optional area to crawl
+    checkpoint : Checkpoint
+        An optional record of the crawl's progress, the stack is saved to it every checkpoint interval
+
+    Returns
+    -------
+    final_triangles: Iterator[Triangle]
+        The final triangles with their routes, in the order they are found
+    """
+    # Triangles waiting to be searched, the next one is on top
+    stack = list(reversed(triangles))
+
+    while stack:
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.save(reversed(stack), crawl_stats)
+
+        triangle = stack.pop()
+
+        # If the triangle is too large or known to be too dense break into smaller triangles and try again
+        split_triangles = split_unfetched(triangle)
+        if split_triangles:  # Triangle is too large
+            stack.extend(reversed(prune(split_triangles, region)))
+            continue
+
+        # find routes within the triangle
+        routes = get_routes(triangle, m)
+
+        # Check if there are more routes in triangle than MP can return in one call
+        split_triangles = split_saturated(triangle, routes)
+        if split_triangles:  # Too many routes within triangle
+            stack.extend(reversed(prune(split_triangles, region)))
+        else:  # Not too many triangles in the triangle
+            triangle.routes = clip(routes, region)
+            if checkpoint is not None:
+                checkpoint.add_leaf(triangle)
+            yield triangle
+
+
+def crawl_frontier(triangles: List[Triangle], m: 'Map' = None, workers: int = 8,
+                   region: 'Region' = None, checkpoint: 'Checkpoint' = None) -> Iterator[Triangle]:
+    """
+    Version of :meth:`crawl_depth_first` that keeps several requests in flight
+
+    Pending triangles are fed to a bounded thread pool, at most workers requests are in flight at once. A triangle is
+    only checked against the size limit and the density history when it is dispatched, so the routes of every request
+    that has finished by then are known. The newest triangles are dispatched first, which keeps the crawl close to
+    depth first order and the history of a triangle's neighbors fresh. Whenever a request finishes its triangle is
+    either yielded or split following the same rules as :meth:`crawl_depth_first`. Progress is plotted or logged from
+    the calling thread only, so the map is never touched by the workers.
+
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        A list of triangles to find routes in
+    m : Map
+        An optional map object that can be used to plot the progress as it goes. If no map is provided progress is
+        reported in the log.
+    workers : int
+        The maximum number of requests in flight at once
+    region : Region
+        An optional area to crawl, split triangles entirely outside it are dropped and routes outside it are removed
+    checkpoint : Checkpoint
+        An optional record of the crawl's progress, the pending triangles and the triangles in flight are saved to it
+        every checkpoint interval
+
+    Returns
+    -------
+    final_triangles: Iterator[Triangle]
+        The final triangles with their routes, in the order their requests finish
+    """
+    # Triangles waiting to be searched, the next one is on top
+    stack = list(reversed(triangles))
+    pending = {}
+    with trace_span('geometry'):
+        Triangle.find_miniballs(stack)
+
+    def push(split_triangles):
+        split_triangles = prune(split_triangles, region)
+        with trace_span('geometry'):
+            Triangle.find_miniballs(split_triangles)
+        stack.extend(reversed(split_triangles))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while stack or pending:
+            # Fill the free workers, splitting triangles that are too large or known to be too dense
+            while stack and len(pending) < workers:
+                triangle = stack.pop()
+                split_triangles = split_unfetched(triangle)
+                if split_triangles:  # Triangle is too large
+                    push(split_triangles)
+                else:
+                    show_progress(triangle, m)
+                    pending[pool.submit(fetch_routes, triangle)] = triangle
+
+            # Wait for at least one request to finish then sort the finished triangles
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                triangle = pending.pop(future)
+                routes = future.result()
+
+                split_triangles = split_saturated(triangle, routes)
+                if split_triangles:  # Too many routes within triangle
+                    push(split_triangles)
+                else:
+                    triangle.routes = clip(routes, region)
+                    if checkpoint is not None:
+                        checkpoint.add_leaf(triangle)
+                    yield triangle
+
+            # Triangles in flight have not finished, so they are searched again when resuming
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save(list(pending.values()) + stack[::-1], crawl_stats)
+
+
+def stream_routes(triangles: List[Triangle], m: 'Map' = None, workers: int = None, region: 'Region' = None,
+                  batch_size: int = 500,
+                  checkpoint: 'Checkpoint' = None) -> Iterator[Tuple[List[Route], List[Triangle]]]:
+    """
+    Crawls triangles like :meth:`crawl`, yielding batches of routes that have not been yielded before
+
+    The final triangles are not kept, so memory is bounded by the triangles waiting to be searched, the batch, and the
+    ids of the routes found so far rather than by every route. Each batch comes with the final triangles found since
+    the last one, which still hold their routes so they can be written to a snapshot, drop them once they are used.
+
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        A list of triangles to find routes in
+    m : Map
+        An optional map object that can be used to plot the progress as it goes
+    workers : int
+        The number of requests to keep in flight, defaults to CRAWL_WORKERS
+    region : Region
+        An optional area to crawl
+    batch_size : int
+        Routes are yielded once at least this many new routes have been found, 1 yields every final triangle's new
+        routes as soon as it is found
+    checkpoint : Checkpoint
+        An optional record of the crawl's progress to save to and resume from, see :meth:`crawl`
+
+    Returns
+    -------
+    batches : Iterator[Tuple[List[Route], List[Triangle]]]
+        Lists of new routes, each route is in exactly one batch, and the final triangles they were found in
+    """
+    seen = set()
+    batch = []
+    leaves = []
+
+    for triangle in crawl(triangles, m, workers, region, checkpoint):
+        for route in triangle.routes:
+            if route.id not in seen:
+                seen.add(route.id)
+                batch.append(route)
+        leaves.append(triangle)
+
+        if len(batch) >= batch_size:
+            yield batch, leaves
+            batch, leaves = [], []
+
+    if batch or leaves:
+        yield batch, leaves
+
+
+def prune(triangles: List[Triangle], region: 'Region' = None) -> List[Triangle]:
+    """
+    Drops split triangles that are entirely outside the region being crawled
+
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        Triangles about to be searched
+    region : Region
+        The area being crawled, nothing is dropped if None
+
+    Returns
+    -------
+    triangles : List[Triangle]
+        The triangles that overlap the region
+    """
+    if region is None:
+        return triangles
+
+    with trace_span('geometry'):
+        return region.prune(triangles)
+
+
+def clip(routes: List[Route], region: 'Region' = None) -> List[Route]:
+    """
+    Removes routes outside the region being crawled
+
+    Parameters
+    ----------
+    routes : List[Route]
+        The routes found in a triangle
+    region : Region
+        The area being crawled, nothing is removed if None
+
+    Returns
+    -------
+    routes : List[Route]
+        The routes inside the region
+    """
+    if region is None:
+        return routes
+
+    return region.clip(routes)
+
+
+def split_unfetched(triangle: Triangle) -> List[Triangle]:
+    """
+    Splits a triangle before it is searched if it is too large or the density history says it will be saturated
+
+    Parameters
+    ----------
+    triangle : Triangle
+        The triangle about to be searched
+
+    Returns
+    -------
+    split_triangles : List[Triangle]
+        The triangles that should be searched instead, empty if the triangle should be searched
+    """
+    with trace_span('geometry'):
+        too_large = triangle.mini_miles > 100
+    if too_large:  # Triangle is too large
+        if tracer is not None:
+            tracer.skip(triangle, 'too_large')
+        with trace_span('geometry'):
+            return triangle.split_triangle()
+
+    # Routes seen in previous crawls only tell us about the full range of difficulties
+    if triangle.minDiff == Triangle.DEFAULT_MIN_DIFF and triangle.maxDiff == Triangle.DEFAULT_MAX_DIFF:
+        with trace_span('density'):
+            saturates = density.saturates(triangle.mini_center.lat, triangle.mini_center.lon, triangle.mini_miles)
+        if saturates:
+            # Already enough known routes in the triangle to saturate the request, skip it
+            crawl_stats['avoided'] += 1
+            if tracer is not None:
+                tracer.skip(triangle, 'avoided')
+            return split_dense(triangle)
+
+    return []
+
+
+def split_saturated(triangle: Triangle, routes: List[Route]) -> List[Triangle]:
+    """
+    Splits a triangle if its query returned as many routes as MP allows
+
+    Parameters
+    ----------
+    triangle : Triangle
+        The triangle that was searched
+    routes : List[Route]
+        The routes found in the triangle
+
+    Returns
+    -------
+    split_triangles : List[Triangle]
+        The triangles that should be searched instead, empty if the triangle's routes are complete or the triangle
+        can not be split any further, in which case it is marked as truncated
+    """
+    crawl_stats['fetched'] += len(routes)
+
+    # Check if there are more routes in triangle than MP can return in one call
+    if len(routes) < 500:  # Not too many routes within triangle
+        return []
+
+    crawl_stats['saturated'] += 1
+    split_triangles = split_dense(triangle)
+
+    if not split_triangles:  # Single grade in a tiny triangle, nothing left to split
+        # Keep what MP returned, but report that some routes are missing
+        triangle.truncated = True
+        crawl_stats['truncated'] += 1
+        print('Warning: more than {n} {grade} routes within {r:g} miles of ({lat:g}, {lon:g}), '
+              'some are missing'.format(n=len(routes), grade=triangle.minDiff, r=triangle.mini_miles,
+                                        lat=triangle.mini_center.lat, lon=triangle.mini_center.lon))
+
+    return split_triangles
+
+
+def split_dense(triangle: Triangle) -> List[Triangle]:
+    """
+    Splits a triangle that contains too many routes for a single query
+
+    Parameters
+    ----------
+    triangle : Triangle
+        The triangle with too many routes
+
+    Returns
+    -------
+    split_triangles : List[Triangle]
+        Smaller triangles, or triangles with narrower difficulty ranges if the triangle is already small. Empty if the
+        triangle is small and already covers a single grade.
+    """
+    # Check if triangle is smaller than average crag size
+    if triangle.mini_miles > 2:  # Triangle is not too small
+        # Try again with even smaller triangles
+        with trace_span('geometry'):
+            return triangle.split_triangle()
+    else:  # Triangle is smaller than average crag
+        # Halve the triangle's difficulty range and try again
+        return triangle.split_difficulty()
+
+
+def estimate_requests(triangles: List[Triangle], region: 'Region' = None, saturation: int = 500) -> int:
+    """
+    Predicts how many requests crawling triangles will make
+
+    The crawl's splits are followed using the density history in place of MP. A triangle that is too large or known
+    to be saturated is split without a request, one the cache can answer costs nothing, and any other is one request
+    that is split again if the history says it will be saturated. The routes of a triangle split by difficulty are
+    assumed to be shared evenly between its halves. The prediction is close once a crawl of the area has filled the
+    history, where there is no history it only counts the starting triangles.
+
+    Parameters
+    ----------
+    triangles : List[Triangle]
+        The triangles the crawl will start from, they are copied so the cells of a covering are not handed out
+    region : Region
+        The area the crawl is limited to, if any
+    saturation : int
+        The number of results at which a query is truncated
+
+    Returns
+    -------
+    requests : int
+        The predicted number of requests
+    """
+    stack = [(t, 1.0) for t in copy.deepcopy(list(triangles))]
+    n = 0
+
+    while stack:
+        triangle, share = stack.pop()
+        if triangle.mini_miles > 100:  # Too large to request
+            stack.extend((t, share) for t in prune(triangle.split_triangle(), region))
+            continue
+
+        lat, lon, radius = ResponseCache.quantize(triangle.mini_center.lat, triangle.mini_center.lon,
+                                                  triangle.mini_miles)
+        known = density.count(lat, lon, radius) * share
+        full_range = triangle.minDiff == Triangle.DEFAULT_MIN_DIFF and triangle.maxDiff == Triangle.DEFAULT_MAX_DIFF
+
+        # Requested unless the history already says it is saturated, see split_unfetched
+        if not (full_range and known >= saturation):
+            routes = cache.get(lat, lon, radius, triangle.minDiff, triangle.maxDiff)
+            if routes is None:
+                routes = cache.covering(lat, lon, radius, triangle.minDiff, triangle.maxDiff)
+            if routes is None:
+                n += 1
+                saturated = known >= saturation
+            else:
+                saturated = len(routes) >= saturation
+            if not saturated:
+                continue
+
+        # Split like split_dense, difficulty halves share the routes
+        if triangle.mini_miles > 2:
+            stack.extend((t, share) for t in prune(triangle.split_triangle(), region))
+        else:
+            stack.extend((t, share / 2) for t in triangle.split_difficulty())
+
+    return n
+
+
+def show_progress(triangle: Triangle, m: 'Map' = None):
+    """
+    Reports that a triangle is being searched, either in the log or by plotting it on an optional map
+
+    Parameters
+    ----------
+    triangle : Triangle
+        Triangle being searched
+    m : Map
+        Optional Map object, or :class:`visualization.MapRenderer`, to plot triangles on. If no map is given progress
+        is reported in the log.
+
+    Returns
+    -------
+        nothing
+    """
+    if m is None:  # No map, print progress in log
+        print('Fetching results for triangle with radius {r:g} at ({lat:g}, {lon:g})'.format(r=triangle.mini_miles,
+                                                                                             lat=triangle.mini_center.lat,
+                                                                                             lon=triangle.mini_center.lon))
+    elif hasattr(m, 'add_triangle'):  # Renderer, plot progress in its next batch
+        m.add_triangle(triangle)
+    else:  # Map, plot progress in map
+        import visualization
+
+        visualization.plot_triangle(triangle, m)
+
+
+def get_routes(triangle: Triangle, m: 'Map' = None) -> List[Route]:
     """
     Find routes within a triangle (sort of) and plot on an optional map
     MP allows queries from a central point with a radius, so a circle is formed that encompasses all off the triangle's
@@ -120,31 +711,144 @@ def get_routes(triangle: Triangle, m: Map = None) -> List[Route]:
         a list of routes within the triangle, plus some nearby potentially.
 
     """
-    if m is None:  # No map, print progress in log
-        print('Fetching results for triangle with radius {r:g} at ({lat:g}, {lon:g})'.format(r=triangle.mini_miles,
-                                                                                             lat=triangle.mini_center.lat,
-                                                                                             lon=triangle.mini_center.lon))
-    else:  # Map, plot progress in map
-        color = next_color()
-        m_tri = Polygon(locations=[p.tuple for p in triangle.vertices], color=color, fill_color=color, fill_opacity=0.2)
-        m.add_layer(m_tri)
-
-    # Form Query
-    key = MP_API_KEY
-    url = 'https://www.mountainproject.com/data/get-routes-for-lat-lon'
-    params = {'lat': str(triangle.mini_center.lat),
-              'lon': str(triangle.mini_center.lon),
-              'maxDistance': str(triangle.mini_miles),
-              'maxResults': str(500),  # 500 is maximum for MP
-              'minDiff': triangle.minDiff,
-              'maxDiff': triangle.maxDiff,
-              'key': key}
-
-    # Send request and parse data
-    r = send_request(url, params)
-    r = r.json()
-
-    return [Route(b) for b in r['routes']]
+    show_progress(triangle, m)
+
+    return fetch_routes(triangle)
+
+
+def fetch_routes(triangle: Triangle) -> List[Route]:
+    """
+    Queries MP for the routes within a triangle's miniball
+
+    Does no plotting or logging so it is safe to call from worker threads.
+
+    Parameters
+    ----------
+    triangle : Triangle
+        Triangle to search in
+
+    Returns
+    -------
+    routes : List[Route]
+        a list of routes within the triangle, plus some nearby potentially.
+    """
+    start = tracer.now() if tracer is not None else 0.0
+    http_seconds = 0.0
+
+    # Round the query so that nearly identical queries share a cache entry
+    lat, lon, radius = ResponseCache.quantize(triangle.mini_center.lat, triangle.mini_center.lon, triangle.mini_miles)
+
+    # Check the cache before asking MP, first for the same query and then for a complete query that covers this one
+    with trace_span('cache'):
+        source = 'cache'
+        routes = cache.get(lat, lon, radius, triangle.minDiff, triangle.maxDiff)
+        if routes is None:
+            source = 'covering'
+            routes = cache.covering(lat, lon, radius, triangle.minDiff, triangle.maxDiff)
+    if routes is None:
+        source = 'network'
+        # Form Query
+        key = MP_API_KEY
+        url = MP_BASE_URL + '/get-routes-for-lat-lon'
+        params = {'lat': str(lat),
+                  'lon': str(lon),
+                  'maxDistance': str(radius),
+                  'maxResults': str(500),  # 500 is maximum for MP
+                  'minDiff': triangle.minDiff,
+                  'maxDiff': triangle.maxDiff,
+                  'key': key}
+
+        # Send request and parse data
+        with trace_span('http'):
+            sent = time.perf_counter()
+            r = send_request(url, params)
+            routes = r.json()['routes']
+            http_seconds = time.perf_counter() - sent
+        with trace_span('store'):
+            cache.put(lat, lon, radius, triangle.minDiff, triangle.maxDiff, routes)
+            density.record(routes)
+
+    routes = [Route(b) for b in routes]
+    if tracer is not None:
+        tracer.visit(triangle, source, start, http_seconds, [r.id for r in routes])
+
+    return routes
+
+
+def get_routes_by_id(ids: Iterable[int], batch_size: int = None, workers: int = None) -> Iterator[List[dict]]:
+    """
+    Queries MP for routes by id, many ids per request
+
+    Requests are sent from a pool of threads and paced by the limiter like the crawl's. The cache is not used, the
+    point is to get the routes as MP has them now.
+
+    Parameters
+    ----------
+    ids : Iterable[int]
+        The ids of the routes
+    batch_size : int
+        Ids per request, ROUTE_IDS_PER_REQUEST if None
+    workers : int
+        Requests in flight, CRAWL_WORKERS if None
+
+    Returns
+    -------
+    batches : Iterator[List[dict]]
+        The routes returned for each request in the order the ids were given. Routes MP no longer has are missing.
+    """
+    ids = [int(i) for i in ids]
+    batch_size = batch_size or ROUTE_IDS_PER_REQUEST
+
+    def fetch(batch):
+        with trace_span('http'):
+            r = send_request(MP_BASE_URL + '/get-routes', {'routeIds': ','.join(str(i) for i in batch),
+                                                           'key': MP_API_KEY})
+        return r.json()['routes']
+
+    with ThreadPoolExecutor(max_workers=workers or CRAWL_WORKERS) as pool:
+        yield from pool.map(fetch, (ids[i:i + batch_size] for i in range(0, len(ids), batch_size)))
+
+
+def refresh_routes(routes: Union[Iterable[Route], RouteTable], batch_size: int = None, workers: int = None) -> int:
+    """
+    Fetches known routes again by id and updates them in place, e.g. the stars and votes of a crawl from last month
+
+    A refresh needs one request per batch_size routes, rather than the requests of a new crawl. It only updates the
+    routes given: routes added to MP since they were found need a new crawl.
+
+    Parameters
+    ----------
+    routes : Union[Iterable[Route], RouteTable]
+        Route objects, which are updated with :meth:`route.Route.update`, or a table, which is updated with
+        :meth:`route_table.RouteTable.update`
+    batch_size : int
+        Ids per request, ROUTE_IDS_PER_REQUEST if None
+    workers : int
+        Requests in flight, CRAWL_WORKERS if None
+
+    Returns
+    -------
+    refreshed : int
+        The number of routes updated, routes MP did not return are left as they were
+    """
+    if isinstance(routes, RouteTable):
+        # Merge the batches first so the table is searched once rather than once per batch
+        ids = sorted(set(routes.id.tolist()))
+        batches = [RouteTable.from_payload(batch) for batch in get_routes_by_id(ids, batch_size, workers)]
+        return int(routes.update(RouteTable.merge(batches)).sum()) if batches else 0
+
+    by_id = defaultdict(list)
+    for route in routes:
+        by_id[route.id].append(route)
+
+    refreshed = 0
+    for batch in get_routes_by_id(by_id, batch_size, workers):
+        for data in batch:
+            for route in by_id.get(data['id'], ()):
+                route.update(data)
+                refreshed += 1
+
+    return refreshed
 
 
 def validate_key():
@@ -0,0 +1,292 @@
+"""Mountain Project Stand-in
+
+A local HTTP server that answers Mountain Project data API queries from synthetic routes, so crawls can be run and
+measured offline without using any API quota. Run as a script to serve until interrupted, e.g.
+``python mp_standin.py -n 100000 --latency 0.05``
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import List
+from urllib.parse import urlsplit, parse_qs
+
+import numpy as np
+
+from grades import YDS_GRADES, grade_index
+from route_index import RouteIndex
+from synthetic import synthetic_routes
+
+MAX_RESULTS = 500
+"""The most routes MP returns for a single query
+"""
+
+
+def ladder_position(route: dict) -> int:
+    """The position of a route on the grade ladder MP filters by
+
+    MP filters every route by minDiff and maxDiff, including boulders and ice which have no YDS grade. Those are given
+    a fixed position derived from their id so difficulty splits divide them like any other route.
+
+    Parameters
+    ----------
+    route : dict
+        A route dictionary
+
+    Returns
+    -------
+    position : int
+        An index into :data:`grades.YDS_GRADES`
+    """
+    try:
+        return grade_index(route['rating'].split()[0])
+    except (ValueError, IndexError):
+        return route['id'] % len(YDS_GRADES)
+
+
+class StandinServer:
+    """A threaded HTTP server imitating MP's get-routes-for-lat-lon and get-routes endpoints
+
+    Results are capped at :data:`MAX_RESULTS`, nearest first. Every request can be delayed by a fixed latency and fail
+    with a 503 at a given rate. Like MP, requests over a rate limit are answered with 429 Too Many Requests and a
+    Retry-After header.
+
+    Parameters
+    ----------
+    routes : List[dict]
+        The routes to serve, 100000 synthetic routes around Colorado's climbing areas if None
+    latency : float
+        Seconds each request waits before it is answered
+    error_rate : float
+        Probability that a request fails with 503 Service Unavailable
+    host : str
+        The address to listen on
+    port : int
+        The port to listen on, 0 picks a free port
+    seed : int
+        Seed for the latency jitter and errors
+    rate_limit : float
+        Requests per second allowed, averaged over a second, 0 for no limit
+    """
+
+    def __init__(self, routes: List[dict] = None, latency: float = 0.0, error_rate: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0, rate_limit: float = 0.0):
+        self.routes = synthetic_routes(100000) if routes is None else routes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._tokens = rate_limit
+        self._updated = time.monotonic()
+
+        self.index = RouteIndex([r['latitude'] for r in self.routes], [r['longitude'] for r in self.routes])
+        self.ladder = np.array([ladder_position(r) for r in self.routes], dtype=np.int64)
+        self.by_id = {r['id']: r for r in self.routes}
+
+        self.stats = Counter()
+        """Counts of requests, failed requests, throttled requests, saturated requests, routes returned, and bytes sent
+        """
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """The url to use in place of MP's data API, see :data:`mountain_project.MP_BASE_URL`
+
+        Returns
+        -------
+        url : str
+            The base url of the server's data API
+        """
+        host, port = self.httpd.server_address[:2]
+
+        return 'http://{}:{}/data'.format(host, port)
+
+    def start(self) -> 'StandinServer':
+        """Starts serving on a background thread
+
+        Returns
+        -------
+        server : StandinServer
+            The server, so it can be started as it is created
+        """
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+        """Stops the server and closes its socket
+
+        Returns
+        -------
+        nothing
+        """
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _throttle(self) -> float:
+        """Takes a token for a request, must be called with the lock held
+
+        Returns
+        -------
+        wait : float
+            0 if the request is allowed, otherwise the seconds until it would be
+        """
+        if not self.rate_limit:
+            return 0.0
+
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._updated) * self.rate_limit)
+        self._updated = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate_limit
+
+        self._tokens -= 1
+        return 0.0
+
+    def get_routes_for_lat_lon(self, params: dict) -> dict:
+        """Answers a query the way MP does
+
+        Parameters
+        ----------
+        params : dict
+            The query's lat, lon, maxDistance, maxResults, minDiff, and maxDiff
+
+        Returns
+        -------
+        response : dict
+            The response body with the routes found, nearest first
+        """
+        rows = self.index.radius(float(params['lat']), float(params['lon']), float(params.get('maxDistance', 30)))
+
+        low = grade_index(params.get('minDiff', YDS_GRADES[0]))
+        high = grade_index(params.get('maxDiff', YDS_GRADES[-1]), upper=True)
+        rows = rows[(self.ladder[rows] >= low) & (self.ladder[rows] <= high)]
+
+        limit = min(int(params.get('maxResults', 50)), MAX_RESULTS)
+        routes = [self.routes[i] for i in rows[:limit]]
+
+        with self._lock:
+            self.stats['routes'] += len(routes)
+            self.stats['saturated'] += len(routes) == MAX_RESULTS
+
+        return {'routes': routes, 'success': 1}
+
+    def get_routes(self, params: dict) -> dict:
+        """Answers a query for routes by id the way MP does
+
+        Parameters
+        ----------
+        params : dict
+            The query's routeIds, separated by commas
+
+        Returns
+        -------
+        response : dict
+            The response body with the routes found in the order they were asked for, unknown ids are left out
+        """
+        ids = [int(i) for i in params.get('routeIds', '').split(',') if i]
+        routes = [self.by_id[i] for i in ids if i in self.by_id]
+
+        with self._lock:
+            self.stats['routes'] += len(routes)
+
+        return {'routes': routes, 'success': 1}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+
+                if url.path == '/stats':
+                    with server._lock:
+                        return self._send(200, dict(server.stats))
+
+                with server._lock:
+                    server.stats['requests'] += 1
+                    wait = server._throttle()
+                    server.stats['throttled'] += wait > 0
+                    fail = not wait and server._random.random() < server.error_rate
+                    server.stats['errors'] += fail
+
+                if wait:
+                    return self._send(429, {'success': 0}, {'Retry-After': str(math.ceil(wait))})
+
+                if server.latency:
+                    time.sleep(server.latency)
+
+                if fail:
+                    return self._send(503, {'success': 0})
+                if url.path == '/data/get-routes-for-lat-lon':
+                    return self._send(200, server.get_routes_for_lat_lon(params))
+                if url.path == '/data/get-routes':
+                    return self._send(200, server.get_routes(params))
+
+                return self._send(404, {'success': 0})
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+                if self.path != '/stats':
+                    with server._lock:
+                        server.stats['bytes'] += len(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument('-n', type=int, default=100000, help='number of synthetic routes')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the routes, latency, and errors')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before each response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests that fail with 503')
+    parser.add_argument('--rate-limit', type=float, default=0.0,
+                        help='requests per second allowed before answering 429, 0 for no limit')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=0, help='port to listen on, 0 picks a free port')
+    args = parser.parse_args()
+
+    server = StandinServer(synthetic_routes(args.n, args.seed), args.latency, args.error_rate, args.host, args.port,
+                           args.seed, args.rate_limit)
+    # The first line is read by the crawl benchmark to find the server
+    print(server.base_url, flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+# Allow module standalone run
+if __name__ == '__main__':
+    main()
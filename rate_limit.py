@@ -0,0 +1,316 @@
+"""Rate Limiting
+
+Contains the TokenBucket class, which paces requests to Mountain Project, its SharedTokenBucket version for several
+processes, and the QuotaCounter class, a persistent count of the requests made with each API key per day
+"""
+import configparser
+import datetime
+import hashlib
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+
+class QuotaExceeded(RuntimeError):
+    """Raised instead of sending a request that would go over the day's quota
+    """
+
+
+class TokenBucket:
+    """An adaptive token bucket shared by every thread sending requests
+
+    Each request takes a token, tokens refill at rate per second up to burst. The rate adapts to the service by additive
+    increase, multiplicative decrease: every response that comes back within target_latency raises the rate a little,
+    while a slow response or an HTTP 429 cuts it by a factor, and a 429's Retry-After pauses the bucket. Cuts happen at
+    most once per cooldown, so a burst of slow responses to requests sent at the old rate only counts once.
+
+    Parameters
+    ----------
+    rate : float
+        Requests per second to start at
+    burst : int
+        The most requests sent back to back
+    min_rate : float
+        The rate is never cut below this
+    max_rate : float
+        The rate is never raised above this
+    target_latency : float
+        Seconds a response may take before the rate is cut
+    increase : float
+        Requests per second added to the rate for each second of fast responses
+    decrease : float
+        Factor the rate is multiplied by when it is cut
+    cooldown : float
+        Seconds after a cut before the rate is cut again
+    """
+
+    def __init__(self, rate: float = 5.0, burst: int = 5, min_rate: float = 0.2, max_rate: float = 20.0,
+                 target_latency: float = 2.0, increase: float = 1.0, decrease: float = 0.5, cooldown: float = 1.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+
+        self.throttled = 0
+        """The number of 429 responses seen
+        """
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._last_cut = float('-inf')
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Waits for a token
+
+        Returns
+        -------
+        waited : float
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+
+            time.sleep(wait)
+            waited += wait
+
+    def success(self, latency: float):
+        """Adapts the rate to a response
+
+        Parameters
+        ----------
+        latency : float
+            Seconds the response took
+
+        Returns
+        -------
+        nothing
+        """
+        with self._lock:
+            if latency > self.target_latency:
+                self._cut(time.monotonic())
+            else:
+                # Spread the increase over the requests of one second at the current rate
+                self.rate = min(self.max_rate, self.rate + self.increase / self.rate)
+
+    def throttle(self, retry_after: Optional[float] = None):
+        """Backs off after an HTTP 429
+
+        Parameters
+        ----------
+        retry_after : float
+            Seconds the service asked to wait, the bucket waits one token's time if None
+
+        Returns
+        -------
+        nothing
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            self._cut(now)
+            self._tokens = 0.0
+            self._updated = now
+            self._paused_until = max(self._paused_until, now + (retry_after or 0.0))
+
+    def _cut(self, now: float):
+        if now - self._last_cut >= self.cooldown:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._last_cut = now
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> 'TokenBucket':
+        """Creates a token bucket from the RATE LIMIT section of the settings
+
+        Parameters
+        ----------
+        config : configparser.ConfigParser
+            A configparser with rate limit settings
+
+        Returns
+        -------
+        bucket : TokenBucket
+            A bucket using the configured settings
+        """
+        rate_conf = config['RATE LIMIT']
+
+        return cls(rate=rate_conf.getfloat('rate'),
+                   burst=rate_conf.getint('burst'),
+                   min_rate=rate_conf.getfloat('min_rate'),
+                   max_rate=rate_conf.getfloat('max_rate'),
+                   target_latency=rate_conf.getfloat('target_latency'))
+
+
+def _shared(index: int) -> property:
+    """A property stored in the shared state array of a SharedTokenBucket
+    """
+    def get(self):
+        return self._state[index]
+
+    def set(self, value):
+        self._state[index] = value
+
+    return property(get, set)
+
+
+class SharedTokenBucket(TokenBucket):
+    """A token bucket shared by several processes
+
+    The bucket's state is kept in shared memory and guarded by a process lock, so every process draws from, and adapts,
+    one rate. Create it in the parent process and hand it to the workers when they start, e.g. through a process pool's
+    initializer arguments. It takes the same parameters as :class:`TokenBucket`.
+    """
+    rate = _shared(0)
+    throttled = _shared(1)
+    _tokens = _shared(2)
+    _updated = _shared(3)
+    _paused_until = _shared(4)
+    _last_cut = _shared(5)
+
+    def __init__(self, *args, **kwargs):
+        self._state = multiprocessing.RawArray('d', 6)
+        super().__init__(*args, **kwargs)
+        self._lock = multiprocessing.Lock()
+
+
+class QuotaCounter:
+    """A count of the requests made with each API key each day
+
+    Counts are kept in a table next to the response cache, so they survive between runs and are shared by every
+    process using the file. Keys are stored as hashes and days are UTC dates.
+
+    Parameters
+    ----------
+    path : str
+        The SQLite file the counts are stored in, normally the response cache's file
+    daily_limit : int
+        The number of requests allowed per key per day, 0 for no limit
+    """
+
+    def __init__(self, path: str = os.path.join('cache', 'routes.sqlite'), daily_limit: int = 0):
+        self.path = path
+        self.daily_limit = daily_limit
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database connection, the file and table are created the first time it is used
+
+        Returns
+        -------
+        connection : sqlite3.Connection
+            Connection shared by all threads, access is serialized with the counter's lock
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS quota ('
+                                     'key TEXT, day TEXT, requests INTEGER, PRIMARY KEY (key, day))')
+            self._connection.commit()
+
+        return self._connection
+
+    @staticmethod
+    def _key(key: str) -> str:
+        return hashlib.sha256((key or '').encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+
+    def used(self, key: str) -> int:
+        """The number of requests made with a key today
+
+        Parameters
+        ----------
+        key : str
+            The API key
+
+        Returns
+        -------
+        used : int
+            Requests counted today
+        """
+        with self._lock:
+            row = self.connection.execute('SELECT requests FROM quota WHERE key = ? AND day = ?',
+                                          (self._key(key), self._today())).fetchone()
+
+        return row[0] if row else 0
+
+    def remaining(self, key: str) -> Optional[int]:
+        """The number of requests left for a key today
+
+        Parameters
+        ----------
+        key : str
+            The API key
+
+        Returns
+        -------
+        remaining : int
+            Requests left, None if there is no limit
+        """
+        if not self.daily_limit:
+            return None
+
+        return max(self.daily_limit - self.used(key), 0)
+
+    def take(self, key: str):
+        """Counts a request about to be sent
+
+        Parameters
+        ----------
+        key : str
+            The API key
+
+        Returns
+        -------
+        nothing
+
+        Raises
+        ------
+        QuotaExceeded
+            If the key has no requests left today, the request is not counted
+        """
+        with self._lock:
+            k, day = self._key(key), self._today()
+            # Hold the write lock from reading the count to storing it, other processes may be counting too
+            self.connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = self.connection.execute('SELECT requests FROM quota WHERE key = ? AND day = ?',
+                                              (k, day)).fetchone()
+                used = row[0] if row else 0
+                if self.daily_limit and used >= self.daily_limit:
+                    raise QuotaExceeded('The daily quota of {} requests has been used, try again tomorrow'.format(
+                        self.daily_limit))
+
+                self.connection.execute('INSERT OR REPLACE INTO quota VALUES (?, ?, ?)', (k, day, used + 1))
+            except BaseException:
+                self.connection.rollback()
+                raise
+            self.connection.commit()
+
@@ -0,0 +1,295 @@
+"""Crawl Regions
+
+Contains the Region class, the area a crawl covers given as polygons, e.g. a state, a national forest, or several states
+"""
+import json
+from typing import List, Sequence, Tuple, Union
+
+import numpy as np
+
+from coordinate import Coordinate
+from route import Route
+from triangle import Triangle
+
+
+def _ring(points) -> np.ndarray:
+    """A ring as an N x 2 (lat, lon) array without the closing point
+    """
+    ring = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    if len(ring) < 3:
+        raise ValueError('A polygon needs at least 3 distinct vertices')
+
+    return ring
+
+
+def _signed_area(ring: np.ndarray) -> float:
+    """Twice the signed area of a ring, positive if its vertices go counterclockwise with lon as x and lat as y
+    """
+    lat, lon = ring[:, 0], ring[:, 1]
+
+    return float(np.sum(lon * np.roll(lat, -1) - np.roll(lon, -1) * lat))
+
+
+def _cross(o: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """The z component of (a - o) x (b - o) with lon as x and lat as y
+    """
+    return (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0]) - (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1])
+
+
+def triangulate(ring: np.ndarray) -> List[np.ndarray]:
+    """Splits a simple polygon into triangles by ear clipping
+
+    The ear with the largest smallest angle is clipped first, which avoids long slivers whose query circles would be
+    much larger than the triangles.
+
+    Parameters
+    ----------
+    ring : np.ndarray
+        N x 2 array of the polygon's vertices in (lat, lon) order
+
+    Returns
+    -------
+    triangles : List[np.ndarray]
+        3 x 2 arrays of the corners of each triangle
+    """
+    ring = _ring(ring)
+    if _signed_area(ring) < 0:
+        ring = ring[::-1]
+
+    remaining = list(range(len(ring)))
+    triangles = []
+    while len(remaining) > 3:
+        points = ring[remaining]
+        prev, nxt = np.roll(points, 1, axis=0), np.roll(points, -1, axis=0)
+
+        # Convex corners whose triangle holds no other vertex are ears
+        convex = _cross(prev, points, nxt) > 1e-15
+        ears = []
+        for i in np.flatnonzero(convex):
+            a, b, c = prev[i], points[i], nxt[i]
+            others = np.delete(points, [(i - 1) % len(points), i, (i + 1) % len(points)], axis=0)
+            inside = (_cross(a, b, others) >= 0) & (_cross(b, c, others) >= 0) & (_cross(c, a, others) >= 0)
+            if not inside.any():
+                ears.append(i)
+
+        if not ears:  # Self intersecting or degenerate ring, clip the sharpest convex corner to keep going
+            ears = list(np.flatnonzero(convex)) or [0]
+
+        def smallest_angle(i):
+            corners = np.array([prev[i], points[i], nxt[i]])
+            sides = np.roll(corners, -1, axis=0) - corners
+            lengths = np.linalg.norm(sides, axis=1)
+            cosines = [-(sides[k] @ sides[k - 1]) / max(lengths[k] * lengths[k - 1], 1e-300) for k in range(3)]
+            return np.arccos(np.clip(cosines, -1, 1)).min()
+
+        ear = max(ears, key=smallest_angle)
+        triangles.append(np.array([prev[ear], points[ear], nxt[ear]]))
+        del remaining[ear]
+
+    triangles.append(ring[remaining])
+
+    return triangles
+
+
+class Region:
+    """An area made of polygons
+
+    Each polygon is an exterior ring and optional holes, rings are arrays of (lat, lon) vertices. Points are inside the
+    region if they are inside an odd number of rings.
+
+    Parameters
+    ----------
+    polygons : Sequence[Sequence[np.ndarray]]
+        The rings of each polygon, the first ring of a polygon is its exterior and any others are holes
+    """
+
+    def __init__(self, polygons: Sequence[Sequence[np.ndarray]]):
+        self.polygons = [[_ring(r) for r in rings] for rings in polygons]
+
+        # Every edge of every ring as start and end points
+        rings = [r for rings in self.polygons for r in rings]
+        self.edge_start = np.concatenate(rings)
+        self.edge_end = np.concatenate([np.roll(r, -1, axis=0) for r in rings])
+
+    @classmethod
+    def from_vertices(cls, vertices: Sequence[Union[Coordinate, Tuple[float, float]]]) -> 'Region':
+        """Creates a region from a single polygon
+
+        Parameters
+        ----------
+        vertices : Sequence[Union[Coordinate, Tuple[float, float]]]
+            The polygon's vertices as coordinates or (lat, lon) pairs
+
+        Returns
+        -------
+        region : Region
+            The region inside the polygon
+        """
+        return cls([[[(v.lat, v.lon) if isinstance(v, Coordinate) else v for v in vertices]]])
+
+    @classmethod
+    def from_geojson(cls, geojson: Union[str, dict]) -> 'Region':
+        """Creates a region from the polygons in GeoJSON
+
+        Polygon and MultiPolygon geometries are read from a geometry, a feature, or every feature of a feature
+        collection. GeoJSON positions are (lon, lat).
+
+        Parameters
+        ----------
+        geojson : Union[str, dict]
+            A GeoJSON file name or decoded GeoJSON
+
+        Returns
+        -------
+        region : Region
+            The region inside the polygons
+        """
+        if isinstance(geojson, str):
+            with open(geojson) as f:
+                geojson = json.load(f)
+
+        def geometries(obj):
+            if obj['type'] == 'FeatureCollection':
+                return [g for feature in obj['features'] for g in geometries(feature)]
+            if obj['type'] == 'Feature':
+                return geometries(obj['geometry']) if obj.get('geometry') else []
+            if obj['type'] == 'GeometryCollection':
+                return [g for geometry in obj['geometries'] for g in geometries(geometry)]
+            return [obj]
+
+        polygons = []
+        for geometry in geometries(geojson):
+            if geometry['type'] == 'Polygon':
+                polygons.append(geometry['coordinates'])
+            elif geometry['type'] == 'MultiPolygon':
+                polygons.extend(geometry['coordinates'])
+
+        if not polygons:
+            raise ValueError('No polygons found in the GeoJSON')
+
+        # GeoJSON is lon, lat and may have altitudes
+        return cls([[np.asarray(ring, dtype=np.float64)[:, 1::-1] for ring in rings] for rings in polygons])
+
+    def seeds(self) -> List[Triangle]:
+        """The triangles to start a crawl of the region from
+
+        The two halves of the region's bounding box. The crawl prunes split triangles that are entirely outside the
+        region, so the seeds quickly shrink to the region's shape. Starting from :meth:`triangles` instead costs more
+        requests, as the thin triangles of a triangulated boundary have query circles much larger than themselves.
+
+        Returns
+        -------
+        triangles : List[Triangle]
+            Triangles covering the region's bounding box
+        """
+        (south, west), (north, east) = self.edge_start.min(axis=0), self.edge_start.max(axis=0)
+        sw, se, ne, nw = (Coordinate(float(south), float(west)), Coordinate(float(south), float(east)),
+                          Coordinate(float(north), float(east)), Coordinate(float(north), float(west)))
+
+        return [Triangle([sw, se, nw]), Triangle([nw, ne, se])]
+
+    def triangles(self) -> List[Triangle]:
+        """Triangulates the region
+
+        Only the exterior rings are triangulated, triangles in a hole are pruned once the crawl splits them. The
+        triangles cover exactly the region, which makes them the area to pass to :class:`covering.HexCovering`.
+
+        Returns
+        -------
+        triangles : List[Triangle]
+            Triangles covering the region
+        """
+        return [Triangle([Coordinate(float(lat), float(lon)) for lat, lon in corners])
+                for rings in self.polygons for corners in triangulate(rings[0])]
+
+    def contains(self, lat, lon) -> np.ndarray:
+        """Checks which points are inside the region
+
+        Parameters
+        ----------
+        lat : float or np.ndarray
+            Latitude of the points
+        lon : float or np.ndarray
+            Longitude of the points
+
+        Returns
+        -------
+        inside : np.ndarray
+            Whether each point is inside
+        """
+        lat = np.asarray(lat, dtype=np.float64)[..., None]
+        lon = np.asarray(lon, dtype=np.float64)[..., None]
+        (lat0, lon0), (lat1, lon1) = self.edge_start.T, self.edge_end.T
+
+        # Count the edges a ray going east from each point crosses
+        straddles = (lat0 > lat) != (lat1 > lat)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing = lon0 + (lat - lat0) * (lon1 - lon0) / (lat1 - lat0)
+
+        return np.count_nonzero(straddles & (lon < crossing), axis=-1) % 2 == 1
+
+    def overlaps(self, triangle) -> bool:
+        """Checks if a triangle shares any area with the region
+
+        Parameters
+        ----------
+        triangle : Triangle
+            A triangle, or any shape with convex corners in lat_lon such as a :class:`covering.Cell`
+
+        Returns
+        -------
+        overlaps : bool
+            False if the triangle is entirely outside the region
+        """
+        corners = triangle.lat_lon
+
+        # A corner of the triangle in the region, or a vertex of the region in the triangle
+        if self.contains(corners[:, 0], corners[:, 1]).any():
+            return True
+        sides = _cross(corners, np.roll(corners, -1, axis=0), self.edge_start[:, None, :])
+        if (np.all(sides > 0, axis=1) | np.all(sides < 0, axis=1)).any():
+            return True
+
+        # Or edges that cross
+        a, b = corners[:, None, :], np.roll(corners, -1, axis=0)[:, None, :]
+        c, d = self.edge_start[None], self.edge_end[None]
+        crosses = ((_cross(a, b, c) > 0) != (_cross(a, b, d) > 0)) & ((_cross(c, d, a) > 0) != (_cross(c, d, b) > 0))
+
+        return bool(crosses.any())
+
+    def prune(self, triangles: List) -> List:
+        """Removes triangles that are entirely outside the region
+
+        Parameters
+        ----------
+        triangles : List[Triangle]
+            Triangles or cells about to be crawled
+
+        Returns
+        -------
+        triangles : List[Triangle]
+            The triangles that overlap the region
+        """
+        return [t for t in triangles if self.overlaps(t)]
+
+    def clip(self, routes: List[Route]) -> List[Route]:
+        """Removes routes outside the region
+
+        Parameters
+        ----------
+        routes : List[Route]
+            Routes fetched for a triangle
+
+        Returns
+        -------
+        routes : List[Route]
+            The routes inside the region
+        """
+        if not routes:
+            return routes
+
+        inside = self.contains([r.latitude for r in routes], [r.longitude for r in routes])
+
+        return [r for r, keep in zip(routes, inside) if keep]
@@ -0,0 +1,284 @@
+"""Response Cache
+
+Contains the ResponseCache class, a compact on disk cache of the routes returned by Mountain Project queries
+"""
+import configparser
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from coordinate import haversine_miles, EARTH_RADIUS_MILES
+
+
+class ResponseCache:
+    """A SQLite cache of route queries
+
+    Only the decoded routes of each query are stored, as compressed JSON, in a single file. Queries are keyed by their
+    quantized center, radius, and difficulty range, the API key is not part of the key so rotating it does not clear
+    the cache. Each entry records when it was fetched so old entries can be expired.
+
+    The entries also act as a spatial index of answered circles. A query that lies entirely within an earlier query
+    with the same difficulty range that was not saturated can be answered from the earlier query's routes, see
+    :meth:`covering`.
+
+    Parameters
+    ----------
+    path : str
+        The file the cache is stored in
+    ttl_days : float
+        The number of days an entry is valid for, None if entries never expire
+    """
+    coordinate_decimals = 5
+    """Decimals latitude and longitude are rounded to, 5 decimals is about a meter
+    """
+    radius_step = 0.01
+    """Radii are rounded up to a multiple of this many miles
+    """
+
+    def __init__(self, path: str = os.path.join('cache', 'routes.sqlite'), ttl_days: Optional[float] = 30):
+        self.path = path
+        self.ttl = None if ttl_days is None else ttl_days * 24 * 60 * 60
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The database connection, the file and tables are created the first time it is used
+
+        Returns
+        -------
+        connection : sqlite3.Connection
+            Connection shared by all threads, access is serialized with the cache's lock
+        """
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                                     'key TEXT PRIMARY KEY, '
+                                     'lat REAL, lon REAL, radius REAL, min_diff TEXT, max_diff TEXT, '
+                                     'fetched_at REAL, count INTEGER, payload BLOB)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS responses_area '
+                                     'ON responses (min_diff, max_diff, lat)')
+            self._connection.commit()
+
+        return self._connection
+
+    @classmethod
+    def quantize(cls, lat: float, lon: float, radius: float) -> Tuple[float, float, float]:
+        """Rounds a query so that nearly identical queries share an entry
+
+        The radius is padded by one radius step, more than rounding can move the center, then rounded up to a step,
+        so the query still covers the original circle.
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the query's center
+        lon : float
+            Longitude of the query's center
+        radius : float
+            Radius of the query in miles
+
+        Returns
+        -------
+        query : Tuple[float, float, float]
+            The quantized latitude, longitude, and radius
+        """
+        radius = (math.ceil(round(radius / cls.radius_step, 6)) + 1) * cls.radius_step
+
+        return (round(lat, cls.coordinate_decimals), round(lon, cls.coordinate_decimals),
+                round(radius, 6))
+
+    @staticmethod
+    def key(lat: float, lon: float, radius: float, min_diff: str, max_diff: str) -> str:
+        """The key of a quantized query
+
+        Returns
+        -------
+        key : str
+            A string identifying the query
+        """
+        return '{:.5f},{:.5f},{:.2f},{},{}'.format(lat, lon, radius, min_diff, max_diff)
+
+    def get(self, lat: float, lon: float, radius: float, min_diff: str, max_diff: str) -> Optional[List[dict]]:
+        """Looks up a quantized query
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the query's center
+        lon : float
+            Longitude of the query's center
+        radius : float
+            Radius of the query in miles
+        min_diff : str
+            The minimum difficulty of the query
+        max_diff : str
+            The maximum difficulty of the query
+
+        Returns
+        -------
+        routes : Optional[List[dict]]
+            The routes returned by the query, None if the query is not cached or has expired
+        """
+        with self._lock:
+            row = self.connection.execute('SELECT fetched_at, payload FROM responses WHERE key = ?',
+                                          (self.key(lat, lon, radius, min_diff, max_diff),)).fetchone()
+
+        if row is None or self.expired(row[0]):
+            return None
+
+        return json.loads(zlib.decompress(row[1]).decode())
+
+    def put(self, lat: float, lon: float, radius: float, min_diff: str, max_diff: str, routes: List[dict]):
+        """Stores the routes returned by a quantized query
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the query's center
+        lon : float
+            Longitude of the query's center
+        radius : float
+            Radius of the query in miles
+        min_diff : str
+            The minimum difficulty of the query
+        max_diff : str
+            The maximum difficulty of the query
+        routes : List[dict]
+            The routes returned by MP
+
+        Returns
+        -------
+        nothing
+        """
+        payload = zlib.compress(json.dumps(routes, separators=(',', ':')).encode())
+
+        with self._lock:
+            self.connection.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (self.key(lat, lon, radius, min_diff, max_diff), lat, lon, radius, min_diff,
+                                     max_diff, time.time(), len(routes), payload))
+            self.connection.commit()
+
+    def covering(self, lat: float, lon: float, radius: float, min_diff: str, max_diff: str,
+                 saturation: int = 500) -> Optional[List[dict]]:
+        """Answers a query from a cached query whose circle covers it
+
+        If an unexpired query with the same difficulty range returned fewer than saturation routes, it returned every
+        route in its circle. Any circle inside it can be answered by keeping the routes within the smaller circle. The
+        smallest covering circle is used so there are as few routes to filter as possible.
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the query's center
+        lon : float
+            Longitude of the query's center
+        radius : float
+            Radius of the query in miles
+        min_diff : str
+            The minimum difficulty of the query
+        max_diff : str
+            The maximum difficulty of the query
+        saturation : int
+            The number of results at which a query may have been truncated
+
+        Returns
+        -------
+        routes : Optional[List[dict]]
+            The routes within the query's circle, None if no cached query covers it
+        """
+        with self._lock:
+            max_radius = self.connection.execute('SELECT MAX(radius) FROM responses '
+                                                 'WHERE min_diff = ? AND max_diff = ? AND count < ?',
+                                                 (min_diff, max_diff, saturation)).fetchone()[0]
+            if max_radius is None or max_radius < radius:
+                return None
+
+            # Any covering circle's center is within max_radius - radius of the query's center
+            reach = np.degrees((max_radius - radius) / EARTH_RADIUS_MILES)
+            candidates = self.connection.execute('SELECT lat, lon, radius, fetched_at, payload FROM responses '
+                                                 'WHERE min_diff = ? AND max_diff = ? AND count < ? AND radius >= ? '
+                                                 'AND lat BETWEEN ? AND ? ORDER BY radius',
+                                                 (min_diff, max_diff, saturation, radius,
+                                                  lat - reach, lat + reach)).fetchall()
+
+        for c_lat, c_lon, c_radius, fetched_at, payload in candidates:
+            if self.expired(fetched_at) or haversine_miles(lat, lon, c_lat, c_lon) + radius > c_radius:
+                continue
+
+            routes = json.loads(zlib.decompress(payload).decode())
+            if not routes:
+                return []
+
+            distances = haversine_miles(lat, lon, np.array([r['latitude'] for r in routes]),
+                                        np.array([r['longitude'] for r in routes]))
+
+            return [r for r, d in zip(routes, distances) if d <= radius]
+
+        return None
+
+    def expired(self, fetched_at: float) -> bool:
+        """Checks if an entry fetched at the given time has expired
+
+        Parameters
+        ----------
+        fetched_at : float
+            Unix time the entry was fetched
+
+        Returns
+        -------
+        expired : bool
+            Whether the entry is older than the cache's ttl
+        """
+        return self.ttl is not None and fetched_at < time.time() - self.ttl
+
+    def purge(self) -> int:
+        """Deletes expired entries
+
+        Returns
+        -------
+        deleted : int
+            The number of entries deleted
+        """
+        if self.ttl is None:
+            return 0
+
+        with self._lock:
+            deleted = self.connection.execute('DELETE FROM responses WHERE fetched_at < ?',
+                                              (time.time() - self.ttl,)).rowcount
+            self.connection.commit()
+
+        return deleted
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> 'ResponseCache':
+        """Creates a cache from the CACHE section of the settings
+
+        A ttl_days of 0 or less means entries never expire.
+
+        Parameters
+        ----------
+        config : configparser.ConfigParser
+            A configparser with cache settings
+
+        Returns
+        -------
+        cache : ResponseCache
+            A cache using the configured settings
+        """
+        cache_conf = config['CACHE']
+        ttl_days = cache_conf.getfloat('ttl_days')
+
+        return cls(cache_conf['path'], ttl_days if ttl_days > 0 else None)
@@ -1,11 +1,12 @@
 """Route classes
 """
-import re
-from typing import List, Set
-from collections import defaultdict
+import sys
+from typing import Dict, List, Sequence, Set, Tuple
 from enum import Enum
 
 from class_property import classproperty, ClassPropertyMetaClass
+from crag_tree import CragTree
+from grades import parse_rating
 import configparser
 
 
@@ -25,29 +26,99 @@ class RouteType(Enum):
     trad = 'trad'
 
 
+def type_mask(types: Set[RouteType]) -> int:
+    """Packs a set of route types into a bitmask
+
+    Each RouteType gets one bit, in the order they are defined.
+
+    Parameters
+    ----------
+    types: Set[RouteType]
+        A set of route types
+
+    Returns
+    -------
+    mask: int
+        The bitmask of the types
+    """
+    return sum(1 << i for i, t in enumerate(RouteType) if t in types)
+
+
+_location_paths: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+"""Every distinct location path, routes in the same area share one tuple
+"""
+
+
+def intern_location(location: Sequence[str]) -> Tuple[str, ...]:
+    """Finds the shared tuple for a location path
+
+    Thousands of routes share the same few hundred areas, so each distinct path and area name is only stored once.
+
+    Parameters
+    ----------
+    location: Sequence[str]
+        A location path from the broadest area to the crag
+
+    Returns
+    -------
+    location: Tuple[str, ...]
+        The shared, interned, location path
+    """
+    path = tuple(location)
+    shared = _location_paths.get(path)
+    if shared is None:
+        shared = _location_paths[path] = tuple(sys.intern(name) for name in path)
+
+    return shared
+
+
+def _image_property(index: int, name: str) -> property:
+    """Creates a property that reads an image url from :attr:`Route.images`
+    """
+    def fget(self) -> str:
+        return self.images[index]
+
+    return property(fget, doc='The route\'s {} image url, empty if it has no image'.format(name))
+
+
 class Route:
     """
     A class that stores data for a climbing route
 
-    This class should be modified with extreme care to prevent errors when pulling from the cache. Most changes would
-    be better placed in RatedRoute. This class contains all of the information returned from Mountain Project.
+    This class contains all of the information returned from Mountain Project. Most changes would be better placed in
+    RatedRoute. Routes use __slots__ and share their location paths, see :func:`intern_location`, to keep large
+    crawls small. Image urls are rarely set so routes without any share the empty :attr:`no_images`.
+    """
+    fields = ('id', 'name', 'type', 'rating', 'stars', 'starVotes', 'pitches', 'location', 'url', 'longitude',
+              'latitude')
+    """The fields returned by MP that are kept as attributes
+    """
+    __slots__ = fields + ('images',)
+
+    id: int
+    name: str
+    type: str
+    rating: str
+    stars: float
+    starVotes: int
+    pitches: int
+    location: Tuple[str, ...]
+    url: str
+    longitude: float
+    latitude: float
+    images: Tuple[str, ...]
+    """The route's image urls in the order of image_fields
     """
 
-    id: int = None
-    name: str = None
-    type: str = None
-    rating: str = None
-    stars: float = None
-    starVotes: int = None
-    pitches: int = None
-    location: List[str] = None
-    url: str = None
-    imgSqSmall: str = None
-    imgSmall: str = None
-    imgSmallMed: str = None
-    imgMedium: str = None
-    longitude: float = None
-    latitude: float = None
+    image_fields = ('imgSqSmall', 'imgSmall', 'imgSmallMed', 'imgMedium')
+    """The image url fields returned by MP
+    """
+    no_images = ('',) * len(image_fields)
+
+    imgSqSmall = _image_property(0, 'square small')
+    imgSmall = _image_property(1, 'small')
+    imgSmallMed = _image_property(2, 'small medium')
+    imgMedium = _image_property(3, 'medium')
 
     def __init__(self, data):
         """
@@ -58,7 +129,43 @@ class Route:
         data: dict
             A dictionary of attributes
         """
-        self.__dict__ = data
+        self.update(data)
+
+    def update(self, data: dict):
+        """
+        Replaces the route's attributes, e.g. with a newer copy of the route from MP
+
+        Parameters
+        ----------
+        data: dict
+            A dictionary of attributes
+
+        Returns
+        -------
+            nothing
+        """
+        for field in Route.fields:
+            setattr(self, field, data.get(field))
+
+        self.location = intern_location(self.location or ())
+
+        images = tuple(data.get(field) or '' for field in Route.image_fields)
+        self.images = images if any(images) else Route.no_images
+
+    def as_dict(self) -> dict:
+        """
+        The route's attributes as a dictionary in the same form MP returns them
+
+        Returns
+        -------
+        data: dict
+            A dictionary of attributes
+        """
+        data = {field: getattr(self, field) for field in Route.fields}
+        data['location'] = list(self.location)
+        data.update(zip(Route.image_fields, self.images))
+
+        return data
 
     def __hash__(self):
         """
@@ -96,6 +203,8 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
     This objects of this class are created after pulling from the cache so this class can be modified without affecting
     the cache.
     """
+    __slots__ = ('types',)
+
     min_rating = '5.0'
     """The minimum rating a route should have to be included in the score
     """
@@ -119,12 +228,6 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
     """The climbing types that may not be part of a route if it is included in the score
     """
 
-    rating_regex = r"5\.(\d+)([abcd+-]?)"
-    """Regex used to parse the climb's rating
-    
-    Currently does not support changing score based on exposure, but it does not break the parsing if they are included
-    """
-
     def __init__(self, route):
         """
         Creates a rated route from a normal route
@@ -134,10 +237,27 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
         route: Route
             The route to be rated
         """
-        Route.__init__(self, route.__dict__)
+        for field in Route.__slots__:
+            setattr(self, field, getattr(route, field))
         # Parse the route types
         self.types: Set[RouteType] = type(self).cs_types2enum(self.type)
 
+    def update(self, data: dict):
+        """
+        Replaces the route's attributes and parses its types again
+
+        Parameters
+        ----------
+        data: dict
+            A dictionary of attributes
+
+        Returns
+        -------
+            nothing
+        """
+        super().update(data)
+        self.types = type(self).cs_types2enum(self.type)
+
     @classproperty
     def min_num_rating(cls) -> float:
         """The minimum rating in numerical form
@@ -179,7 +299,8 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
     def score(self) -> float:
         """The route's score
 
-        Calculates the route's score and returns it. If the route is undesirable the score is 0 otherwise it is:
+        Calculates the route's score and returns it. If the route is undesirable or outside the rating or pitch
+        windows the score is 0 otherwise it is:
 
         ..math::
         score = 1 + \\sqrt{stars}
@@ -189,8 +310,10 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
         score: float
             The route's score
         """
-        if self.desired_type and type(self).min_num_rating <= self.num_rating <= type(self).max_num_rating:
-            return 1 + self.stars ** 0.5
+        cls = type(self)
+        if self.desired_type and cls.min_num_rating <= self.num_rating <= cls.max_num_rating and \
+                cls.min_pitches <= self.num_pitches <= cls.max_pitches:
+            return 1 + max(self.stars, 0) ** 0.5
         else:
             return 0
 
@@ -207,6 +330,38 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
         """
         return RatedRoute.str2num_rating(self.rating)
 
+    @property
+    def num_pitches(self) -> int:
+        """The number of pitches as an integer
+
+        MP leaves the pitch count blank for many single pitch routes, so those are counted as one pitch
+
+        Returns
+        -------
+        pitches: int
+            The route's number of pitches
+        """
+        return RatedRoute.pitches2num(self.pitches)
+
+    @staticmethod
+    def pitches2num(pitches) -> int:
+        """Converts a pitch count from MP to an integer
+
+        Parameters
+        ----------
+        pitches: int or str
+            The pitch count as returned by MP, possibly blank
+
+        Returns
+        -------
+        pitches: int
+            The number of pitches, blank counts are one pitch
+        """
+        try:
+            return max(int(pitches), 1)
+        except (TypeError, ValueError):
+            return 1
+
     @staticmethod
     def cs_types2enum(cs_types: str) -> Set[RouteType]:
         """Parses a comma separated string of types
@@ -231,6 +386,8 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
         modifiers are in this order:
         lower grade's d, -, base, a, b, +, c, d, higher grade's -
 
+        Ratings are parsed by :func:`grades.parse_rating`, which remembers every rating it has parsed.
+
         Parameters
         ----------
         str_rating: str
@@ -239,67 +396,46 @@ class RatedRoute(Route, metaclass=ClassPropertyMetaClass):
         Returns
         -------
         float
-            A numeric representation of the grade
+            A numeric representation of the grade, NaN if the rating has no YDS grade, e.g. boulder or ice routes
         """
-        # Find the grade and the modifier if one exists
-        grade = re.match(RatedRoute.rating_regex, str_rating)
-        base = int(grade.group(1))  # Climb's Grade
-        suf = grade.group(2)  # Climb's Grade Modifier
-
-        # map modifier
-        # a, b, c, d, +, -> 1, 2, 3, 4, 2.5, -2.5
-        dec = int(ord(suf) - 96) if len(suf) > 0 else 0
-        dec = 2.5 if suf == '+' else dec
-        dec = -2.5 if suf == '-' else dec
-
-        return base + dec / 10
+        return parse_rating(str_rating).yds
 
     @staticmethod
-    def sort_crags(routes: List['RatedRoute'], parent_crag: str = None, base_only: bool = False):
+    def sort_crags(routes, parent_crag: str = None, base_only: bool = False, top_k: int = None,
+                   print_results: bool = True) -> List[Tuple[str, float]]:
         """
         Sorts crags by score, can filter out crags not within a given parent crag or that are not base level crags.
 
         Parameters
         ----------
-        routes : List[RatedRoute]
-            A list of RatedRoute objects
+        routes : List[RatedRoute] or CragTree
+            A list of RatedRoute objects, or a CragTree already built from them to avoid rebuilding it on every call
         parent_crag : str
             A string representing the parent crag, all returned crags will be a sub-crag of this crag
         base_only : bool
             Should be set to True if only base level crags should be returned, base level means a crag has no sub-crags
+        top_k : int
+            Only the best top_k crags are returned if given
+        print_results : bool
+            Whether to print the sorted crags
 
         Returns
         -------
-
+        sorted_crags : List[Tuple[str, float]]
+            (name, score) of each crag with a score above 0, best first
         """
-        # If there is a parent crag find the routes within that crag
-        if parent_crag is not None:
-            child_routes = [r for r in routes if parent_crag in r.location]
-        else:
-            child_routes = routes
-
-        # If only base level crags should be returned find them
-        if base_only:
-            base_level_crags = [r.location[-1] for r in child_routes]
-        else:
-            base_level_crags = None
-
-        # Storage for the crags to be returned
-        child_crags = defaultdict(float)
+        # Build the crag hierarchy unless it was given
+        tree = routes if isinstance(routes, CragTree) else CragTree.from_routes(routes)
 
-        # Loop through the routes and add each score to all of the routes crags
-        for r in child_routes:
-            for l in r.location:
-                child_crags[l] += r.score
+        # Rank the crags within the parent crag
+        sorted_crags = tree.rank(parent_crag, base_only, top_k)
 
-        # Sort the dictionary by score
-        sorted_crags = sorted(child_crags.items(), key=lambda kv: kv[1], reverse=True)
+        # Print the results if requested
+        if print_results:
+            for c in sorted_crags:
+                print("{}: {:5g}".format(c[0], c[1]))
 
-        # Print the results omitting non-base-level crags if requested and those with a score of 0.
-        for c in sorted_crags:
-            if not base_only or c[0] in base_level_crags:
-                if c[1] > 0:
-                    print("{}: {:5g}".format(c[0], c[1]))
+        return sorted_crags
 
     @classmethod
     def parse_config(cls, config: configparser.ConfigParser):
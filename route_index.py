@@ -0,0 +1,281 @@
+"""Route Index
+
+Contains the RouteIndex class, a spatial index over fetched routes for offline radius, bounding box, and nearest
+route queries
+"""
+from typing import Dict, Sequence, Tuple, Union
+
+import numpy as np
+
+from coordinate import haversine_miles, EARTH_RADIUS_MILES
+
+
+class RouteIndex:
+    """A grid index over route positions
+
+    Routes are bucketed into square cells of cell_size degrees. A query only looks at the cells its area touches, then
+    measures the exact distance to the routes in them.
+
+    Queries return the matching items, e.g. the routes the index was built from so they can be passed straight to
+    :meth:`route.RatedRoute.sort_crags`, or row indices if the index was built without items, e.g. from a
+    :class:`route_table.RouteTable`.
+
+    Parameters
+    ----------
+    lat : np.ndarray
+        Latitude of each route
+    lon : np.ndarray
+        Longitude of each route
+    items : Sequence
+        The object to return for each route, row indices are returned if None
+    cell_size : float
+        The size of each cell in degrees
+    """
+
+    def __init__(self, lat: np.ndarray, lon: np.ndarray, items: Sequence = None, cell_size: float = 0.05):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.items = items
+        self.cell_size = cell_size
+
+        # Sort the routes by cell so each cell is a contiguous slice of order
+        rows, cols = self._cell(self.lat, self.lon)
+        self.order = np.lexsort((cols, rows))
+        rows, cols = rows[self.order], cols[self.order]
+
+        starts = np.flatnonzero(np.r_[True, (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])])
+        ends = np.r_[starts[1:], len(rows)]
+        self.cells: Dict[Tuple[int, int], Tuple[int, int]] = {
+            (int(rows[s]), int(cols[s])): (int(s), int(e)) for s, e in zip(starts, ends)}
+
+    def __len__(self):
+        return len(self.lat)
+
+    @classmethod
+    def from_routes(cls, routes: Sequence, cell_size: float = 0.05) -> 'RouteIndex':
+        """Indexes route objects, queries return the routes
+
+        Parameters
+        ----------
+        routes : Sequence[Route]
+            The routes to index
+        cell_size : float
+            The size of each cell in degrees
+
+        Returns
+        -------
+        index : RouteIndex
+            An index of the routes
+        """
+        routes = list(routes)
+
+        return cls([r.latitude for r in routes], [r.longitude for r in routes], routes, cell_size)
+
+    @classmethod
+    def from_table(cls, table, cell_size: float = 0.05) -> 'RouteIndex':
+        """Indexes a route table, queries return row indices that can be passed to :meth:`RouteTable.take`
+
+        Parameters
+        ----------
+        table : RouteTable
+            The routes to index
+        cell_size : float
+            The size of each cell in degrees
+
+        Returns
+        -------
+        index : RouteIndex
+            An index of the table's rows
+        """
+        return cls(table.lat, table.lon, None, cell_size)
+
+    def _cell(self, lat, lon):
+        return (np.floor(np.asarray(lat) / self.cell_size).astype(np.int64),
+                np.floor(np.asarray(lon) / self.cell_size).astype(np.int64))
+
+    def _rows(self, south: float, west: float, north: float, east: float) -> np.ndarray:
+        """The rows of every route in the cells a bounding box touches
+        """
+        (row_0, row_1), (col_0, col_1) = self._cell([south, north], [west, east])
+
+        return self._cell_rows(row_0, row_1, col_0, col_1)
+
+    def _cell_rows(self, row_0: int, row_1: int, col_0: int, col_1: int) -> np.ndarray:
+        """The rows of every route in a block of cells, inclusive
+        """
+        slices = [self.cells.get((r, c)) for r in range(row_0, row_1 + 1) for c in range(col_0, col_1 + 1)]
+        slices = [s for s in slices if s is not None]
+        if not slices:
+            return np.zeros(0, dtype=np.int64)
+
+        return np.concatenate([self.order[s:e] for s, e in slices])
+
+    def _result(self, rows: np.ndarray) -> Union[list, np.ndarray]:
+        if self.items is None:
+            return rows
+        return [self.items[i] for i in rows]
+
+    def radius(self, lat: float, lon: float, miles: float) -> Union[list, np.ndarray]:
+        """Finds the routes within a distance of a point
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the point
+        lon : float
+            Longitude of the point
+        miles : float
+            The search radius in miles
+
+        Returns
+        -------
+        routes : list or np.ndarray
+            The routes within the radius, nearest first
+        """
+        d_lat = np.degrees(miles / EARTH_RADIUS_MILES)
+        d_lon = d_lat / max(np.cos(np.radians(min(abs(lat) + d_lat, 89.9))), 1e-6)
+
+        rows = self._rows(lat - d_lat, lon - d_lon, lat + d_lat, lon + d_lon)
+        distances = haversine_miles(lat, lon, self.lat[rows], self.lon[rows])
+
+        inside = distances <= miles
+        rows, distances = rows[inside], distances[inside]
+
+        return self._result(rows[np.argsort(distances, kind='stable')])
+
+    def bbox(self, south: float, west: float, north: float, east: float) -> Union[list, np.ndarray]:
+        """Finds the routes within a bounding box
+
+        Parameters
+        ----------
+        south : float
+            Minimum latitude
+        west : float
+            Minimum longitude
+        north : float
+            Maximum latitude
+        east : float
+            Maximum longitude
+
+        Returns
+        -------
+        routes : list or np.ndarray
+            The routes in the box
+        """
+        rows = self._rows(south, west, north, east)
+        lat, lon = self.lat[rows], self.lon[rows]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+
+        return self._result(np.sort(rows[inside]))
+
+    def nearest(self, lat: float, lon: float, k: int = 10) -> Union[list, np.ndarray]:
+        """Finds the k routes nearest to a point
+
+        Rings of cells around the point are searched until no unsearched cell can be closer than the k-th route found.
+
+        Parameters
+        ----------
+        lat : float
+            Latitude of the point
+        lon : float
+            Longitude of the point
+        k : int
+            The number of routes to find
+
+        Returns
+        -------
+        routes : list or np.ndarray
+            The k nearest routes, nearest first
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return self._result(np.zeros(0, dtype=np.int64))
+
+        cell_miles = np.radians(self.cell_size) * EARTH_RADIUS_MILES
+        row, col = (int(a) for a in self._cell(lat, lon))
+
+        ring = 0
+        rows = self._cell_rows(row, row, col, col)
+        while True:
+            # Every cell outside the searched square is at least ring cells away. Cells are narrowest at the square's
+            # latitude farthest from the equator, routes east or west of the square can be that close.
+            if len(rows) >= k:
+                edge = min(max(abs(row - ring), abs(row + ring + 1)) * self.cell_size, 90.0)
+                distances = haversine_miles(lat, lon, self.lat[rows], self.lon[rows])
+                best = np.argsort(distances, kind='stable')[:k]
+                if distances[best[-1]] <= ring * cell_miles * np.cos(np.radians(edge)) or len(rows) == len(self):
+                    return self._result(rows[best])
+
+            # Add the next ring of cells around the square
+            ring += 1
+            if (2 * ring + 1) ** 2 > len(self.cells):
+                # Sparse index, checking every route is cheaper than searching empty cells
+                distances = haversine_miles(lat, lon, self.lat, self.lon)
+                return self._result(np.argsort(distances, kind='stable')[:k])
+            rows = np.concatenate([rows,
+                                   self._cell_rows(row - ring, row - ring, col - ring, col + ring),
+                                   self._cell_rows(row + ring, row + ring, col - ring, col + ring),
+                                   self._cell_rows(row - ring + 1, row + ring - 1, col - ring, col - ring),
+                                   self._cell_rows(row - ring + 1, row + ring - 1, col + ring, col + ring)])
+
+    def save(self, path, positions: bool = True):
+        """Saves the index so it can be stored alongside crawl results, e.g. in a snapshot
+
+        Items are not saved, load returns row indices into the same list of routes. The cells are saved as well, so
+        loading does not sort the routes again.
+
+        Parameters
+        ----------
+        path : str or file
+            The .npz file to write
+        positions : bool
+            Whether to save the position of each route, leave them out if they are stored next to the index, e.g. as the
+            columns of a snapshot, and pass them to :meth:`load`
+
+        Returns
+        -------
+        nothing
+        """
+        cells = np.array([key + span for key, span in self.cells.items()], dtype=np.int64).reshape(-1, 4)
+        arrays = {'order': self.order, 'cells': cells, 'cell_size': self.cell_size}
+        if positions:
+            arrays.update(lat=self.lat, lon=self.lon)
+
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str, items: Sequence = None, lat: np.ndarray = None, lon: np.ndarray = None) -> 'RouteIndex':
+        """Loads an index written by :meth:`save`
+
+        Parameters
+        ----------
+        path : str
+            The .npz file to read
+        items : Sequence
+            The objects to return for each route, in the order the index was built
+        lat : np.ndarray
+            Latitude of each route, required if the index was saved without positions
+        lon : np.ndarray
+            Longitude of each route, required if the index was saved without positions
+
+        Returns
+        -------
+        index : RouteIndex
+            The loaded index
+        """
+        with np.load(path) as data:
+            lat = data['lat'] if lat is None else lat
+            lon = data['lon'] if lon is None else lon
+            cell_size = float(data['cell_size'])
+            if 'order' not in data.files:  # Saved without its cells, build them again
+                return cls(lat, lon, items, cell_size)
+
+            index = cls.__new__(cls)
+            index.lat = np.asarray(lat, dtype=np.float64)
+            index.lon = np.asarray(lon, dtype=np.float64)
+            index.items = items
+            index.cell_size = cell_size
+            index.order = data['order']
+            index.cells = {(r, c): (start, end) for r, c, start, end in data['cells'].tolist()}
+
+        return index
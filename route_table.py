@@ -0,0 +1,292 @@
+"""Route Table
+
+Contains the RouteTable class, a columnar store of routes that can be scored with vectorized operations
+"""
+from typing import Callable, Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from route import Route, RatedRoute, type_mask, intern_location
+from grades import parse_rating
+import scoring
+
+
+class RouteTable:
+    """Columns of route data stored as NumPy arrays
+
+    Each route is a row. Strings that many routes share are stored once, and routes refer to them by code, so
+    ``table.locations[table.location[i]]`` is the location path of route i and ``table.ratings[table.rating[i]]``
+    is its rating.
+
+    Parameters
+    ----------
+    columns : Dict[str, np.ndarray]
+        An array for each column in :attr:`column_types`
+    ratings : List[str]
+        The distinct rating strings
+    locations : List[Tuple[str, ...]]
+        The distinct location paths
+    names : List[str]
+        The name of each route
+    """
+    column_types = {
+        'id': np.int64,
+        'lat': np.float64,
+        'lon': np.float64,
+        'grade': np.float64,
+        'stars': np.float64,
+        'star_votes': np.int64,
+        'pitches': np.int64,
+        'types': np.uint16,
+        'rating': np.int32,
+        'location': np.int32,
+    }
+    """The name and type of each column
+
+    grade is the numeric YDS grade, see :meth:`route.RatedRoute.str2num_rating`, NaN if the rating is not a YDS grade.
+    Grades in other systems are available from :meth:`grades`.
+    types is a bitmask of the route's types, see :func:`route.type_mask`. rating and location are codes into
+    :attr:`ratings` and :attr:`locations`.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], ratings: List[str], locations: List[Tuple[str, ...]],
+                 names: List[str]):
+        for column, dtype in self.column_types.items():
+            setattr(self, column, np.asarray(columns[column], dtype=dtype))
+
+        self.ratings = ratings
+        self.locations = locations
+        self.names = names
+
+    def __len__(self):
+        return len(self.id)
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """The table's columns
+
+        Returns
+        -------
+        columns : Dict[str, np.ndarray]
+            Each column's array by name
+        """
+        return {column: getattr(self, column) for column in self.column_types}
+
+    @classmethod
+    def from_payload(cls, routes: Iterable[dict]) -> 'RouteTable':
+        """Builds a table from routes as returned by MP
+
+        Parameters
+        ----------
+        routes : Iterable[dict]
+            Route dictionaries from a MP query
+
+        Returns
+        -------
+        table : RouteTable
+            A table with one row per route
+        """
+        return cls._from_records(routes, dict.get)
+
+    @classmethod
+    def from_routes(cls, routes: Iterable[Route]) -> 'RouteTable':
+        """Builds a table from route objects
+
+        Type strings, ratings, and locations are parsed once per distinct value.
+
+        Parameters
+        ----------
+        routes : Iterable[Route]
+            The routes to store
+
+        Returns
+        -------
+        table : RouteTable
+            A table with one row per route
+        """
+        return cls._from_records(routes, getattr)
+
+    @classmethod
+    def _from_records(cls, routes: Iterable, get: Callable) -> 'RouteTable':
+        """Builds a table from route dictionaries or objects, reading each field with get(route, field)
+        """
+        columns = {column: [] for column in cls.column_types}
+        ratings = {}
+        locations = {}
+        masks = {}
+        names = []
+
+        for r in routes:
+            route_type = get(r, 'type')
+            if route_type not in masks:
+                masks[route_type] = type_mask(RatedRoute.cs_types2enum(route_type))
+            rating = ratings.setdefault(get(r, 'rating'), len(ratings))
+            location = locations.setdefault(intern_location(get(r, 'location') or ()), len(locations))
+
+            # MP sends null for some missing values and -1 stars for unrated routes, both score like no stars
+            columns['id'].append(get(r, 'id') or 0)
+            columns['lat'].append(get(r, 'latitude'))
+            columns['lon'].append(get(r, 'longitude'))
+            columns['stars'].append(max(get(r, 'stars') or 0, 0))
+            columns['star_votes'].append(get(r, 'starVotes') or 0)
+            columns['pitches'].append(RatedRoute.pitches2num(get(r, 'pitches')))
+            columns['types'].append(masks[route_type])
+            columns['rating'].append(rating)
+            columns['location'].append(location)
+            names.append(get(r, 'name'))
+
+        table = cls(dict(columns, grade=np.zeros(len(names))), list(ratings), list(locations), names)
+        table.grade = table.grades('yds')
+
+        return table
+
+    @classmethod
+    def merge(cls, tables: Iterable['RouteTable']) -> 'RouteTable':
+        """Combines tables into one, keeping only the first row of each route id
+
+        Parameters
+        ----------
+        tables : Iterable[RouteTable]
+            The tables to combine, e.g. the crawls of neighboring regions which share the routes along their borders
+
+        Returns
+        -------
+        table : RouteTable
+            A table with every distinct route, in the order they first appear
+        """
+        ratings = {}
+        locations = {}
+        columns = {column: [] for column in cls.column_types}
+        names = []
+
+        for table in tables:
+            # Map each table's string codes to the merged table's
+            rating_codes = np.array([ratings.setdefault(r, len(ratings)) for r in table.ratings], dtype=np.int32)
+            location_codes = np.array([locations.setdefault(l, len(locations)) for l in table.locations],
+                                      dtype=np.int32)
+
+            for column in cls.column_types:
+                array = getattr(table, column)
+                if column == 'rating' and len(array):
+                    array = rating_codes[array]
+                elif column == 'location' and len(array):
+                    array = location_codes[array]
+                columns[column].append(array)
+            names.extend(table.names)
+
+        merged = {column: np.concatenate(arrays) if arrays else np.zeros(0, dtype=dtype)
+                  for (column, arrays), dtype in zip(columns.items(), cls.column_types.values())}
+        _, first = np.unique(merged['id'], return_index=True)
+        first.sort()
+
+        return cls({column: array[first] for column, array in merged.items()}, list(ratings), list(locations),
+                   [names[i] for i in first])
+
+    def update(self, other: 'RouteTable') -> np.ndarray:
+        """Overwrites the rows of routes that are also in another table with the other table's values
+
+        The table is changed in place. Columns that are read only, such as those memory-mapped from a snapshot, are
+        copied into memory first.
+
+        Parameters
+        ----------
+        other : RouteTable
+            Newer copies of some of the routes, e.g. from :meth:`mountain_project.refresh_routes`
+
+        Returns
+        -------
+        updated : np.ndarray
+            Whether each row was found in other and updated
+        """
+        order = np.argsort(other.id, kind='stable')
+        ids = other.id[order]
+        positions = np.minimum(np.searchsorted(ids, self.id), max(len(ids) - 1, 0))
+        updated = ids[positions] == self.id if len(ids) else np.zeros(len(self), dtype=bool)
+        rows, source = np.flatnonzero(updated), order[positions[updated]]
+
+        # Codes of other's strings in this table, adding any new ones
+        rating_codes = {r: i for i, r in enumerate(self.ratings)}
+        location_codes = {l: i for i, l in enumerate(self.locations)}
+        new_ratings = np.array([rating_codes.setdefault(r, len(rating_codes)) for r in other.ratings], dtype=np.int32)
+        new_locations = np.array([location_codes.setdefault(intern_location(l), len(location_codes))
+                                  for l in other.locations], dtype=np.int32)
+        self.ratings = list(rating_codes)
+        self.locations = list(location_codes)
+
+        for column in self.column_types:
+            array = getattr(self, column)
+            if not array.flags.writeable:
+                array = np.array(array)
+                setattr(self, column, array)
+
+            values = getattr(other, column)[source]
+            if column == 'rating' and len(values):
+                values = new_ratings[values]
+            elif column == 'location' and len(values):
+                values = new_locations[values]
+            array[rows] = values
+
+        if not isinstance(self.names, list):
+            self.names = list(self.names)
+        for row, i in zip(rows.tolist(), source.tolist()):
+            self.names[row] = other.names[i]
+
+        return updated
+
+    def grades(self, system: str = 'yds') -> np.ndarray:
+        """A numeric grade column for one grade system
+
+        Each distinct rating is parsed once, see :func:`grades.parse_rating`.
+
+        Parameters
+        ----------
+        system : str
+            One of :data:`grades.GRADE_SYSTEMS`
+
+        Returns
+        -------
+        grades : np.ndarray
+            The numeric grade of each route, NaN where the route has no grade in the system
+        """
+        values = np.array([getattr(parse_rating(rating), system) for rating in self.ratings], dtype=np.float64)
+
+        return values[self.rating] if len(values) else np.zeros(0)
+
+    def take(self, indices: np.ndarray) -> 'RouteTable':
+        """Selects rows of the table
+
+        Parameters
+        ----------
+        indices : np.ndarray
+            Row indices or a boolean mask
+
+        Returns
+        -------
+        table : RouteTable
+            A table of the selected rows sharing this table's string tables
+        """
+        rows = np.arange(len(self))[indices]
+
+        return RouteTable({column: array[rows] for column, array in self.columns.items()},
+                          self.ratings, self.locations, [self.names[i] for i in rows])
+
+    def score(self, profile=None) -> np.ndarray:
+        """Scores every route at once
+
+        With no profile the scoring settings of :class:`route.RatedRoute` are used, giving the same scores as
+        :attr:`route.RatedRoute.score`. Use :func:`scoring.score_profiles` to score against several profiles at once.
+
+        Parameters
+        ----------
+        profile : scoring.ScoreProfile
+            The profile to score against, RatedRoute's settings if None
+
+        Returns
+        -------
+        scores : np.ndarray
+            The score of each route
+        """
+        if profile is None:
+            profile = scoring.ScoreProfile.from_rated_route()
+
+        return profile.score(self)
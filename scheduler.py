@@ -0,0 +1,204 @@
+"""Multi-Region Scheduler
+
+Crawls several regions at once, one region per process, e.g. every western state each night. The processes share one
+response cache and one rate limit, each region is written to its own snapshot, and the snapshots are merged into one
+table of distinct routes. Run as a script to crawl GeoJSON files with the settings in settings.ini, e.g.
+``python scheduler.py states/*.geojson --processes 4``
+"""
+import argparse
+import configparser
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
+from typing import Dict, List
+
+import numpy as np
+
+import gen_settings
+import mountain_project
+import scoring
+import snapshot
+from checkpoint import Checkpoint
+from covering import HexCovering
+from density import DensityModel
+from rate_limit import SharedTokenBucket, QuotaCounter
+from region import Region
+from response_cache import ResponseCache
+from route_table import RouteTable
+from transport import Transport
+
+
+def _init_worker(base_url: str, key: str, limiter: SharedTokenBucket, cache_path: str, ttl_days: float,
+                 daily_quota: int, workers: int, http: dict):
+    """Sets up the crawl globals of a worker process, every worker uses the same cache file and limiter
+    """
+    mountain_project.MP_BASE_URL = base_url
+    mountain_project.MP_API_KEY = key
+    mountain_project.CRAWL_WORKERS = workers
+    mountain_project.transport = Transport(**http)
+    mountain_project.cache = ResponseCache(cache_path, ttl_days)
+    mountain_project.density = DensityModel(cache_path)
+    mountain_project.quota = QuotaCounter(cache_path, daily_quota)
+    mountain_project.limiter = limiter
+
+
+def _crawl_region(name: str, region: Region, output: str, covering: str) -> dict:
+    """Crawls one region into a snapshot in a worker process
+
+    The crawl is checkpointed next to its snapshot, so a region interrupted on one night resumes on the next.
+    """
+    path = os.path.join(output, name)
+    checkpoint = Checkpoint(path + '.checkpoint')
+    mountain_project.crawl_stats.clear()
+
+    start = time.perf_counter()
+    unique = 0
+    # The progress of several crawls at once is unreadable, only their summaries are printed
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        seeds = HexCovering.cover(region.triangles()) if covering == 'hex' else region.seeds()
+        with snapshot.SnapshotWriter(path) as writer:
+            for routes, triangles in mountain_project.stream_routes(seeds, region=region, checkpoint=checkpoint):
+                writer.add(RouteTable.from_routes(routes), triangles)
+                unique += len(routes)
+    checkpoint.remove()
+
+    return dict(mountain_project.crawl_stats, name=name, snapshot=path, routes=unique,
+                seconds=time.perf_counter() - start, pid=os.getpid())
+
+
+def crawl_regions(regions: Dict[str, Region], output: str, processes: int = None, covering: str = 'triangles',
+                  base_url: str = None, key: str = None, limiter: SharedTokenBucket = None,
+                  cache_path: str = os.path.join('cache', 'routes.sqlite'), ttl_days: float = 30,
+                  daily_quota: int = 0, workers: int = 4, http: dict = None) -> List[dict]:
+    """Crawls regions in a pool of processes
+
+    Each region is crawled by one process with workers requests in flight, the largest regions start first. The
+    processes share the response cache, density history, and quota count through the cache's SQLite file, and one
+    rate limit through the shared limiter. A region that fails is reported and the others carry on.
+
+    Parameters
+    ----------
+    regions : Dict[str, Region]
+        The regions to crawl by name, names are used as the snapshot directory names
+    output : str
+        The directory the snapshots are written to
+    processes : int
+        The number of processes, the number of CPUs if None
+    covering : str
+        'triangles' to split triangles or 'hex' for a :class:`covering.HexCovering`
+    base_url : str
+        MP's data API or a stand-in, :data:`mountain_project.MP_BASE_URL` if None
+    key : str
+        The MP API key, :data:`mountain_project.MP_API_KEY` if None
+    limiter : SharedTokenBucket
+        The rate limit shared by every process, requests are not paced if None
+    cache_path : str
+        The response cache file
+    ttl_days : float
+        The number of days cache entries are valid for
+    daily_quota : int
+        The number of requests allowed per key per day, 0 for no limit
+    workers : int
+        The number of requests each process keeps in flight
+    http : dict
+        Keyword arguments of each process's :class:`transport.Transport`
+
+    Returns
+    -------
+    results : List[dict]
+        The crawl stats, route count, snapshot path, and time of each region that finished, or its error
+    """
+    os.makedirs(output, exist_ok=True)
+    initargs = (mountain_project.MP_BASE_URL if base_url is None else base_url,
+                mountain_project.MP_API_KEY if key is None else key,
+                limiter, cache_path, ttl_days, daily_quota, workers, http or {})
+
+    # Start with the largest regions so a big one is not left running alone at the end
+    def area(region):
+        (south, west), (north, east) = region.edge_start.min(axis=0), region.edge_start.max(axis=0)
+        return (north - south) * (east - west) * np.cos(np.radians((north + south) / 2))
+
+    names = sorted(regions, key=lambda name: area(regions[name]), reverse=True)
+
+    results = []
+    with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=initargs) as pool:
+        futures = {pool.submit(_crawl_region, name, regions[name], output, covering): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                print('{}: failed, {}'.format(name, e))
+                results.append({'name': name, 'error': str(e)})
+                continue
+
+            print('{name}: {routes} routes in {seconds:.1f} s'.format(**result))
+            results.append(result)
+
+    return results
+
+
+def merge_snapshots(paths: List[str]) -> RouteTable:
+    """Merges the routes of several snapshots, routes in more than one are kept once
+
+    Parameters
+    ----------
+    paths : List[str]
+        The snapshot directories
+
+    Returns
+    -------
+    table : RouteTable
+        Every distinct route by id
+    """
+    return RouteTable.merge(snapshot.load(path)[0] for path in paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[2])
+    parser.add_argument('regions', nargs='+', metavar='GEOJSON',
+                        help='GeoJSON files of the regions to crawl, named after the files')
+    parser.add_argument('--processes', type=int, default=None, help='regions crawled at once, default one per CPU')
+    parser.add_argument('--output', default='regions', help='directory for the snapshot of each region')
+    parser.add_argument('--merged', default='merged', help='snapshot of every distinct route, blank for none')
+    args = parser.parse_args()
+
+    # Make sure all settings at least have the defaults
+    gen_settings.gen_settings()
+    config = configparser.ConfigParser()
+    config.read(gen_settings.SETTINGS_FILE)
+
+    mountain_project.MP_API_KEY = config['MP API']['key']
+    mountain_project.validate_key()
+
+    http = config['HTTP']
+    regions = {os.path.splitext(os.path.basename(path))[0]: Region.from_geojson(path) for path in args.regions}
+    start = time.perf_counter()
+    results = crawl_regions(regions, args.output, args.processes, config['CRAWL']['covering'],
+                            config['MP API']['base_url'], mountain_project.MP_API_KEY,
+                            SharedTokenBucket.from_config(config), config['CACHE']['path'],
+                            config['CACHE'].getfloat('ttl_days'), config['MP API'].getint('daily_quota'),
+                            config['CRAWL'].getint('workers'),
+                            {'retries': http.getint('retries'), 'backoff': http.getfloat('backoff'),
+                             'connect_timeout': http.getfloat('connect_timeout'),
+                             'read_timeout': http.getfloat('read_timeout'), 'pool_size': http.getint('pool_size')})
+
+    finished = [r['snapshot'] for r in results if 'snapshot' in r]
+    table = merge_snapshots(finished)
+    print('{} distinct routes from {} of {} regions in {:.1f} s'.format(len(table), len(finished), len(regions),
+                                                                        time.perf_counter() - start))
+    if args.merged:
+        snapshot.write(args.merged, table, [])
+
+    # Score the merged routes against every profile and show the best crags overall
+    for name, ranked in scoring.rank_profiles(table, scoring.parse_profiles(config), base_only=True,
+                                              top_k=10).items():
+        print('{}:'.format(name))
+        for crag, score in ranked:
+            print("{}: {:5g}".format(crag, score))
+
+
+# Allow module standalone run
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""Scoring Engine
+
+Scores routes against any number of independent climber profiles at once. Profiles are plain objects, so unlike the
+class level settings of :class:`route.RatedRoute` several can be used side by side, in one process or across threads.
+"""
+import configparser
+from typing import Dict, List, Set, Tuple
+
+import numpy as np
+
+from route import RouteType, RatedRoute, type_mask
+from crag_tree import CragTree
+from grades import parse_rating
+
+
+class ScoreProfile:
+    """The settings that decide which routes a climber wants and how they are scored
+
+    Parameters
+    ----------
+    name : str
+        The name of the profile
+    required_types : Set[RouteType]
+        The climbing types that must be part of a route to be included in the score
+    optional_types : Set[RouteType]
+        The climbing types that are desired but not required to be part of the score
+    prohibited_types : Set[RouteType]
+        The climbing types that may not be part of a route if it is included in the score
+    min_rating : str
+        The minimum rating a route should have to be included in the score
+    max_rating : str
+        The maximum rating a route should have to be included in the score
+    min_pitches : int
+        The minimum number of pitches a route should have to be included in the score
+    max_pitches : int
+        The maximum number of pitches a route should have to be included in the score
+    """
+
+    def __init__(self, name: str = 'default', required_types: Set[RouteType] = frozenset(),
+                 optional_types: Set[RouteType] = frozenset(), prohibited_types: Set[RouteType] = frozenset(),
+                 min_rating: str = '5.0', max_rating: str = '5.15', min_pitches: int = 0, max_pitches: int = 1):
+        self.name = name
+        self.required_types = set(required_types)
+        self.optional_types = set(optional_types)
+        self.prohibited_types = set(prohibited_types)
+        self.min_rating = min_rating
+        self.max_rating = max_rating
+        self.min_pitches = min_pitches
+        self.max_pitches = max_pitches
+
+    def __repr__(self):
+        return 'ScoreProfile({!r})'.format(self.name)
+
+    @classmethod
+    def from_section(cls, name: str, section: configparser.SectionProxy) -> 'ScoreProfile':
+        """Creates a profile from a [SCORE]-style settings section
+
+        Parameters
+        ----------
+        name : str
+            The name of the profile
+        section : configparser.SectionProxy
+            A section with required, optional, prohibited, min_rating, max_rating, min_pitches, and max_pitches
+
+        Returns
+        -------
+        profile : ScoreProfile
+            The profile described by the section
+        """
+        required = RatedRoute.cs_types2enum(section['required'])
+        optional = RatedRoute.cs_types2enum(section['optional'])
+        prohibited = section['prohibited']
+        # If prohibited is other all are prohibited except for those in required and optional
+        if prohibited.lower() == 'other':
+            prohibited = {t for t in RouteType} - (required | optional)
+        else:
+            prohibited = RatedRoute.cs_types2enum(prohibited)
+
+        return cls(name, required, optional, prohibited, section['min_rating'], section['max_rating'],
+                   int(section['min_pitches']), int(section['max_pitches']))
+
+    @classmethod
+    def from_rated_route(cls) -> 'ScoreProfile':
+        """Creates a profile from the class level settings of :class:`route.RatedRoute`
+
+        Returns
+        -------
+        profile : ScoreProfile
+            A copy of RatedRoute's current settings
+        """
+        return cls('default', RatedRoute.required_types, RatedRoute.optional_types, RatedRoute.prohibited_types,
+                   RatedRoute.min_rating, RatedRoute.max_rating, RatedRoute.min_pitches, RatedRoute.max_pitches)
+
+    def score(self, table) -> np.ndarray:
+        """Scores every route in a table
+
+        Parameters
+        ----------
+        table : RouteTable
+            The routes to score
+
+        Returns
+        -------
+        scores : np.ndarray
+            The score of each route
+        """
+        return score_profiles(table, [self])[0]
+
+
+def parse_profiles(config: configparser.ConfigParser) -> List[ScoreProfile]:
+    """Reads every scoring profile in the settings
+
+    The [SCORE] section is the profile named 'default', and each [SCORE name] section is a profile named name.
+
+    Parameters
+    ----------
+    config : configparser.ConfigParser
+        A configparser with score settings
+
+    Returns
+    -------
+    profiles : List[ScoreProfile]
+        The profiles in the order they appear in the settings
+    """
+    profiles = []
+    for section in config.sections():
+        if section == 'SCORE':
+            profiles.append(ScoreProfile.from_section('default', config[section]))
+        elif section.startswith('SCORE '):
+            profiles.append(ScoreProfile.from_section(section[len('SCORE '):].strip(), config[section]))
+
+    return profiles
+
+
+def score_profiles(table, profiles: List[ScoreProfile]) -> np.ndarray:
+    """Scores every route against every profile in one vectorized pass
+
+    Each profile's settings become a column that is broadcast against the table's route columns. Type filters are
+    bitmask operations and the grade and pitch windows are array comparisons.
+
+    Parameters
+    ----------
+    table : RouteTable
+        The routes to score
+    profiles : List[ScoreProfile]
+        The profiles to score against
+
+    Returns
+    -------
+    scores : np.ndarray
+        Profiles x routes array of scores, routes a profile does not want score 0
+    """
+    def column(values, dtype):
+        return np.array(values, dtype=dtype)[:, None]
+
+    required = column([type_mask(p.required_types) for p in profiles], np.uint16)
+    desired = column([type_mask(p.optional_types | p.required_types) for p in profiles], np.uint16)
+    prohibited = column([type_mask(p.prohibited_types) for p in profiles], np.uint16)
+    min_grade = column([parse_rating(p.min_rating).yds for p in profiles], np.float64)
+    max_grade = column([parse_rating(p.max_rating).yds for p in profiles], np.float64)
+    min_pitches = column([p.min_pitches for p in profiles], np.int64)
+    max_pitches = column([p.max_pitches for p in profiles], np.int64)
+
+    types = table.types[None, :]
+    grade = table.grade[None, :]
+    pitches = table.pitches[None, :]
+
+    # Type filters
+    keep = (types & required) == required
+    keep &= (types & desired) != 0
+    keep &= (types & prohibited) == 0
+
+    # Grade and pitch windows, NaN grades fail both comparisons
+    keep &= (grade >= min_grade) & (grade <= max_grade)
+    keep &= (pitches >= min_pitches) & (pitches <= max_pitches)
+
+    return np.where(keep, 1 + np.sqrt(np.maximum(table.stars, 0))[None, :], 0)
+
+
+def rank_profiles(table, profiles: List[ScoreProfile], parent_crag: str = None, base_only: bool = False,
+                  top_k: int = None) -> Dict[str, List[Tuple[str, float]]]:
+    """Ranks crags for every profile
+
+    The routes are scored in one pass and summed into a single crag tree that holds a score for each profile.
+
+    Parameters
+    ----------
+    table : RouteTable
+        The routes to rank
+    profiles : List[ScoreProfile]
+        The profiles to rank for
+    parent_crag : str
+        Only crags within this crag are ranked, all are ranked if None
+    base_only : bool
+        Only rank base level crags
+    top_k : int
+        Only return the best top_k crags of each profile
+
+    Returns
+    -------
+    rankings : Dict[str, List[Tuple[str, float]]]
+        The (name, score) of each crag, best first, for each profile name
+    """
+    tree = CragTree.from_table(table, score_profiles(table, profiles))
+
+    return {p.name: tree.rank(parent_crag, base_only, top_k, column=i) for i, p in enumerate(profiles)}
@@ -0,0 +1,348 @@
+"""Crawl Snapshots
+
+Saves the results of a crawl, the route columns and final triangles, so later runs can start from them instantly. A
+snapshot is a directory with one .npy file per column, which is memory-mapped when loaded, a JSON string table, and a
+:class:`route_index.RouteIndex` of the routes' positions.
+"""
+import json
+import os
+import shutil
+import time
+from typing import List, Tuple
+
+import numpy as np
+
+from coordinate import Coordinate
+from covering import Cell
+from route import intern_location
+from route_index import RouteIndex
+from route_table import RouteTable
+from triangle import Triangle
+
+SNAPSHOT_VERSION = 1
+"""The version of the snapshot format, snapshots of other versions can not be loaded
+"""
+
+
+def write(path: str, table: RouteTable, triangles: List[Triangle]):
+    """Writes a crawl snapshot
+
+    The snapshot is written next to path and moved into place once it is complete, replacing any existing snapshot.
+    Use :class:`SnapshotWriter` to write the results of a crawl as they are streamed.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot directory
+    table : RouteTable
+        The crawled routes
+    triangles : List[Triangle]
+        The final triangles of the crawl, their routes should be in the table. Hexagonal cells from
+        :mod:`covering` are stored the same way.
+
+    Returns
+    -------
+    nothing
+    """
+    with SnapshotWriter(path) as writer:
+        writer.add(table, triangles)
+
+
+class SnapshotWriter:
+    """Writes a snapshot a part at a time
+
+    Columns are appended to raw files as routes are added and only converted to .npy files when the writer is closed,
+    so memory does not grow with the number of routes beyond an id to row map. Each part's string codes are mapped to
+    the snapshot's. The snapshot only replaces an existing one at path once it is closed, if the writer is used as a
+    context manager an error abandons the partial snapshot instead.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot directory
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.partial = path.rstrip(os.sep) + '.partial'
+        if os.path.isdir(self.partial):
+            shutil.rmtree(self.partial)
+        os.makedirs(self.partial)
+
+        self._columns = {column: open(self._file(column + '.raw'), 'wb') for column in RouteTable.column_types}
+        self._names = open(self._file('names.jsonl'), 'w')
+        self._triangle_rows = open(self._file('triangle_rows.raw'), 'wb')
+
+        self._ratings = {}
+        self._locations = {}
+        self._rows = {}
+        self._routes = 0
+
+        self._vertices = []
+        self._truncated = []
+        self._difficulties = []
+        self._offsets = [0]
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.partial, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add(self, table: RouteTable, triangles: List[Triangle] = ()):
+        """Appends routes and final triangles to the snapshot
+
+        Parameters
+        ----------
+        table : RouteTable
+            Routes to add
+        triangles : List[Triangle]
+            Final triangles to add, their routes must be in this or an earlier table
+
+        Returns
+        -------
+        nothing
+        """
+        ratings = np.array([self._ratings.setdefault(r, len(self._ratings)) for r in table.ratings], dtype=np.int32)
+        locations = np.array([self._locations.setdefault(l, len(self._locations)) for l in table.locations],
+                             dtype=np.int32)
+
+        for column, dtype in RouteTable.column_types.items():
+            array = getattr(table, column)
+            if column == 'rating':
+                array = ratings[array] if len(array) else array
+            elif column == 'location':
+                array = locations[array] if len(array) else array
+            self._columns[column].write(np.ascontiguousarray(array, dtype=dtype).tobytes())
+
+        for name in table.names:
+            self._names.write(json.dumps(name) + '\n')
+
+        for row, route_id in enumerate(table.id.tolist(), self._routes):
+            self._rows.setdefault(route_id, row)
+        self._routes += len(table)
+
+        # Triangles, and the rows of each triangle's routes stored as offsets into one array
+        for t in triangles:
+            rows = np.array([self._rows[r.id] for r in t.routes or []], dtype=np.int64)
+            self._triangle_rows.write(rows.tobytes())
+            self._offsets.append(self._offsets[-1] + len(rows))
+            self._vertices.append(t.lat_lon)
+            self._truncated.append(t.truncated)
+            self._difficulties.append([t.minDiff, t.maxDiff])
+
+    def close(self):
+        """Finishes the snapshot and moves it into place
+
+        Returns
+        -------
+        nothing
+        """
+        for f in list(self._columns.values()) + [self._names, self._triangle_rows]:
+            f.close()
+
+        for column, dtype in RouteTable.column_types.items():
+            self._npy(column, dtype)
+        self._npy('triangle_rows', np.int64)
+
+        # Cells have more corners than triangles, shorter shapes are padded with NaN corners
+        corners = max((len(v) for v in self._vertices), default=3)
+        vertices = np.full((len(self._vertices), corners, 2), np.nan)
+        for padded, v in zip(vertices, self._vertices):
+            padded[:len(v)] = v
+
+        np.save(self._file('triangle_vertices.npy'), vertices)
+        np.save(self._file('triangle_truncated.npy'), np.array(self._truncated, dtype=bool))
+        np.save(self._file('triangle_offsets.npy'), np.array(self._offsets, dtype=np.int64))
+
+        # Index the positions from the column files, the index only stores its cells
+        RouteIndex(np.load(self._file('lat.npy'), mmap_mode='r'),
+                   np.load(self._file('lon.npy'), mmap_mode='r')).save(self._file('index.npz'), positions=False)
+
+        # Names are copied from their file a line at a time rather than loaded
+        with open(self._file('strings.json'), 'w') as f, open(self._file('names.jsonl')) as names:
+            f.write('{{"ratings":{},"locations":{},"difficulties":{},"names":['.format(
+                json.dumps(list(self._ratings), separators=(',', ':')),
+                json.dumps(list(self._locations), separators=(',', ':')),
+                json.dumps(self._difficulties, separators=(',', ':'))))
+            for i, line in enumerate(names):
+                f.write((',' if i else '') + line.rstrip('\n'))
+            f.write(']}')
+        os.remove(self._file('names.jsonl'))
+
+        # The manifest is written last, a snapshot without one is incomplete
+        with open(self._file('manifest.json'), 'w') as f:
+            json.dump({'version': SNAPSHOT_VERSION,
+                       'created': time.time(),
+                       'routes': self._routes,
+                       'triangles': len(self._vertices),
+                       'columns': {column: np.dtype(dtype).name for column, dtype in RouteTable.column_types.items()}},
+                      f, indent=2)
+
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.replace(self.partial, self.path)
+
+    def abort(self):
+        """Abandons the snapshot, any existing snapshot at path is left as it is
+
+        Returns
+        -------
+        nothing
+        """
+        for f in list(self._columns.values()) + [self._names, self._triangle_rows]:
+            f.close()
+        shutil.rmtree(self.partial, ignore_errors=True)
+
+    def _npy(self, name: str, dtype):
+        """Converts a raw column file into a .npy file without loading it
+        """
+        raw = self._file(name + '.raw')
+        n = os.path.getsize(raw) // np.dtype(dtype).itemsize
+        out = np.lib.format.open_memmap(self._file(name + '.npy'), mode='w+', dtype=dtype, shape=(n,))
+        if n:
+            source = np.memmap(raw, dtype=dtype, mode='r')
+            for i in range(0, n, 1 << 20):
+                out[i:i + (1 << 20)] = source[i:i + (1 << 20)]
+            del source
+        out.flush()
+        del out
+        os.remove(raw)
+
+
+def load(path: str) -> Tuple[RouteTable, List[Triangle], List[np.ndarray], RouteIndex]:
+    """Loads a crawl snapshot
+
+    Columns are memory-mapped, so only the parts that are used are read from disk.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot directory
+
+    Returns
+    -------
+    table : RouteTable
+        The crawled routes
+    triangles : List[Triangle]
+        The final triangles, or :class:`covering.Cell` objects, of the crawl. Their routes are not loaded as objects,
+        see triangle_rows
+    triangle_rows : List[np.ndarray]
+        The table rows of each triangle's routes
+    index : RouteIndex
+        A spatial index of the table's rows, built from the columns if the snapshot has none
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest['version'] != SNAPSHOT_VERSION:
+        raise ValueError('Snapshot {} is version {}, expected version {}'.format(path, manifest['version'],
+                                                                              SNAPSHOT_VERSION))
+
+    with open(os.path.join(path, 'strings.json')) as f:
+        strings = json.load(f)
+
+    columns = {column: np.load(os.path.join(path, column + '.npy'), mmap_mode='r')
+               for column in RouteTable.column_types}
+    table = RouteTable(columns, strings['ratings'], [intern_location(l) for l in strings['locations']],
+                       strings['names'])
+
+    vertices = np.load(os.path.join(path, 'triangle_vertices.npy'))
+    truncated = np.load(os.path.join(path, 'triangle_truncated.npy'))
+    offsets = np.load(os.path.join(path, 'triangle_offsets.npy'))
+    rows = np.load(os.path.join(path, 'triangle_rows.npy'), mmap_mode='r')
+
+    triangles = []
+    for v, (min_diff, max_diff), t in zip(vertices, strings['difficulties'], truncated):
+        corners = [Coordinate(float(lat), float(lon)) for lat, lon in v if not np.isnan(lat)]
+        if len(corners) == 3:
+            triangle = Triangle(corners, min_diff, max_diff)
+        else:
+            triangle = Cell.from_vertices(corners, min_diff, max_diff)
+        triangle.truncated = bool(t)
+        triangles.append(triangle)
+
+    index_path = os.path.join(path, 'index.npz')
+    if os.path.isfile(index_path):
+        index = RouteIndex.load(index_path, lat=table.lat, lon=table.lon)
+    else:
+        index = RouteIndex.from_table(table)
+
+    return table, triangles, [rows[s:e] for s, e in zip(offsets[:-1], offsets[1:])], index
+
+
+def update(path: str, table: RouteTable):
+    """Replaces the routes of a snapshot with newer copies of the same routes, keeping its triangles
+
+    A complete new snapshot is written next to path, with the triangle files copied from the old one, and moved into
+    place once the old snapshot is removed. The table's columns are copied into memory first, so the table stays usable
+    after its memory-mapped files are gone. Other objects loaded from the snapshot, such as the triangle rows and the
+    index, still map the old files and must be released first, files that are mapped can not be removed on Windows.
+
+    Parameters
+    ----------
+    path : str
+        The snapshot directory
+    table : RouteTable
+        The snapshot's table with its rows updated, e.g. by :func:`mountain_project.refresh_routes`
+
+    Returns
+    -------
+    nothing
+    """
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest['routes'] != len(table):
+        raise ValueError('Snapshot {} has {} routes, the table has {}'.format(path, manifest['routes'], len(table)))
+
+    # Columns that were not updated still map the old files
+    for column, dtype in RouteTable.column_types.items():
+        setattr(table, column, np.array(getattr(table, column), dtype=dtype))
+
+    partial = path.rstrip(os.sep) + '.partial'
+    if os.path.isdir(partial):
+        shutil.rmtree(partial)
+    os.makedirs(partial)
+
+    for column in RouteTable.column_types:
+        np.save(os.path.join(partial, column + '.npy'), getattr(table, column))
+    for name in ('triangle_vertices.npy', 'triangle_truncated.npy', 'triangle_offsets.npy', 'triangle_rows.npy'):
+        shutil.copyfile(os.path.join(path, name), os.path.join(partial, name))
+
+    with open(os.path.join(path, 'strings.json')) as f:
+        difficulties = json.load(f)['difficulties']
+    with open(os.path.join(partial, 'strings.json'), 'w') as f:
+        json.dump({'ratings': list(table.ratings), 'locations': list(table.locations), 'difficulties': difficulties,
+                   'names': list(table.names)}, f, separators=(',', ':'))
+
+    # Routes may have moved
+    RouteIndex.from_table(table).save(os.path.join(partial, 'index.npz'), positions=False)
+
+    # The manifest is written last, a snapshot without one is incomplete
+    manifest['updated'] = time.time()
+    with open(os.path.join(partial, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(path)
+    os.replace(partial, path)
+
+
+def exists(path: str) -> bool:
+    """Checks if a complete snapshot exists
+
+    Parameters
+    ----------
+    path : str
+        The snapshot directory
+
+    Returns
+    -------
+    exists : bool
+        Whether the directory holds a finished snapshot
+    """
+    return os.path.isfile(os.path.join(path, 'manifest.json'))
@@ -0,0 +1,103 @@
+"""Synthetic Routes
+
+Generates route data shaped like Mountain Project's for benchmarks and offline testing
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from grades import YDS_GRADES
+
+HOTSPOTS = [
+    # name, lat, lon, spread in degrees, share of routes
+    ('Boulder', 40.01, -105.30, 0.04, 0.25),
+    ('Eldorado Canyon SP', 39.93, -105.29, 0.01, 0.10),
+    ('Rifle Mountain Park', 39.71, -107.69, 0.01, 0.08),
+    ('Clear Creek Canyon', 39.74, -105.32, 0.03, 0.10),
+    ('Shelf Road', 38.63, -105.22, 0.02, 0.07),
+]
+"""Dense climbing areas, routes are normally distributed around each center
+"""
+
+COLORADO = (36.680672, -109.354249, 41.051978, -101.913311)
+"""(south, west, north, east) bounds of Colorado, routes not in a hotspot are spread uniformly across it
+"""
+
+TYPES = ['Sport', 'Trad', 'Sport, TR', 'Trad, TR', 'Boulder', 'Trad, Aid', 'Ice, Mixed', 'Trad, Alpine']
+TYPE_WEIGHTS = [0.35, 0.25, 0.1, 0.05, 0.15, 0.03, 0.02, 0.05]
+
+
+def synthetic_routes(n: int, seed: int = 0, hotspots: List[Tuple[str, float, float, float, float]] = None,
+                     bounds: Tuple[float, float, float, float] = COLORADO) -> List[dict]:
+    """Generates routes with the fields MP returns
+
+    Parameters
+    ----------
+    n : int
+        The number of routes
+    seed : int
+        Seed for the random generator so the same routes are generated every time
+    hotspots : List[Tuple[str, float, float, float, float]]
+        Dense areas as (name, lat, lon, spread, share), defaults to :data:`HOTSPOTS`
+    bounds : Tuple[float, float, float, float]
+        (south, west, north, east) bounds of the routes outside the hotspots
+
+    Returns
+    -------
+    routes : List[dict]
+        Route dictionaries like those in MP's responses
+    """
+    rng = np.random.RandomState(seed)
+    hotspots = HOTSPOTS if hotspots is None else hotspots
+
+    # Pick the area of each route, the last area is the uniform background
+    shares = [h[4] for h in hotspots]
+    areas = rng.choice(len(hotspots) + 1, size=n, p=shares + [1 - sum(shares)])
+
+    lat = rng.uniform(bounds[0], bounds[2], n)
+    lon = rng.uniform(bounds[1], bounds[3], n)
+    for i, (_, h_lat, h_lon, spread, _) in enumerate(hotspots):
+        in_area = areas == i
+        lat[in_area] = rng.normal(h_lat, spread, in_area.sum())
+        lon[in_area] = rng.normal(h_lon, spread, in_area.sum())
+
+    types = rng.choice(len(TYPES), size=n, p=TYPE_WEIGHTS)
+    grades = rng.randint(0, len(YDS_GRADES) - 8, n)
+    stars = rng.uniform(0, 4, n).round(1)
+    votes = rng.randint(0, 60, n)
+    pitches = rng.choice([1, 1, 1, 1, 2, 3, 5], size=n)
+    walls = rng.randint(0, 40, n)
+    has_images = rng.random_sample(n) < 0.4
+
+    routes = []
+    for i in range(n):
+        area = hotspots[areas[i]][0] if areas[i] < len(hotspots) else 'Region {}'.format(int(lat[i] * 4))
+        route_type = TYPES[types[i]]
+        if route_type == 'Boulder':
+            rating = 'V{}'.format(grades[i] // 4)
+        elif route_type.startswith('Ice'):
+            rating = 'WI{} M{}'.format(grades[i] // 7 + 2, grades[i] // 4 + 2)
+        else:
+            rating = YDS_GRADES[grades[i]]
+
+        image = 'https://cdn2.apstatic.com/photos/climb/{}_{{}}_1494100000.jpg'.format(i) if has_images[i] else ''
+
+        routes.append({
+            'id': 100000000 + i,
+            'name': 'Route {}'.format(i),
+            'type': route_type,
+            'rating': rating,
+            'stars': float(stars[i]),
+            'starVotes': int(votes[i]),
+            'pitches': int(pitches[i]) if route_type != 'Boulder' else '',
+            'location': ['Colorado', area, '{} Wall {}'.format(area, walls[i])],
+            'url': 'https://www.mountainproject.com/route/{}/route-{}'.format(100000000 + i, i),
+            'imgSqSmall': image.format('sqsmall'),
+            'imgSmall': image.format('small'),
+            'imgSmallMed': image.format('smallMed'),
+            'imgMedium': image.format('medium'),
+            'longitude': float(lon[i].round(5)),
+            'latitude': float(lat[i].round(5)),
+        })
+
+    return routes
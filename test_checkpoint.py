@@ -0,0 +1,80 @@
+"""Checkpoint Tests
+
+Crawls synthetic routes served by the MP stand-in, interrupting and resuming the crawl through a checkpoint, and checks
+the crawl stats the checkpoint restores
+"""
+import pytest
+
+import mountain_project
+from checkpoint import Checkpoint
+from coordinate import Coordinate
+from density import DensityModel
+from mp_standin import StandinServer
+from response_cache import ResponseCache
+from synthetic import synthetic_routes
+from triangle import Triangle
+
+
+@pytest.fixture
+def standin(tmp_path, monkeypatch):
+    """Points the crawl at a stand-in server with an empty cache and density history
+    """
+    with StandinServer(synthetic_routes(3000, 1)) as server:
+        path = str(tmp_path / 'routes.sqlite')
+        monkeypatch.setattr(mountain_project, 'MP_BASE_URL', server.base_url)
+        monkeypatch.setattr(mountain_project, 'MP_API_KEY', 'test')
+        monkeypatch.setattr(mountain_project, 'cache', ResponseCache(path))
+        monkeypatch.setattr(mountain_project, 'density', DensityModel(path))
+        yield server
+
+
+def colorado():
+    sw, ne = Coordinate(36.99, -109.05), Coordinate(41.05, -101.9)
+    se, nw = Coordinate(sw.lat, ne.lon), Coordinate(ne.lat, sw.lon)
+
+    return [Triangle([sw, se, nw]), Triangle([nw, ne, se])]
+
+
+def leaf_ids(triangles):
+    return [(tuple((round(v.lat, 9), round(v.lon, 9)) for v in t.vertices), t.minDiff, t.maxDiff) for t in triangles]
+
+
+def interrupt(checkpoint, workers, n=None):
+    """Crawls until n final triangles are found, or until the frontier is first saved if n is None, then stops the
+    crawl like an interrupted run
+    """
+    crawl = mountain_project.crawl(colorado(), workers=workers, checkpoint=checkpoint)
+    for i, _ in enumerate(crawl, 1):
+        if i == n or (n is None and checkpoint.exists()):
+            break
+    crawl.close()
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_resume_after_run_interrupted_before_first_save(standin, tmp_path, workers):
+    reference = leaf_ids(mountain_project.crawl(colorado(), workers=workers))
+    path = str(tmp_path / 'checkpoint')
+
+    # Interrupted before the frontier is ever saved, only final triangles are on disk
+    interrupt(Checkpoint(path, interval=3600), workers, 10)
+    assert not Checkpoint(path).exists()
+
+    # A fresh crawl that saves its frontier, then is interrupted too
+    interrupt(Checkpoint(path, interval=0), workers)
+    assert Checkpoint(path).exists()
+
+    resumed = leaf_ids(mountain_project.crawl(colorado(), workers=workers, checkpoint=Checkpoint(path, interval=0)))
+
+    assert len(resumed) == len(set(resumed))
+    assert set(resumed) == set(reference)
+
+
+def test_stats_count_one_crawl(standin):
+    # The first crawl fills the density history, later crawls of the same area make the same requests
+    list(mountain_project.crawl(colorado(), workers=1))
+    list(mountain_project.crawl(colorado(), workers=1))
+    second = dict(mountain_project.crawl_stats)
+    list(mountain_project.crawl(colorado(), workers=1))
+
+    assert second['fetched'] > 0
+    assert dict(mountain_project.crawl_stats) == second
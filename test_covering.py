@@ -0,0 +1,57 @@
+"""Hexagonal Covering Tests
+"""
+import numpy as np
+
+from coordinate import Coordinate, haversine_miles
+from covering import HexCovering, NORMALS, SQRT3
+from triangle import Triangle
+
+
+def colorado():
+    sw, ne = Coordinate(36.99, -109.05), Coordinate(41.05, -101.9)
+    se, nw = Coordinate(sw.lat, ne.lon), Coordinate(ne.lat, sw.lon)
+
+    return [Triangle([sw, se, nw]), Triangle([nw, ne, se])]
+
+
+def inside(covering, cell, xy):
+    """Whether projected points are inside a cell's hexagon
+    """
+    offsets = xy - covering.center(cell.level, cell.q, cell.r)
+
+    return np.all(np.abs(offsets @ NORMALS.T) <= covering.cell_radius(cell.level) * SQRT3 / 2, axis=-1)
+
+
+def test_children_cover_parent():
+    cells = HexCovering.cover(colorado())
+    covering = cells[0].covering
+    # A cell in the middle of the state, so no children are left out for being outside the area
+    parent = min(cells, key=lambda c: haversine_miles(39, -105.5, c.mini_center.lat, c.mini_center.lon))
+    children = covering.children(parent)
+
+    assert all(c.level == 1 and (c.minDiff, c.maxDiff) == (parent.minDiff, parent.maxDiff) for c in children)
+
+    rng = np.random.RandomState(0)
+    size = covering.cell_radius(0)
+    points = covering.center(0, parent.q, parent.r) + rng.uniform(-size, size, (2000, 2))
+    points = points[inside(covering, parent, points)]
+    assert np.all(np.any([inside(covering, c, points) for c in children], axis=0))
+
+    # Each cell's query circle reaches its corners
+    for c in children:
+        for v in c.vertices:
+            assert haversine_miles(c.mini_center.lat, c.mini_center.lon, v.lat, v.lon) <= c.mini_miles + 1e-9
+
+
+def test_children_shared_by_neighbors_are_handed_out_once():
+    cells = HexCovering.cover(colorado())
+    covering = cells[0].covering
+    parent = min(cells, key=lambda c: haversine_miles(39, -105.5, c.mini_center.lat, c.mini_center.lon))
+    neighbor = next(c for c in cells if (c.q - parent.q, c.r - parent.r) == (1, 0))
+
+    first = {c.key for c in covering.children(parent)}
+    second = {c.key for c in covering.children(neighbor)}
+    assert second and not first & second
+
+    # Once every child is handed out the parent is still split, so it is not taken for a cell that can not be
+    assert {c.key for c in covering.children(parent)} == first
@@ -0,0 +1,37 @@
+"""Crag Tree Tests
+"""
+import numpy as np
+
+from crag_tree import CragTree
+
+
+def tree():
+    crags = CragTree()
+    crags.add(('Colorado', 'Boulder', 'Flatirons'), 3.0)
+    crags.add(('Colorado', 'Boulder', 'Flatirons'), 1.0)
+    crags.add(('Colorado', 'Boulder'), 2.0)
+    crags.add(('Colorado', 'Eldorado'), 5.0)
+    crags.add(('Utah', 'Flatirons'), 0.5)
+
+    return crags
+
+
+def test_rank_within_parent_sums_sub_areas():
+    assert tree().rank('Boulder') == [('Boulder', 6.0), ('Flatirons', 4.0)]
+
+
+def test_rank_base_only_and_top_k():
+    crags = tree()
+
+    # Boulder has a route directly in it, Colorado does not
+    assert crags.rank(base_only=True) == [('Boulder', 6.0), ('Eldorado', 5.0), ('Flatirons', 4.0), ('Flatirons', 0.5)]
+    assert crags.rank(top_k=2) == [('Colorado', 11.0), ('Boulder', 6.0)]
+
+
+def test_rank_one_profile_column():
+    crags = CragTree()
+    crags.add(('Colorado', 'Boulder'), np.array([1.0, 0.0]))
+    crags.add(('Colorado', 'Eldorado'), np.array([0.0, 2.0]))
+
+    assert crags.rank('Colorado', column=0) == [('Colorado', 1.0), ('Boulder', 1.0)]
+    assert crags.rank('Colorado', column=1) == [('Colorado', 2.0), ('Eldorado', 2.0)]
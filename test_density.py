@@ -0,0 +1,36 @@
+"""Density Model Tests
+"""
+import numpy as np
+
+from density import DensityModel
+
+
+def routes(ids, lat, lon, spread, seed=0):
+    rng = np.random.RandomState(seed)
+    offsets = rng.uniform(-spread, spread, (len(ids), 2))
+
+    return [{'id': i, 'latitude': lat + dlat, 'longitude': lon + dlon} for i, (dlat, dlon) in zip(ids, offsets)]
+
+
+def test_saturates_once_history_fills_the_circle(tmp_path):
+    density = DensityModel(str(tmp_path / 'routes.sqlite'))
+    assert not density.saturates(40.0, -105.0, 5.0)
+
+    # 0.01 degrees is well under a mile
+    density.record(routes(range(499), 40.0, -105.0, 0.01))
+    assert not density.saturates(40.0, -105.0, 5.0)
+
+    density.record(routes(range(499, 600), 40.0, -105.0, 0.01, seed=1))
+    assert density.saturates(40.0, -105.0, 5.0)
+    # A circle nowhere near the routes
+    assert not density.saturates(40.5, -105.0, 5.0)
+
+
+def test_routes_fetched_twice_count_once(tmp_path):
+    density = DensityModel(str(tmp_path / 'routes.sqlite'))
+    batch = routes(range(300), 40.0, -105.0, 0.01)
+    density.record(batch)
+    density.record(batch)
+
+    assert density.count(40.0, -105.0, 5.0) == 300
+    assert not density.saturates(40.0, -105.0, 5.0)
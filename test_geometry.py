@@ -0,0 +1,34 @@
+"""Geometry Tests
+"""
+import numpy as np
+
+import geometry
+from coordinate import Coordinate, haversine_miles
+from triangle import Triangle
+
+
+def test_miniball_of_obtuse_triangle_is_on_longest_side():
+    centers, radii = geometry.miniballs(np.array([[[0.0, 0.0], [0.0, 4.0], [1.0, 2.0]]]))
+
+    assert np.allclose(centers, [[0.0, 2.0]])
+    assert np.allclose(radii, [2.0])
+
+
+def test_miniball_of_acute_triangle_is_circumcircle():
+    centers, radii = geometry.miniballs(np.array([[[0.0, 0.0], [0.0, 2.0], [2.0, 1.0]]]))
+
+    assert np.allclose(centers, [[0.75, 1.0]])
+    assert np.allclose(radii, [1.25])
+
+
+def test_query_covers_vertex_at_north_edge():
+    # A tall, thin triangle, its miniball reaches farthest north and south of the center
+    triangle = Triangle([Coordinate(40.0, -105.0), Coordinate(40.5, -105.0), Coordinate(40.25, -104.99)])
+    center = triangle.mini_center
+
+    for v in triangle.vertices:
+        assert haversine_miles(center.lat, center.lon, v.lat, v.lon) <= triangle.mini_miles + 1e-9
+
+    # The miniball radius converted east to west is too short to reach the north vertex
+    east_west = haversine_miles(center.lat, center.lon, center.lat, center.lon + triangle.mini_radius)
+    assert east_west < haversine_miles(center.lat, center.lon, 40.5, -105.0)
@@ -0,0 +1,56 @@
+"""Grade Tests
+"""
+import math
+
+from grades import YDS_GRADES, bisect_grades, grade_index, parse_rating
+
+
+def test_grade_without_letter_spans_its_letters():
+    assert grade_index('5.10') == YDS_GRADES.index('5.10a')
+    assert grade_index('5.10', upper=True) == YDS_GRADES.index('5.10d')
+    assert grade_index('5.7', upper=True) == YDS_GRADES.index('5.7')
+
+
+def test_bisect_halves_cover_the_range():
+    easy, hard = bisect_grades('5.0', '5.15')
+
+    assert easy[0] == '5.0' and hard[1] == '5.15d'
+    assert grade_index(easy[1]) + 1 == grade_index(hard[0])
+
+
+def test_bisect_down_to_single_grades():
+    ranges = [('5.0', '5.15')]
+    singles = []
+    while ranges:
+        low, high = ranges.pop()
+        halves = bisect_grades(low, high)
+        if halves:
+            ranges.extend(halves)
+        else:
+            singles.append(low)
+
+    assert sorted(singles, key=grade_index) == YDS_GRADES
+    assert bisect_grades('5.11c', '5.11c') == []
+
+
+def test_parse_rating_in_every_system():
+    assert parse_rating('5.10a').yds == 10.1
+    assert parse_rating('5.10a PG13').yds == 10.1
+    assert parse_rating('5.11+').yds == 11.25
+    assert parse_rating('3rd').yds == -2.0
+    assert parse_rating('V4').boulder == 4
+    assert parse_rating('V3-4').boulder == 3.5
+    assert parse_rating('V-easy').boulder == -1
+    assert parse_rating('WI3').ice == 3
+
+    mixed = parse_rating('WI4 M5')
+    assert (mixed.ice, mixed.mixed) == (4, 5)
+    aid = parse_rating('5.9 C2')
+    assert (aid.yds, aid.aid) == (9.0, 2)
+
+
+def test_systems_missing_from_rating_are_nan():
+    grade = parse_rating('V4')
+
+    assert math.isnan(grade.yds) and math.isnan(grade.ice)
+    assert all(math.isnan(g) for g in parse_rating(''))
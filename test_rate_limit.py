@@ -0,0 +1,56 @@
+"""Rate Limiting Tests
+"""
+import pytest
+
+from rate_limit import QuotaCounter, QuotaExceeded, SharedTokenBucket, TokenBucket
+
+
+@pytest.mark.parametrize('bucket_class', [TokenBucket, SharedTokenBucket])
+def test_throttle_cuts_rate_once_per_cooldown(bucket_class):
+    bucket = bucket_class(rate=8.0, min_rate=1.5, cooldown=60)
+
+    bucket.throttle()
+    bucket.throttle()
+    assert (bucket.rate, bucket.throttled) == (4.0, 2)
+
+    bucket._last_cut -= 60
+    bucket.throttle()
+    bucket._last_cut -= 60
+    bucket.throttle()
+    assert bucket.rate == 1.5
+
+
+def test_throttle_pauses_for_retry_after():
+    bucket = TokenBucket(rate=1000.0, burst=5)
+
+    bucket.throttle(retry_after=0.05)
+    assert bucket.acquire() >= 0.04
+
+
+def test_success_adapts_rate():
+    bucket = TokenBucket(rate=4.0, max_rate=4.5, target_latency=1.0)
+
+    bucket.success(0.1)
+    assert bucket.rate == 4.25
+    bucket.success(0.1)
+    bucket.success(0.1)
+    assert bucket.rate == 4.5
+
+    bucket.success(2.0)
+    assert bucket.rate == 2.25
+
+
+def test_quota_counts_each_key_per_day(tmp_path):
+    path = str(tmp_path / 'routes.sqlite')
+    quota = QuotaCounter(path, daily_limit=2)
+
+    quota.take('a')
+    quota.take('a')
+    with pytest.raises(QuotaExceeded):
+        quota.take('a')
+    quota.take('b')
+
+    # Counts are shared through the file and refused requests are not counted
+    other = QuotaCounter(path, daily_limit=2)
+    assert (other.used('a'), other.remaining('a'), other.remaining('b')) == (2, 0, 1)
+    assert QuotaCounter(path).remaining('a') is None
@@ -0,0 +1,57 @@
+"""Region Tests
+"""
+import numpy as np
+import pytest
+
+from coordinate import Coordinate
+from region import Region, triangulate
+from triangle import Triangle
+
+# An L shape, (lat, lon) counterclockwise with the notch to the north east
+L_SHAPE = np.array([[0, 0], [0, 4], [2, 4], [2, 2], [4, 2], [4, 0]], dtype=np.float64)
+
+
+def area(ring):
+    lat, lon = ring[:, 0], ring[:, 1]
+
+    return abs(np.sum(lon * np.roll(lat, -1) - np.roll(lon, -1) * lat)) / 2
+
+
+def triangle(*corners):
+    return Triangle([Coordinate(lat, lon) for lat, lon in corners])
+
+
+@pytest.mark.parametrize('ring', [L_SHAPE, L_SHAPE[::-1], np.r_[L_SHAPE, L_SHAPE[:1]]])
+def test_triangulate_concave_polygon(ring):
+    triangles = triangulate(ring)
+    region = Region.from_vertices(L_SHAPE)
+
+    assert len(triangles) == len(L_SHAPE) - 2
+    assert sum(area(t) for t in triangles) == pytest.approx(area(L_SHAPE))
+    # No triangle reaches into the notch
+    centroids = np.array([t.mean(axis=0) for t in triangles])
+    assert region.contains(centroids[:, 0], centroids[:, 1]).all()
+
+
+def test_overlaps():
+    region = Region.from_vertices(L_SHAPE)
+
+    # In the notch, inside the region's bounding box but outside the region
+    assert not region.overlaps(triangle((2.5, 2.5), (3.5, 2.5), (3.5, 3.5)))
+    assert region.overlaps(triangle((0.5, 0.5), (1.5, 0.5), (1, 1.5)))
+    # Only the edges cross, no corner of either shape is inside the other
+    assert region.overlaps(triangle((1, -1), (1.2, -1), (1.1, 5)))
+    # The whole region is inside the triangle
+    assert region.overlaps(triangle((-1, -1), (-1, 10), (10, -1)))
+
+
+def test_overlaps_skips_holes():
+    outer = [[0, 0], [0, 4], [4, 4], [4, 0]]
+    hole = [[1, 1], [1, 3], [3, 3], [3, 1]]
+    region = Region([[outer, hole]])
+
+    assert not region.overlaps(triangle((1.5, 1.5), (2.5, 1.5), (2, 2.5)))
+    assert region.overlaps(triangle((0.5, 0.5), (2, 0.5), (1.25, 2)))
+
+    outside, inside = triangle((5, 5), (6, 5), (5, 6)), triangle((0.2, 0.2), (0.8, 0.2), (0.5, 0.8))
+    assert region.prune([outside, inside]) == [inside]
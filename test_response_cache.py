@@ -0,0 +1,64 @@
+"""Response Cache Tests
+"""
+import random
+
+import pytest
+
+from coordinate import haversine_miles
+from response_cache import ResponseCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResponseCache(str(tmp_path / 'routes.sqlite'))
+
+
+def route(id, lat, lon):
+    return {'id': id, 'latitude': lat, 'longitude': lon}
+
+
+def test_quantized_query_covers_original_circle():
+    rng = random.Random(0)
+    # Radii already on a step are the hardest case, rounding up leaves them unchanged
+    radii = [1.0, 2.5, 0.01] + [rng.uniform(0.01, 100) for _ in range(1000)]
+
+    for radius in radii:
+        lat, lon = rng.uniform(36, 42), rng.uniform(-110, -100)
+        q_lat, q_lon, q_radius = ResponseCache.quantize(lat, lon, radius)
+
+        assert haversine_miles(lat, lon, q_lat, q_lon) + radius <= q_radius
+
+
+def test_nearly_identical_queries_hit_after_quantizing(cache):
+    query = ResponseCache.quantize(40.0150012, -105.2705019, 3.141)
+    cache.put(*query, '5.0', '5.15', [route(1, 40.01, -105.27)])
+
+    nearby = ResponseCache.quantize(40.0150034, -105.2704981, 3.148)
+    assert nearby == query
+    assert cache.get(*nearby, '5.0', '5.15') == [route(1, 40.01, -105.27)]
+    assert cache.get(*nearby, '5.10a', '5.15') is None
+
+
+def test_expired_entries_are_missed(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'routes.sqlite'), ttl_days=-1)
+    cache.put(40.0, -105.0, 1.0, '5.0', '5.15', [])
+
+    assert cache.get(40.0, -105.0, 1.0, '5.0', '5.15') is None
+
+
+def test_covering_answers_from_unsaturated_circle(cache):
+    inside, outside = route(1, 40.0, -105.0), route(2, 40.0, -104.9)
+    cache.put(40.0, -105.0, 10.0, '5.0', '5.15', [inside, outside])
+
+    # About 5.3 miles east of the small circle's center, so it is left out
+    assert cache.covering(40.0, -105.0, 2.0, '5.0', '5.15') == [inside]
+    # Reaches past the cached circle
+    assert cache.covering(40.0, -104.85, 3.0, '5.0', '5.15') is None
+    # Other difficulties were not asked for
+    assert cache.covering(40.0, -105.0, 2.0, '5.10a', '5.15') is None
+
+
+def test_covering_skips_saturated_circle(cache):
+    cache.put(40.0, -105.0, 10.0, '5.0', '5.15', [route(i, 40.0, -105.0) for i in range(3)])
+
+    assert cache.covering(40.0, -105.0, 2.0, '5.0', '5.15', saturation=3) is None
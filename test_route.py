@@ -0,0 +1,27 @@
+"""Route Tests
+"""
+import pickle
+
+from route import RatedRoute, Route
+
+
+def payload(id, image=''):
+    return {'id': id, 'name': 'Route {}'.format(id), 'type': 'Sport', 'rating': '5.10a', 'stars': 4.0,
+            'starVotes': 10, 'pitches': 1, 'location': ['Colorado', 'Boulder'], 'latitude': 40.0,
+            'longitude': -105.0, 'imgSqSmall': image, 'imgMedium': image}
+
+
+def test_images_survive_pickling():
+    url = 'https://cdn2.apstatic.com/photos/climb/1_sqsmall.jpg'
+    routes = pickle.loads(pickle.dumps([Route(payload(1, url)), RatedRoute(Route(payload(2)))]))
+
+    assert routes[0].imgSqSmall == routes[0].imgMedium == url
+    assert routes[0].as_dict() == dict(payload(1, url), url=None, imgSmall='', imgSmallMed='')
+    assert routes[1].images == Route.no_images
+
+
+def test_images_are_kept_per_route():
+    first = Route(payload(1, 'first.jpg'))
+    Route(payload(1, 'second.jpg'))
+
+    assert first.imgSqSmall == 'first.jpg'
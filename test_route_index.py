@@ -0,0 +1,30 @@
+"""Route Index Tests
+"""
+import numpy as np
+
+from coordinate import haversine_miles
+from route_index import RouteIndex
+
+
+def test_nearest_matches_brute_force():
+    rng = np.random.RandomState(0)
+    lat, lon = rng.uniform(38, 41, 2000), rng.uniform(-108, -104, 2000)
+    index = RouteIndex(lat, lon)
+
+    for q_lat, q_lon in zip(rng.uniform(37, 42, 50), rng.uniform(-109, -103, 50)):
+        distances = haversine_miles(q_lat, q_lon, lat, lon)
+        assert np.allclose(distances[index.nearest(q_lat, q_lon, 5)], np.sort(distances)[:5])
+
+
+def test_nearest_finds_route_just_east_of_searched_square():
+    # Far routes in their own cells keep the index from falling back to checking every route
+    lat = np.r_[59.6538, 62.0905, np.full(100, -60.0)]
+    lon = np.r_[4.99999, 10.00001, np.arange(100) * 5.0 - 180]
+    index = RouteIndex(lat, lon, cell_size=5.0)
+
+    # The first route is in the first ring of cells, the second is closer but one ring farther east. It is less than a
+    # ring of cells away measured at the query's latitude, since cells narrow north of it.
+    distances = haversine_miles(62.0, 4.99999, lat[:2], lon[:2])
+    assert distances[1] < distances[0]
+
+    assert index.nearest(62.0, 4.99999, 1).tolist() == [1]
@@ -0,0 +1,49 @@
+"""Route Table Tests
+"""
+import numpy as np
+
+from route_table import RouteTable
+
+
+def payload(id, stars=4.0, votes=10, rating='5.10a', location=('Colorado', 'Boulder')):
+    return {'id': id, 'name': 'Route {}'.format(id), 'type': 'Sport', 'rating': rating, 'stars': stars,
+            'starVotes': votes, 'pitches': 1, 'location': list(location), 'latitude': 40.0, 'longitude': -105.0}
+
+
+def test_from_payload_coerces_missing_values():
+    table = RouteTable.from_payload([payload(1), payload(None, stars=None, votes=None), payload(3, stars=-1)])
+
+    assert table.id.tolist() == [1, 0, 3]
+    assert table.stars.tolist() == [4.0, 0.0, 0.0]
+    assert table.star_votes.tolist() == [10, 0, 10]
+    assert np.isfinite(table.score()).all()
+
+
+def test_merge_keeps_first_copy_of_each_route():
+    first = RouteTable.from_payload([payload(1), payload(2, rating='5.11b')])
+    second = RouteTable.from_payload([payload(2, stars=1.0, location=('Utah',)), payload(3, rating='5.9')])
+
+    merged = RouteTable.merge([first, second, RouteTable.from_payload([])])
+
+    assert merged.id.tolist() == [1, 2, 3]
+    assert merged.stars.tolist() == [4.0, 4.0, 4.0]
+    assert [merged.ratings[code] for code in merged.rating] == ['5.10a', '5.11b', '5.9']
+    assert [merged.locations[code] for code in merged.location] == [('Colorado', 'Boulder')] * 3
+    assert merged.names == ['Route 1', 'Route 2', 'Route 3']
+
+
+def test_update_overwrites_rows_by_id():
+    table = RouteTable.from_payload([payload(1), payload(2), payload(3)])
+    # Columns memory-mapped from a snapshot are read only
+    table.stars.flags.writeable = False
+
+    newer = RouteTable.from_payload([payload(3, stars=2.5, rating='5.12c', location=('Utah', 'Moab')),
+                                     payload(9), payload(1, votes=11)])
+    updated = table.update(newer)
+
+    assert updated.tolist() == [True, False, True]
+    assert table.stars.tolist() == [4.0, 4.0, 2.5]
+    assert table.star_votes.tolist() == [11, 10, 10]
+    assert [table.ratings[code] for code in table.rating] == ['5.10a', '5.10a', '5.12c']
+    assert [table.locations[code] for code in table.location][2] == ('Utah', 'Moab')
+    assert table.grade[2] == RouteTable.from_payload([payload(3, rating='5.12c')]).grade[0]
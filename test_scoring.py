@@ -0,0 +1,82 @@
+"""Scoring Tests
+"""
+import configparser
+
+import numpy as np
+
+from route import RatedRoute, Route, RouteType
+from route_table import RouteTable
+from scoring import ScoreProfile, parse_profiles, score_profiles
+
+SETTINGS = """
+[CRAWL]
+workers = 1
+
+[SCORE]
+required = sport
+optional = tr
+prohibited = other
+min_rating = 5.5
+max_rating = 5.9+
+min_pitches = 1
+max_pitches = 1
+
+[SCORE trad]
+required =
+optional = trad
+prohibited = aid
+min_rating = 5.8
+max_rating = 5.12
+min_pitches = 1
+max_pitches = 6
+"""
+
+
+def payload(id, route_type, rating, pitches=1, stars=4.0):
+    return {'id': id, 'name': 'Route {}'.format(id), 'type': route_type, 'rating': rating, 'stars': stars,
+            'starVotes': 5, 'pitches': pitches, 'location': ['Colorado', 'Boulder'], 'latitude': 40.0,
+            'longitude': -105.0}
+
+
+ROUTES = [payload(1, 'Sport', '5.7'), payload(2, 'Sport, TR', '5.9+', stars=1.0), payload(3, 'Trad', '5.10a', 3),
+          payload(4, 'Sport', '5.11a'), payload(5, 'Trad, Aid', '5.9', 2), payload(6, 'Sport, Trad', '5.8')]
+
+
+def profiles():
+    config = configparser.ConfigParser()
+    config.read_string(SETTINGS)
+
+    return parse_profiles(config)
+
+
+def test_parse_profiles():
+    default, trad = profiles()
+
+    assert (default.name, trad.name) == ('default', 'trad')
+    assert default.required_types == {RouteType.sport}
+    # Other prohibits every type that is not required or optional
+    assert default.prohibited_types == set(RouteType) - {RouteType.sport, RouteType.tr}
+    assert (trad.required_types, trad.prohibited_types) == (set(), {RouteType.aid})
+    assert (trad.min_rating, trad.max_pitches) == ('5.8', 6)
+
+
+def test_score_profiles():
+    scores = score_profiles(RouteTable.from_payload(ROUTES), profiles())
+
+    assert np.allclose(scores, [[3, 2, 0, 0, 0, 0],
+                                [0, 0, 3, 0, 0, 3]])
+
+
+def test_profile_scores_like_rated_route():
+    table = RouteTable.from_payload(ROUTES)
+    profile = ScoreProfile('sport', {RouteType.sport}, min_rating='5.6', max_rating='5.10a', min_pitches=1)
+
+    settings = ('required_types', 'min_rating', 'max_rating', 'min_pitches')
+    saved = [getattr(RatedRoute, setting) for setting in settings]
+    for setting in settings:
+        setattr(RatedRoute, setting, getattr(profile, setting))
+    try:
+        assert np.allclose(profile.score(table), [RatedRoute(Route(r)).score for r in ROUTES])
+    finally:
+        for setting, value in zip(settings, saved):
+            setattr(RatedRoute, setting, value)
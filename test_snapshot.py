@@ -0,0 +1,59 @@
+"""Snapshot Tests
+"""
+import os
+
+import numpy as np
+
+import snapshot
+from coordinate import Coordinate
+from route import Route
+from route_table import RouteTable
+from triangle import Triangle
+
+
+def payload(id, stars=3.0, rating='5.10a'):
+    return {'id': id, 'name': 'Route {}'.format(id), 'type': 'Sport', 'rating': rating, 'stars': stars,
+            'starVotes': 5, 'pitches': 1, 'location': ['Colorado', 'Boulder'], 'latitude': 40.0 + id / 100,
+            'longitude': -105.0}
+
+
+def crawl():
+    routes = [payload(i) for i in range(1, 5)]
+    triangle = Triangle([Coordinate(39.9, -105.1), Coordinate(40.1, -105.1), Coordinate(40.0, -104.9)], '5.8', '5.12')
+    triangle.routes = [Route(r) for r in routes[1:3]]
+    triangle.truncated = True
+
+    return RouteTable.from_payload(routes), [triangle]
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    table, triangles = crawl()
+    snapshot.write(path, table, triangles)
+
+    loaded, loaded_triangles, rows, index = snapshot.load(path)
+
+    for column, array in table.columns.items():
+        assert np.array_equal(getattr(loaded, column), array, equal_nan=True)
+    assert loaded.names == table.names
+    assert [(t.lat_lon.tolist(), t.minDiff, t.maxDiff, t.truncated) for t in loaded_triangles] == \
+        [(t.lat_lon.tolist(), t.minDiff, t.maxDiff, t.truncated) for t in triangles]
+    assert [r.tolist() for r in rows] == [[1, 2]]
+    assert index.nearest(40.02, -105.0, 1).tolist() == [1]
+
+
+def test_update_replaces_routes_and_keeps_triangles(tmp_path):
+    path = str(tmp_path / 'snapshot')
+    snapshot.write(path, *crawl())
+
+    table = snapshot.load(path)[0]
+    table.update(RouteTable.from_payload([payload(2, stars=4.5, rating='5.11b')]))
+    snapshot.update(path, table)
+
+    loaded, triangles, rows, _ = snapshot.load(path)
+    assert loaded.stars.tolist() == [3.0, 4.5, 3.0, 3.0]
+    assert [loaded.ratings[code] for code in loaded.rating] == ['5.10a', '5.11b', '5.10a', '5.10a']
+    assert [r.tolist() for r in rows] == [[1, 2]] and triangles[0].truncated
+    # The table no longer maps the replaced files
+    assert not any(isinstance(array, np.memmap) for array in table.columns.values())
+    assert not os.path.exists(path + '.partial')
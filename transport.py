@@ -0,0 +1,89 @@
+"""HTTP Transport
+
+Contains the Transport class, a persistent connection pool with retries used for all requests to Mountain Project
+"""
+import configparser
+from typing import Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class Transport:
+    """A pooled, retrying HTTP session
+
+    Connections are kept alive between requests so only the first request to a host pays for the TCP and TLS
+    handshakes. Server errors and timeouts are retried with exponential backoff. Throttled requests, HTTP 429, are
+    raised rather than retried so the caller can slow down, see :meth:`mountain_project.send_request`.
+
+    Parameters
+    ----------
+    retries : int
+        The number of times a failed request is retried before giving up
+    backoff : float
+        The backoff factor in seconds, retries wait backoff * 2 ** (retry - 1) seconds
+    connect_timeout : float
+        Seconds to wait for a connection to be established
+    read_timeout : float
+        Seconds to wait for the server to send a response
+    pool_size : int
+        The number of connections kept open per host, should be at least the number of crawl workers
+    """
+    retry_statuses = (500, 502, 503, 504)
+    """HTTP statuses that are retried
+    """
+
+    def __init__(self, retries: int = 3, backoff: float = 0.5, connect_timeout: float = 5,
+                 read_timeout: float = 30, pool_size: int = 10):
+        self.timeout: Tuple[float, float] = (connect_timeout, read_timeout)
+
+        retry = Retry(total=retries, connect=retries, read=retries, status=retries, backoff_factor=backoff,
+                      status_forcelist=self.retry_statuses, raise_on_status=False, respect_retry_after_header=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url: str, params: dict) -> requests.Response:
+        """Sends a GET request through the pool
+
+        Parameters
+        ----------
+        url : str
+            The url to request
+        params : dict
+            The query parameters
+
+        Returns
+        -------
+        response : requests.Response
+            The response, an error is raised if it is still unsuccessful after all retries
+        """
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+
+        return response
+
+    @classmethod
+    def from_config(cls, config: configparser.ConfigParser) -> 'Transport':
+        """Creates a transport from the HTTP section of the settings
+
+        Parameters
+        ----------
+        config : configparser.ConfigParser
+            A configparser with HTTP settings
+
+        Returns
+        -------
+        transport : Transport
+            A transport using the configured settings
+        """
+        http_conf = config['HTTP']
+
+        return cls(retries=http_conf.getint('retries'),
+                   backoff=http_conf.getfloat('backoff'),
+                   connect_timeout=http_conf.getfloat('connect_timeout'),
+                   read_timeout=http_conf.getfloat('read_timeout'),
+                   pool_size=http_conf.getint('pool_size'))
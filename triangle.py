@@ -1,17 +1,17 @@
 from typing import List
 from coordinate import Coordinate
 from route import Route
-from math import sqrt
+from grades import bisect_grades
 import numpy as np
-import miniball
-from geopy.distance import distance
-from itertools import combinations
+import geometry
 
 
 class Triangle:
     """A class for Triangles
 
     Contains defining properties of triangle and also methods for finding encompassing circle and data formatting.
+    The geometry is computed by the vectorized functions in :mod:`geometry`, use :meth:`find_miniballs` to compute it
+    for many triangles at once.
 
     Parameters
     ----------
@@ -22,28 +22,51 @@ class Triangle:
     max_diff : str
         An optional string of the maximum difficulty that should be found in the triangle (Defaults to '5.15')
     """
-    vertices = []
-    vertices_array = None
+    __slots__ = ('vertices', 'vertices_array', 'minDiff', 'maxDiff', '_centroid', '_circle_radius', '_mini_center',
+                 '_mini_radius', '_mini_miles', 'routes', 'truncated', 'depth')
+
+    DEFAULT_MIN_DIFF = '5.0'
+    """The minimum difficulty of a triangle that covers every grade
+    """
+    DEFAULT_MAX_DIFF = '5.15'
+    """The maximum difficulty of a triangle that covers every grade
+    """
+
+    vertices: List[Coordinate]
+    vertices_array: np.ndarray
     """A numpy array of the vertices in lon, lat order
     """
-    minDiff = '5.0'
-    maxDiff = '5.15'
-    _centroid = None
-    _circle_radius = None
-    _mini_center = None
-    _mini_radius = None
-
-    routes: List[Route] = None
+    minDiff: str
+    maxDiff: str
+
+    routes: List[Route]
     """A List of routes that are in the triangle's miniball
     """
+    truncated: bool
+    """True if the triangle's query was saturated but could not be split any further, so routes may be missing
+    """
+    depth: int
+    """The number of splits between the triangle and the triangle the crawl started from
+    """
 
-    def __init__(self, vertices: List[Coordinate], min_diff: str = '5.0', max_diff: str = '5.15'):
+    def __init__(self, vertices: List[Coordinate], min_diff: str = DEFAULT_MIN_DIFF,
+                 max_diff: str = DEFAULT_MAX_DIFF):
         self.vertices = vertices
         self.vertices_array = np.array([[a.lon, a.lat] for a in self.vertices])
 
         self.minDiff = min_diff
         self.maxDiff = max_diff
 
+        self._centroid = None
+        self._circle_radius = None
+        self._mini_center = None
+        self._mini_radius = None
+        self._mini_miles = None
+
+        self.routes = None
+        self.truncated = False
+        self.depth = 0
+
     def split_triangle(self) -> List['Triangle']:
         """Splits triangle into two triangles
 
@@ -55,35 +78,37 @@ class Triangle:
             A list containing the two new triangles
 
         """
-        # find longest side
-        max_length = 0
-        max_side = None
-        for side in combinations(self.vertices, 2):
-            length = side[0] - side[1]
-            if length > max_length:
-                max_side = side
-                max_length = length
-
-        odd_point = [p for p in self.vertices if p not in max_side][0]
+        # find longest side by Coordinate distance, ties go to the first of (a, b), (a, c), (b, c)
+        a, b, c = self.vertices
+        max_side, odd_point = max(((a, b), c), ((a, c), b), ((b, c), a), key=lambda s: s[0][0] - s[0][1])
 
         # find midpoint of longest side
         midpoint = max_side[0] / max_side[1]
 
         # Create and return two new triangles
-        return [Triangle([midpoint, odd_point, a]) for a in max_side]
+        return self._children([Triangle([midpoint, odd_point, v], self.minDiff, self.maxDiff) for v in max_side])
 
     def split_difficulty(self) -> List['Triangle']:
         """Split the triangle by difficulty
 
-        Splits From 5.0 to 5.15, does not attempt to split as few times as possible as with geographic splits.
+        Bisects the triangle's difficulty range, see :meth:`grades.bisect_grades`. Repeated splits narrow the range
+        only where the results are still saturated, down to single letter grades.
 
         Returns
         -------
         split_triangle : List[Triangle]
-            16 Triangles, one for each difficulty
+            2 Triangles covering the easier and harder halves of the range, empty if the range is a single grade
+        """
+        return self._children([Triangle(self.vertices, min_diff, max_diff)
+                               for min_diff, max_diff in bisect_grades(self.minDiff, self.maxDiff)])
+
+    def _children(self, triangles: List['Triangle']) -> List['Triangle']:
+        """Marks triangles as split from this triangle
         """
-        difficulty = ['5.{}'.format(a) for a in range(16)]
-        return [Triangle(self.vertices, d, d) for d in difficulty]
+        for t in triangles:
+            t.depth = self.depth + 1
+
+        return triangles
 
     @property
     def centroid(self) -> Coordinate:
@@ -120,6 +145,17 @@ class Triangle:
 
         return self._circle_radius
 
+    @property
+    def lat_lon(self) -> np.ndarray:
+        """The vertices in lat, lon order as used by :mod:`geometry`
+
+        Returns
+        -------
+        lat_lon : np.ndarray
+            3 x 2 array of the vertices
+        """
+        return self.vertices_array[:, ::-1]
+
     def find_miniball(self):
         """Finds the "miniball," the smallest circle that can enclose all of the triangles vertices
 
@@ -127,10 +163,38 @@ class Triangle:
         -------
         nothing, values are stored in "private" attributes
         """
-        c, r2 = miniball.get_bounding_ball(self.vertices_array)
+        Triangle.find_miniballs([self])
+
+    @staticmethod
+    def find_miniballs(triangles: List['Triangle']):
+        """Finds the miniballs of many triangles in one vectorized pass
+
+        The query radius in miles, :attr:`mini_miles`, is the distance from the miniball's center to the farthest
+        vertex rather than the miniball's radius in degrees converted east to west. Measured in miles a circle in
+        degrees reaches farther north to south than east to west, so the converted radius missed routes near vertices
+        north or south of the center. Triangles whose miniball is already known are skipped.
+
+        Parameters
+        ----------
+        triangles : List[Triangle]
+            The triangles to find miniballs for
+
+        Returns
+        -------
+        nothing, values are stored in each triangle's "private" attributes
+        """
+        triangles = [t for t in triangles if t._mini_miles is None]
+        if not triangles:
+            return
 
-        self._mini_center = Coordinate(c[1], c[0])
-        self._mini_radius = sqrt(r2)
+        vertices = np.stack([t.lat_lon for t in triangles])
+        centers, radii = geometry.miniballs(vertices)
+        miles = geometry.cover_miles(centers, vertices)
+
+        for t, c, r, mi in zip(triangles, centers, radii, miles):
+            t._mini_center = Coordinate(float(c[0]), float(c[1]))
+            t._mini_radius = float(r)
+            t._mini_miles = float(mi)
 
     @property
     def mini_center(self) -> Coordinate:
@@ -166,7 +230,8 @@ class Triangle:
     def mini_edge(self) -> Coordinate:
         """The "Mini edge"
 
-        Returns the coordinate of the eastern most point on the miniball.
+        Returns the coordinate of the eastern most point on the miniball. Queries do not use it, their radius covers
+        the farthest vertex instead, see :attr:`mini_miles`.
 
         Returns
         -------
@@ -177,19 +242,18 @@ class Triangle:
 
     @property
     def mini_miles(self) -> float:
-        """The length of the mini-ball radius in miles
+        """The radius in miles of a query around the mini-ball center that covers the whole triangle
 
-        Takes the curvature of the earth into account assuming the distance is east to west
+        The distance to the farthest vertex, see :func:`geometry.cover_miles`. Value is cached once found
 
         Returns
         -------
         mini_miles : float
             length of the radius in miles
         """
-        c = self.mini_center.tuple
-        e = self.mini_edge.tuple
-
-        return distance(c, e).miles
+        if self._mini_miles is None:
+            self.find_miniball()
+        return self._mini_miles
 
     @property
     def plot_coordinates(self) -> np.array:
@@ -0,0 +1,206 @@
+"""Visualization
+
+Map and plotting support. This module imports ipyleaflet and matplotlib, so it is only imported when a map is used and
+headless crawls never load the plotting stack.
+"""
+import time
+from itertools import cycle
+from typing import Iterator
+
+import numpy as np
+from ipyleaflet import GeoJSON, Heatmap, LayerGroup, Map, Polygon
+from matplotlib.cm import get_cmap
+
+_colors: Iterator[str] = None
+
+
+def next_color() -> str:
+    """
+    Returns the next color in the color map generator
+    Returns
+    -------
+    color : str
+        A string containing the next hex color code, cycles forever through the tab10 color map
+    """
+    global _colors
+
+    # Create a color map generator the first time a color is needed
+    if _colors is None:
+        cm = get_cmap(name='tab10')
+        cm255 = [[int(rgb * 255) for rgb in c] for c in cm.colors]
+        cm_hex = ['#%02X%02X%02X' % tuple(c) for c in cm255]
+        _colors = cycle(cm_hex)
+
+    return next(_colors)
+
+
+def plot_triangle(triangle, m: Map):
+    """
+    Plots a triangle on a map in the next color
+
+    Parameters
+    ----------
+    triangle : Triangle
+        The triangle to plot
+    m : Map
+        The map, or a layer group on it, to plot on
+
+    Returns
+    -------
+        nothing
+    """
+    color = next_color()
+    m_tri = Polygon(locations=[p.tuple for p in triangle.vertices], color=color, fill_color=color, fill_opacity=0.2)
+    m.add_layer(m_tri)
+
+
+class MapRenderer:
+    """Draws crawl progress on a map in batches
+
+    Every triangle plotted as its own layer is a widget and a message to the browser, so a statewide crawl slows the
+    notebook to a crawl of its own. The renderer collects triangles and draws each batch as a single GeoJSON layer,
+    flushing once flush_count triangles are waiting or flush_seconds have passed since the last flush. Batches are
+    added to one layer group so the whole crawl can be removed with :meth:`clear`.
+
+    Parameters
+    ----------
+    m : Map
+        The map, or a layer group on it, to plot on
+    flush_seconds : float
+        The longest a triangle waits before it is drawn
+    flush_count : int
+        The most triangles that wait before they are drawn
+    """
+
+    def __init__(self, m: Map, flush_seconds: float = 1.0, flush_count: int = 200):
+        self.m = m
+        self.flush_seconds = flush_seconds
+        self.flush_count = flush_count
+
+        self.group = LayerGroup()
+        m.add_layer(self.group)
+
+        self._features = []
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def wrap(cls, m) -> 'MapRenderer':
+        """Returns a renderer for a map, or the renderer itself if one is given
+
+        Parameters
+        ----------
+        m : Union[Map, MapRenderer]
+            The map, or a layer group on it, or a renderer
+
+        Returns
+        -------
+        renderer : MapRenderer
+            A renderer drawing on the map
+        """
+        return m if isinstance(m, cls) else cls(m)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
+
+    def add_triangle(self, triangle):
+        """Queues a triangle to be drawn in the next color
+
+        Parameters
+        ----------
+        triangle : Triangle
+            The triangle to draw, or any shape with vertices such as a :class:`covering.Cell`
+
+        Returns
+        -------
+        nothing
+        """
+        color = next_color()
+        # GeoJSON positions are lon, lat
+        ring = [[p.lon, p.lat] for p in triangle.vertices]
+        self._features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Polygon', 'coordinates': [ring + ring[:1]]},
+            'properties': {'style': {'color': color, 'fillColor': color, 'fillOpacity': 0.2, 'weight': 1}},
+        })
+
+        if len(self._features) >= self.flush_count or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        """Draws the queued triangles as one layer
+
+        Returns
+        -------
+        nothing
+        """
+        self._last_flush = time.monotonic()
+        if not self._features:
+            return
+
+        self.group.add_layer(GeoJSON(data={'type': 'FeatureCollection', 'features': self._features}))
+        self._features = []
+
+    def clear(self):
+        """Removes everything the renderer has drawn
+
+        Returns
+        -------
+        nothing
+        """
+        self._features = []
+        self.group.clear_layers()
+
+
+def crag_locations(table, scores: np.ndarray) -> np.ndarray:
+    """Sums route scores per crag, placing each crag at the score weighted center of its routes
+
+    Parameters
+    ----------
+    table : RouteTable
+        The routes
+    scores : np.ndarray
+        The score of each route
+
+    Returns
+    -------
+    crags : np.ndarray
+        N x 3 array of the lat, lon, and total score of each crag with a score above 0
+    """
+    n = len(table.locations)
+    totals = np.bincount(table.location, weights=scores, minlength=n)
+    keep = totals > 0
+    lat = np.bincount(table.location, weights=scores * table.lat, minlength=n)[keep] / totals[keep]
+    lon = np.bincount(table.location, weights=scores * table.lon, minlength=n)[keep] / totals[keep]
+
+    return np.column_stack([lat, lon, totals[keep]])
+
+
+def plot_scores(table, scores: np.ndarray, m: Map, radius: int = 15) -> Heatmap:
+    """Plots crag scores as a single heatmap layer
+
+    Routes are summed per crag first, so the map gets one point per crag rather than a marker per route.
+
+    Parameters
+    ----------
+    table : RouteTable
+        The routes
+    scores : np.ndarray
+        The score of each route, e.g. from :meth:`route_table.RouteTable.score`
+    m : Map
+        The map, or a layer group on it, to plot on
+    radius : int
+        Radius in pixels of each crag's point
+
+    Returns
+    -------
+    heatmap : Heatmap
+        The layer added to the map
+    """
+    crags = crag_locations(table, np.asarray(scores, dtype=np.float64))
+    heatmap = Heatmap(locations=crags.tolist(), radius=radius, max=float(crags[:, 2].max()) if len(crags) else 1.0)
+    m.add_layer(heatmap)
+
+    return heatmap